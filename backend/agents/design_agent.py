@@ -120,7 +120,8 @@ Retorne APENAS o JSON, sem comentários adicionais.
             response_dict = await llm_client.generate(
                 prompt=full_prompt,
                 task_type=TaskType.ANALYSIS,
-                model=settings.generation_model
+                model=settings.generation_model,
+                caller="design.analysis"
             )
             
             # Parse JSON response
@@ -209,7 +210,8 @@ Retorne APENAS o JSON.
             response_dict = await llm_client.generate(
                 prompt=full_prompt,
                 task_type=TaskType.GENERATION,
-                model=settings.generation_model
+                model=settings.generation_model,
+                caller="design.generation"
             )
             
             response = response_dict["content"]
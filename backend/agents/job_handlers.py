@@ -0,0 +1,93 @@
+"""
+Handlers dos jobs da fila (services/job_queue.py)
+Registrados tanto no servidor (modo inline) quanto nos processos de worker (job_worker.py)
+"""
+from typing import Dict, Any
+from datetime import datetime
+import json
+import os
+
+from services.job_queue import Job, JobQueue
+from agents.orchestrator import orchestrator
+from agents.deep_research import research_agent
+
+BOOKS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "books")
+
+
+async def run_outline(payload: Dict[str, Any], job: Job) -> Dict[str, Any]:
+    """payload: prompt, target_audience, use_cache"""
+    outline = await orchestrator.generate_book_outline(**payload)
+    if outline.get("status") == "error":
+        raise RuntimeError(outline.get("error", "Falha ao gerar outline"))
+    return outline
+
+
+async def run_chapter(payload: Dict[str, Any], job: Job) -> Dict[str, Any]:
+    """payload: argumentos de generate_chapter (book_id, chapter_number, chapter_title, topic...)"""
+    # Nova tentativa continua do checkpoint do capítulo em vez de recomeçar
+    return await orchestrator.generate_chapter(**payload, resume=job.attempts > 1)
+
+
+async def run_book(payload: Dict[str, Any], job: Job) -> Dict[str, Any]:
+    """payload: outline, book_id, skip_research, writing_tone, resume"""
+    book_id = payload["book_id"]
+
+    # Retomada explícita ou nova tentativa após falha/queda do worker: mantém capítulos prontos
+    result = None
+    if payload.get("resume") or job.attempts > 1:
+        result = await orchestrator.resume_book(book_id)
+    if result is None or result["status"] == "not_found":
+        result = await orchestrator.generate_full_book(
+            outline=payload["outline"],
+            book_id=book_id,
+            skip_research=payload.get("skip_research", False),
+            writing_tone=payload.get("writing_tone", "didatico")
+        )
+
+    if result["status"] == "error":
+        raise RuntimeError(result.get("error", "Falha na geração do livro"))
+    return result
+
+
+async def run_research(payload: Dict[str, Any], job: Job) -> Dict[str, Any]:
+    """payload: query, academic_only, max_results, min_year"""
+    return await research_agent.research(**payload)
+
+
+async def run_export(payload: Dict[str, Any], job: Job) -> Dict[str, Any]:
+    """payload: book_id; salva o livro gerado na biblioteca (data/books)"""
+    book_id = payload["book_id"]
+    book = orchestrator.get_book(book_id)
+    if book["status"] == "not_found":
+        raise RuntimeError(book["error"])
+    if book["status"] != "completed":
+        raise RuntimeError(f"Livro {book_id} ainda não foi concluído ({book['status']})")
+
+    outline = book["outline"]
+    now = datetime.utcnow().isoformat()
+    export_data = {
+        "id": book_id,
+        "title": outline.get("book_title"),
+        "description": outline.get("refined_prompt"),
+        "created_at": now,
+        "last_modified": now,
+        "status": "completed",
+        "total_chapters": len(book["chapters"]),
+        "outline": outline,
+        "chapters": book["chapters"]
+    }
+
+    os.makedirs(BOOKS_DIR, exist_ok=True)
+    path = os.path.join(BOOKS_DIR, f"{book_id}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(export_data, f, ensure_ascii=False, indent=2)
+
+    return {"book_id": book_id, "path": path, "chapters": len(book["chapters"])}
+
+
+def register_job_handlers(queue: JobQueue):
+    queue.register_handler("outline", run_outline)
+    queue.register_handler("chapter", run_chapter)
+    queue.register_handler("book", run_book)
+    queue.register_handler("research", run_research)
+    queue.register_handler("export", run_export)
@@ -64,7 +64,10 @@ class MermaidAgent:
                 task_type=TaskType.GENERATION,
                 model=None,  # Let llm_client choose based on config
                 max_tokens=1000,
-                temperature=0.3
+                temperature=0.3,
+                caller="mermaid",
+                # Cascata: código Mermaid inválido escala para um modelo mais forte
+                validator=lambda content: self._validate_mermaid(self._extract_mermaid_code(content))
             )
             
             content = response["content"]
@@ -80,28 +83,10 @@ class MermaidAgent:
             # Wrap in markdown
             mermaid_code = f"```mermaid\n{code}\n```"
             
-            # Calculate cost
-            cost = 0.0
-            tokens = response.get("tokens", {})
+            # Cost is resolved centrally by the LLM client (provider-reported or pricing table)
+            cost = response.get("cost", 0.0)
             model_used = response.get("model", "unknown")
             
-            # Estimate cost based on model
-            if "gpt" in model_used.lower():
-                input_tokens = tokens.get("prompt_tokens", 200)
-                output_tokens = tokens.get("completion_tokens", 300)
-                if "gpt-4o-mini" in model_used.lower():
-                    cost = (input_tokens / 1_000_000 * 0.15) + (output_tokens / 1_000_000 * 0.60)
-                elif "gpt-4o" in model_used.lower():
-                    cost = (input_tokens / 1_000_000 * 2.50) + (output_tokens / 1_000_000 * 10.00)
-            elif "claude" in model_used.lower():
-                input_tokens = tokens.get("prompt_tokens", 200)
-                output_tokens = tokens.get("completion_tokens", 300)
-                if "haiku" in model_used.lower():
-                    cost = (input_tokens / 1_000_000 * 0.25) + (output_tokens / 1_000_000 * 1.25)
-                elif "sonnet" in model_used.lower():
-                    cost = (input_tokens / 1_000_000 * 3.00) + (output_tokens / 1_000_000 * 15.00)
-            # Gemini and other free models = $0.00
-            
             self.generated_count += 1
             
             logger.info(f"Mermaid generated successfully. Cost: ${cost:.4f}, Model: {model_used}")
@@ -2,16 +2,30 @@
 Agente Orquestrador usando LangGraph
 Gerencia geração contextual capítulo-por-capítulo
 """
-from typing import Dict, Any, List, Optional, TypedDict
+from typing import Dict, Any, List, Optional, TypedDict, AsyncIterator, Union
 from langgraph.graph import StateGraph, END
 from langchain.schema import HumanMessage, SystemMessage
 import asyncio
+import hashlib
+import os
+import time
 
+from config.settings import settings
 from services.llm_client import llm_client, TaskType
+from services.checkpoints import checkpointer, book_store, rag_checkpoint_dir
+from services.book_events import book_events, PartialTextBuffer
+from services.memory_registry import LRURegistry
 from agents.deep_research import research_agent
+from agents.research_prefetch import research_prefetcher
 from agents.dynamic_agent_manager import agent_manager, Domain
+from agents.validators import (
+    validate_chapter_content, json_validator, section_validator, parse_json_response, GENERATION_ERROR_PREFIX
+)
 from rag.graph_rag import GraphRAG
-from prompts.enhanced_prompt import build_chapter_prompt
+from prompts.enhanced_prompt import (
+    build_chapter_prompt, build_skeleton_prompt, build_section_prompt, build_stitch_prompt,
+    build_continuation_prompt, default_skeleton
+)
 from config.reliable_sources import get_writing_tone_instructions
 import uuid
 import json
@@ -23,6 +37,8 @@ class OrchestratorState(TypedDict):
     topic: str
     chapter_title: str
     chapter_number: int
+    current_chapter: int
+    total_chapters: int
     target_audience: str
     context: str
     skip_research: bool
@@ -34,6 +50,7 @@ class OrchestratorState(TypedDict):
     previous_chapters: List[str]
     covered_concepts: List[str]
     knowledge_gaps: List[str]
+    dependencies: Optional[List[int]]  # Capítulos pré-requisito (None = todos os anteriores)
     
     # Dados intermediários
     research_results: Optional[str]
@@ -49,6 +66,16 @@ class OrchestratorState(TypedDict):
     retry_count: int
 
 
+class QueueTextSink:
+    """Repassa trechos de texto a uma fila (mesma interface de add() do PartialTextBuffer)"""
+    
+    def __init__(self, queue: asyncio.Queue):
+        self.queue = queue
+    
+    def add(self, delta: str):
+        self.queue.put_nowait(delta)
+
+
 class BookOrchestratorAgent:
     """
     Orquestrador principal para geração de ebooks
@@ -57,22 +84,41 @@ class BookOrchestratorAgent:
     
     def __init__(self):
         self.graph = self._build_graph()
-        self.rag_systems: Dict[str, GraphRAG] = {}
-        self.active_books: Dict[str, Dict[str, Any]] = {}  # book_id -> status
+        
+        # Livros e RAGs ociosos (ou além do limite) vão para o disco e voltam sob demanda;
+        # livros em geração e seus RAGs nunca são despejados
+        self.active_books: LRURegistry[Dict[str, Any]] = LRURegistry(  # book_id -> status
+            "books",
+            max_items=settings.book_memory_max_books,
+            ttl=settings.book_memory_ttl,
+            load=book_store.load,
+            persist=book_store.save,
+            evictable=lambda book_id, book: book["status"] != "generating",
+            sizeof=lambda book: len(json.dumps(book, ensure_ascii=False, default=str))
+        )
+        self.rag_systems: LRURegistry[GraphRAG] = LRURegistry(
+            "rag",
+            max_items=settings.rag_memory_max_books,
+            ttl=settings.book_memory_ttl,
+            load=self._load_rag,
+            persist=lambda book_id, rag: rag.save(str(rag_checkpoint_dir(book_id))),
+            evictable=lambda book_id, rag: not self._is_generating(book_id),
+            sizeof=lambda rag: rag.memory_usage()["bytes"]
+        )
     
     def _build_graph(self) -> StateGraph:
         """Constrói o grafo de workflow"""
         
         workflow = StateGraph(OrchestratorState)
         
-        # Definir nós
-        workflow.add_node("retrieve_context", self._retrieve_context)
-        workflow.add_node("analyze_mental_graph", self._analyze_mental_graph)
-        workflow.add_node("identify_gaps", self._identify_gaps)
-        workflow.add_node("deep_research", self._deep_research)
-        workflow.add_node("generate_chapter", self._generate_chapter)
-        workflow.add_node("validate_content", self._validate_content)
-        workflow.add_node("index_to_rag", self._index_to_rag)
+        # Definir nós (cada um emite node_started/node_completed no stream do livro)
+        workflow.add_node("retrieve_context", self._traced("retrieve_context", self._retrieve_context))
+        workflow.add_node("analyze_mental_graph", self._traced("analyze_mental_graph", self._analyze_mental_graph))
+        workflow.add_node("identify_gaps", self._traced("identify_gaps", self._identify_gaps))
+        workflow.add_node("deep_research", self._traced("deep_research", self._deep_research))
+        workflow.add_node("generate_chapter", self._traced("generate_chapter", self._generate_chapter))
+        workflow.add_node("validate_content", self._traced("validate_content", self._validate_content))
+        workflow.add_node("index_to_rag", self._traced("index_to_rag", self._index_to_rag))
         
         # Definir fluxo
         workflow.set_entry_point("retrieve_context")
@@ -106,7 +152,53 @@ class BookOrchestratorAgent:
         
         workflow.add_edge("index_to_rag", END)
         
-        return workflow.compile()
+        # Estado salvo no SQLite após cada nó: uma queda retoma do último nó concluído
+        return workflow.compile(checkpointer=checkpointer if settings.checkpoint_enabled else None)
+    
+    def _traced(self, name: str, node):
+        """Envolve um nó do grafo publicando início, duração e resumo no stream do livro"""
+        
+        async def run(state: OrchestratorState) -> OrchestratorState:
+            book_id, chapter = state["book_id"], state["chapter_number"]
+            book_events.publish(book_id, "node_started", {
+                "chapter": chapter,
+                "node": name,
+                "attempt": state["retry_count"] + 1
+            })
+            started = time.monotonic()
+            state = await node(state)
+            book_events.publish(book_id, "node_completed", {
+                "chapter": chapter,
+                "node": name,
+                "duration": round(time.monotonic() - started, 3),
+                **self._node_summary(name, state)
+            })
+            return state
+        
+        return run
+    
+    def _node_summary(self, name: str, state: OrchestratorState) -> Dict[str, Any]:
+        """Dados de cada nó relevantes para o acompanhamento da geração"""
+        if name == "retrieve_context":
+            return {"context_chars": len(state.get("rag_context") or "")}
+        if name == "identify_gaps":
+            return {"knowledge_gaps": len(state.get("knowledge_gaps") or [])}
+        if name == "deep_research":
+            return {"research_chars": len(state.get("research_results") or "")}
+        if name == "generate_chapter":
+            metadata = state.get("metadata") or {}
+            return {
+                "model": metadata.get("model"),
+                "tokens": metadata.get("tokens", {}),
+                "cost": metadata.get("cost", 0),
+                "chars": len(state.get("generated_content") or ""),
+                "finish_reason": metadata.get("finish_reason"),
+                "continuations": metadata.get("continuations", 0),
+                "error": metadata.get("error")
+            }
+        if name == "validate_content":
+            return {"validation_passed": state["validation_passed"], "retry_count": state["retry_count"]}
+        return {}
     
     async def generate_chapter(
         self,
@@ -119,22 +211,200 @@ class BookOrchestratorAgent:
         depth_level: int = 3,
         citation_style: str = "ABNT",
         skip_research: bool = False,
-        writing_tone: str = "didatico"
+        writing_tone: str = "didatico",
+        dependencies: Optional[List[int]] = None,
+        resume: bool = False
     ) -> Dict[str, Any]:
-        """Gera um capítulo completo"""
+        """
+        Gera um capítulo completo
+        dependencies: capítulos cujo contexto do RAG alimenta este (None = todos os anteriores)
+        resume: continua do último nó salvo no checkpoint do capítulo, se houver
+        """
         
-        # Inicializar ou recuperar RAG para este livro
-        if book_id not in self.rag_systems:
-            self.rag_systems[book_id] = GraphRAG(book_id)
+        # Um thread de checkpoint por capítulo do livro
+        config = {"configurable": {"thread_id": f"{book_id}:chapter-{chapter_number}"}}
+        
+        if settings.checkpoint_enabled and resume:
+            snapshot = await self.graph.aget_state(config)
+            if snapshot.values:
+                # Sem próximos nós o capítulo já terminou; senão executa apenas o que falta
+                final_state = snapshot.values if not snapshot.next else await self.graph.ainvoke(None, config)
+                return self._chapter_result(chapter_number, chapter_title, final_state)
         
         # Estado inicial
-        initial_state: OrchestratorState = {
+        initial_state = self._initial_state(
+            book_id=book_id,
+            chapter_number=chapter_number,
+            chapter_title=chapter_title,
+            topic=topic,
+            target_audience=target_audience,
+            total_chapters=total_chapters,
+            depth_level=depth_level,
+            citation_style=citation_style,
+            skip_research=skip_research,
+            writing_tone=writing_tone,
+            dependencies=dependencies
+        )
+        
+        # Executar workflow
+        if settings.checkpoint_enabled:
+            # Geração nova descarta checkpoints antigos do mesmo capítulo
+            await checkpointer.adelete_thread(config["configurable"]["thread_id"])
+            final_state = await self.graph.ainvoke(initial_state, config)
+        else:
+            final_state = await self.graph.ainvoke(initial_state)
+        
+        return self._chapter_result(chapter_number, chapter_title, final_state)
+    
+    def _chapter_result(self, chapter_number: int, chapter_title: str, final_state: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "chapter_number": chapter_number,
+            "chapter_title": chapter_title,
+            "content": final_state.get("generated_content"),
+            "metadata": final_state.get("metadata"),
+            "validation_passed": final_state.get("validation_passed")
+        }
+    
+    async def stream_chapter(
+        self,
+        book_id: str,
+        chapter_number: int,
+        chapter_title: str,
+        topic: str,
+        target_audience: str = "estudantes de graduação",
+        total_chapters: int = 10,
+        depth_level: int = 3,
+        citation_style: str = "ABNT",
+        skip_research: bool = False,
+        writing_tone: str = "didatico",
+        dependencies: Optional[List[int]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Gera um capítulo emitindo eventos conforme o texto chega
+        
+        Executa os mesmos nós do grafo, mas a etapa de geração usa streaming.
+        Emite {"event": "stage"}, {"event": "token"} e, ao final, {"event": "done"}.
+        """
+        state = self._initial_state(
+            book_id=book_id,
+            chapter_number=chapter_number,
+            chapter_title=chapter_title,
+            topic=topic,
+            target_audience=target_audience,
+            total_chapters=total_chapters,
+            depth_level=depth_level,
+            citation_style=citation_style,
+            skip_research=skip_research,
+            writing_tone=writing_tone,
+            dependencies=dependencies
+        )
+        
+        for stage, node in (
+            ("retrieve_context", self._retrieve_context),
+            ("analyze_mental_graph", self._analyze_mental_graph),
+            ("identify_gaps", self._identify_gaps),
+        ):
+            yield {"event": "stage", "stage": stage}
+            state = await node(state)
+        
+        if self._should_research(state) == "research":
+            yield {"event": "stage", "stage": "deep_research"}
+            state = await self._deep_research(state)
+        
+        yield {"event": "stage", "stage": "generate_chapter"}
+        
+        # O texto completo só é mantido para validação e indexação no RAG
+        parts: List[str] = []
+        result: Dict[str, Any] = {}
+        
+        async for event in llm_client.generate_stream(
+            prompt=self._build_prompt(state),
+            task_type=TaskType.GENERATION,
+            max_tokens=4000,
+            temperature=0.7,
+            caller="orchestrator.chapter",
+            book_id=state["book_id"]
+        ):
+            if event.get("done"):
+                result = event
+                continue
+            
+            parts.append(event["delta"])
+            yield {"event": "token", "delta": event["delta"]}
+        
+        result = {**result, "content": "".join(parts)}
+        
+        if result.get("finish_reason") == "length":
+            # Cortado por max_tokens: continua do fim do texto, repassando os trechos ao cliente
+            deltas: asyncio.Queue = asyncio.Queue()
+            continuation = asyncio.create_task(
+                self._continue_truncated(state, result, buffer=QueueTextSink(deltas))
+            )
+            continuation.add_done_callback(lambda _: deltas.put_nowait(None))
+            try:
+                while (delta := await deltas.get()) is not None:
+                    yield {"event": "token", "delta": delta}
+                result = await continuation
+            finally:
+                # Cliente desconectado no meio da continuação
+                continuation.cancel()
+        
+        metadata = {
+            "model": result.get("model"),
+            "provider": result.get("provider"),
+            "tokens": result.get("tokens", {}),
+            "cost": result.get("cost", 0),
+            "continuations": result.get("continuations", 0),
+            "finish_reason": result.get("finish_reason"),
+            # Orçamento de continuação esgotado: aceito, mas sinalizado
+            "truncated": result.get("finish_reason") == "length"
+        }
+        
+        state["generated_content"] = result["content"]
+        state["metadata"] = metadata
+        
+        yield {"event": "stage", "stage": "validate_content"}
+        state = await self._validate_content(state)
+        
+        if state["validation_passed"]:
+            yield {"event": "stage", "stage": "index_to_rag"}
+            state = await self._index_to_rag(state)
+        
+        yield {
+            "event": "done",
+            "book_id": book_id,
+            "chapter_number": chapter_number,
+            "chapter_title": chapter_title,
+            "metadata": metadata,
+            "validation_passed": state["validation_passed"]
+        }
+    
+    def _initial_state(
+        self,
+        book_id: str,
+        chapter_number: int,
+        chapter_title: str,
+        topic: str,
+        target_audience: str,
+        total_chapters: int,
+        depth_level: int,
+        citation_style: str,
+        skip_research: bool,
+        writing_tone: str,
+        dependencies: Optional[List[int]] = None
+    ) -> OrchestratorState:
+        """Monta o estado inicial do workflow para um capítulo"""
+        
+        # O RAG do livro é criado ou reidratado no primeiro acesso (self.rag_systems[book_id])
+        return {
             "book_id": book_id,
             "topic": topic,
             "target_audience": target_audience,
+            "chapter_number": chapter_number,
             "current_chapter": chapter_number,
             "total_chapters": total_chapters,
             "chapter_title": chapter_title,
+            "context": "",
             "depth_level": depth_level,
             "citation_style": citation_style,
             "skip_research": skip_research,
@@ -142,6 +412,7 @@ class BookOrchestratorAgent:
             "previous_chapters": [],
             "covered_concepts": [],
             "knowledge_gaps": [],
+            "dependencies": dependencies,
             "research_results": None,
             "rag_context": None,
             "mental_graph_insights": None,
@@ -150,17 +421,6 @@ class BookOrchestratorAgent:
             "validation_passed": False,
             "retry_count": 0
         }
-        
-        # Executar workflow
-        final_state = await self.graph.ainvoke(initial_state)
-        
-        return {
-            "chapter_number": chapter_number,
-            "chapter_title": chapter_title,
-            "content": final_state.get("generated_content"),
-            "metadata": final_state.get("metadata"),
-            "validation_passed": final_state.get("validation_passed")
-        }
     
     async def _retrieve_context(self, state: OrchestratorState) -> OrchestratorState:
         """Recupera contexto de capítulos anteriores"""
@@ -168,21 +428,29 @@ class BookOrchestratorAgent:
         book_id = state["book_id"]
         current_chapter = state.get("chapter_number", 1)  # Corrigido para usar chapter_number
         
+        dependencies = state.get("dependencies")
+        
         if current_chapter == 1:
             # Primeiro capítulo, sem contexto anterior
             state["rag_context"] = "Este é o primeiro capítulo do livro."
             return state
         
+        if dependencies is not None and not dependencies:
+            # Capítulo independente no outline: não herda contexto de outros capítulos
+            state["rag_context"] = "Este capítulo não depende de capítulos anteriores."
+            return state
+        
         # Recuperar capítulos anteriores do RAG
         rag = self.rag_systems[book_id]
         
-        # Buscar capítulos
-        previous_nodes = rag.retrieve_chapters(1, current_chapter - 1)
+        # Buscar capítulos (apenas as dependências declaradas, se houver)
+        previous_nodes = self._dependency_chapters(state, rag)
+        filters = None if dependencies is None else {"chapter_number": list(dependencies)}
         state["previous_chapters"] = [node.content for node in previous_nodes]
         
         # Buscar contexto relevante via similarity search
         query = f"Contexto relevante para capítulo: {state['chapter_title']}"
-        docs = rag.retrieve(query, k=5)
+        docs = rag.retrieve(query, filters=filters, k=5)
         
         # Carregar referências globais
         global_refs = self._load_global_references()
@@ -195,6 +463,17 @@ class BookOrchestratorAgent:
         
         return state
     
+    def _dependency_chapters(self, state: OrchestratorState, rag: GraphRAG) -> List[Any]:
+        """
+        Capítulos do RAG que alimentam o capítulo atual: as dependências declaradas ou,
+        sem declaração, todos os anteriores. Nunca depende de quais capítulos irmãos
+        terminaram antes na geração paralela
+        """
+        dependencies = state.get("dependencies")
+        if dependencies is None:
+            return rag.retrieve_chapters(1, state["chapter_number"] - 1)
+        return rag.retrieve_chapter_numbers(dependencies)
+    
     def _load_global_references(self) -> str:
         """Carrega referências globais do arquivo JSON"""
         try:
@@ -220,8 +499,8 @@ class BookOrchestratorAgent:
         book_id = state["book_id"]
         rag = self.rag_systems[book_id]
         
-        # Recuperar capítulos para análise
-        chapters = rag.retrieve_chapters(1, state["current_chapter"] - 1)
+        # Recuperar capítulos para análise (apenas as dependências)
+        chapters = self._dependency_chapters(state, rag)
         
         if chapters:
             # Analisar fluxo narrativo
@@ -243,8 +522,8 @@ class BookOrchestratorAgent:
         book_id = state["book_id"]
         rag = self.rag_systems[book_id]
         
-        # Identificar gaps
-        gaps = rag.mental_graph.identify_gaps()
+        # Identificar gaps (apenas nas dependências)
+        gaps = rag.mental_graph.identify_gaps(self._dependency_chapters(state, rag))
         state["knowledge_gaps"] = gaps if gaps else []
         
         return state
@@ -265,49 +544,71 @@ class BookOrchestratorAgent:
     async def _deep_research(self, state: OrchestratorState) -> OrchestratorState:
         """Executa pesquisa profunda sobre o tema"""
         
-        query = f"{state['topic']}: {state['chapter_title']}"
+        query = self._research_query(state["topic"], state["chapter_title"])
         
-        # Pesquisar
-        results = await research_agent.research(
-            query=query,
-            academic_only=True,
-            max_results=10
-        )
+        # Pesquisa antecipada enquanto capítulos anteriores eram gerados; senão pesquisa agora
+        results = await research_prefetcher.take(state["book_id"], state["chapter_number"], query)
+        if results is None:
+            results = await research_agent.research(
+                query=query,
+                academic_only=True,
+                max_results=10
+            )
         
         state["research_results"] = results["synthesis"]
         
         return state
     
-    async def _generate_chapter(self, state: OrchestratorState) -> OrchestratorState:
-        """Gera conteúdo do capítulo usando LLM"""
+    def _research_query(self, topic: str, chapter_title: str) -> str:
+        """Consulta de pesquisa do capítulo (depende só do outline)"""
+        return f"{topic}: {chapter_title}"
+    
+    def _prompt_context(self, state: OrchestratorState) -> Dict[str, Any]:
+        """Argumentos dos prompts do capítulo a partir do estado"""
         
         # Obter instruções de tom de escrita
         tone_instructions = get_writing_tone_instructions(state.get("writing_tone", "didatico"))
         
-        # Construir prompt contextual
-        prompt = build_chapter_prompt(
-            chapter_number=state["current_chapter"],
-            chapter_title=state["chapter_title"],
-            topic=state["topic"],
-            target_audience=state["target_audience"],
-            rag_context=state.get("rag_context", ""),
-            research_results=state.get("research_results", ""),
-            previous_chapters_summary="\n".join(state["previous_chapters"][:3]),
-            covered_concepts=state.get("covered_concepts", []),
-            knowledge_gaps=state.get("knowledge_gaps", []),
-            depth_level=state["depth_level"],
-            citation_style=state["citation_style"],
-            writing_tone_instructions=tone_instructions
-        )
+        return {
+            "chapter_number": state["current_chapter"],
+            "chapter_title": state["chapter_title"],
+            "topic": state["topic"],
+            "target_audience": state["target_audience"],
+            "rag_context": state.get("rag_context", ""),
+            "research_results": state.get("research_results", ""),
+            "previous_chapters_summary": "\n".join(state["previous_chapters"][:3]),
+            "covered_concepts": state.get("covered_concepts", []),
+            "knowledge_gaps": state.get("knowledge_gaps", []),
+            "depth_level": state["depth_level"],
+            "citation_style": state["citation_style"],
+            "writing_tone_instructions": tone_instructions
+        }
+    
+    def _build_prompt(self, state: OrchestratorState) -> str:
+        """Constrói o prompt contextual do capítulo a partir do estado"""
+        return build_chapter_prompt(**self._prompt_context(state))
+    
+    async def _generate_chapter(self, state: OrchestratorState) -> OrchestratorState:
+        """Gera conteúdo do capítulo usando LLM"""
         
         # Gerar com LLM
         try:
-            result = await llm_client.generate(
-                prompt=prompt,
-                task_type=TaskType.GENERATION,
-                max_tokens=4000,
-                temperature=0.7
-            )
+            prompt = self._build_prompt(state)
+            if settings.chapter_generation_mode == "sections":
+                result = await self._generate_sections(state)
+            elif settings.book_events_enabled and settings.book_events_stream_text:
+                result = await self._stream_chapter_text(state, prompt)
+            else:
+                result = await llm_client.generate(
+                    prompt=prompt,
+                    task_type=TaskType.GENERATION,
+                    max_tokens=4000,
+                    temperature=0.7,
+                    caller="orchestrator.chapter",
+                    book_id=state["book_id"],
+                    validator=validate_chapter_content  # Cascata: escala de modelo só se reprovado
+                )
+                result = await self._continue_truncated(state, result)
             
             state["generated_content"] = result["content"]
             state["metadata"] = {
@@ -316,29 +617,300 @@ class BookOrchestratorAgent:
                 "tokens": result.get("tokens", {}),
                 "cost": result.get("cost", 0)
             }
+            if "cascade_tier" in result:
+                state["metadata"]["cascade_tier"] = result["cascade_tier"]
+            if "sections" in result:
+                state["metadata"]["sections"] = result["sections"]
+            if "continuations" in result:
+                state["metadata"]["continuations"] = result["continuations"]
+                state["metadata"]["finish_reason"] = result.get("finish_reason")
+                # Orçamento de continuação esgotado: aceito, mas sinalizado
+                state["metadata"]["truncated"] = result.get("finish_reason") == "length"
             
         except Exception as e:
-            state["generated_content"] = f"Erro na geração: {str(e)}"
+            state["generated_content"] = f"{GENERATION_ERROR_PREFIX}: {str(e)}"
             state["metadata"] = {"error": str(e)}
         
         return state
     
-    async def _validate_content(self, state: OrchestratorState) -> OrchestratorState:
-        """Valida conteúdo gerado"""
+    async def _stream_chapter_text(self, state: OrchestratorState, prompt: str) -> Dict[str, Any]:
+        """
+        Gera o capítulo em streaming publicando o texto parcial no stream do livro
+        A cascata de modelos avança pelas novas tentativas do grafo: a primeira usa o
+        modelo mais barato e cada reprovação na validação sobe um nível
+        """
+        tiers = llm_client.cascade_for(TaskType.GENERATION)
+        tier = min(state["retry_count"], len(tiers) - 1) if tiers else None
         
-        content = state.get("generated_content", "")
+        buffer = PartialTextBuffer(book_events, state["book_id"], state["chapter_number"])
+        result = await self._stream_text(state, prompt, tiers[tier] if tiers else None, 4000, buffer)
+        if tiers:
+            result["cascade_tier"] = tier
         
-        # Validações básicas
-        if not content or len(content) < 500:
-            state["validation_passed"] = False
-            return state
+        result = await self._continue_truncated(state, result, buffer=buffer)
+        buffer.flush()
+        return result
+    
+    async def _stream_text(
+        self,
+        state: OrchestratorState,
+        prompt: str,
+        model: Optional[str],
+        max_tokens: int,
+        buffer: Union[PartialTextBuffer, QueueTextSink]
+    ) -> Dict[str, Any]:
+        """Uma chamada em streaming, repassando os trechos ao buffer de texto parcial"""
+        parts: List[str] = []
+        result: Dict[str, Any] = {}
+        
+        async for event in llm_client.generate_stream(
+            prompt=prompt,
+            task_type=TaskType.GENERATION,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=0.7,
+            caller="orchestrator.chapter",
+            book_id=state["book_id"]
+        ):
+            if event.get("done"):
+                result = event
+                continue
+            parts.append(event["delta"])
+            buffer.add(event["delta"])
+        
+        return {**result, "content": "".join(parts)}
+    
+    async def _continue_truncated(
+        self,
+        state: OrchestratorState,
+        result: Dict[str, Any],
+        max_tokens: int = 4000,
+        budget: Optional[int] = None,
+        headings: Optional[List[str]] = None,
+        buffer: Optional[Union[PartialTextBuffer, QueueTextSink]] = None
+    ) -> Dict[str, Any]:
+        """
+        Saída cortada por max_tokens (finish_reason "length") é continuada a partir do fim
+        do texto, com um prompt curto, em vez de regenerada: até CHAPTER_MAX_CONTINUATIONS
+        chamadas e CHAPTER_OUTPUT_TOKEN_BUDGET tokens de saída no total
+        """
+        if result.get("finish_reason") != "length":
+            return result
+        
+        budget = budget or settings.chapter_output_token_budget
+        content = result["content"]
+        tokens = dict(result.get("tokens") or {})
+        cost = result.get("cost", 0) or 0
+        used = tokens.get("completion_tokens") or max_tokens
+        finish_reason = result["finish_reason"]
+        continuations = 0
+        
+        while (
+            finish_reason == "length"
+            and continuations < settings.chapter_max_continuations
+            and budget - used >= settings.chapter_continuation_min_tokens
+        ):
+            prompt = build_continuation_prompt(
+                chapter_number=state["chapter_number"],
+                chapter_title=state["chapter_title"],
+                topic=state["topic"],
+                tail=content[-settings.chapter_continuation_tail_chars:],
+                headings=headings
+            )
+            call_tokens = min(max_tokens, budget - used)
+            try:
+                if buffer is not None:
+                    part = await self._stream_text(state, prompt, result.get("model"), call_tokens, buffer)
+                else:
+                    part = await llm_client.generate(
+                        prompt=prompt,
+                        task_type=TaskType.GENERATION,
+                        model=result.get("model"),  # Mesmo modelo, mesmo estilo
+                        max_tokens=call_tokens,
+                        temperature=0.7,
+                        caller="orchestrator.chapter_continuation",
+                        book_id=state["book_id"]
+                    )
+            except Exception as e:
+                print(f"⚠️ Continuação do capítulo {state['chapter_number']} falhou: {e}")
+                break
+            
+            continuations += 1
+            content += part["content"]
+            finish_reason = part.get("finish_reason")
+            for key, value in (part.get("tokens") or {}).items():
+                if isinstance(value, (int, float)):
+                    tokens[key] = tokens.get(key, 0) + value
+            cost += part.get("cost", 0) or 0
+            used += (part.get("tokens") or {}).get("completion_tokens") or call_tokens
+        
+        return {
+            **result,
+            "content": content,
+            "tokens": tokens,
+            "cost": cost,
+            "finish_reason": finish_reason,
+            "continuations": continuations
+        }
+    
+    async def _generate_sections(self, state: OrchestratorState) -> Dict[str, Any]:
+        """
+        Geração por seções: esqueleto do capítulo, seções escritas em paralelo com o
+        mesmo contexto e uma passada curta de costura com as transições entre elas
+        Cada seção é validada e regenerada isoladamente, em vez de refazer o capítulo
+        """
+        context = self._prompt_context(state)
+        calls: List[Dict[str, Any]] = []
+        
+        # 1. Esqueleto: pontos de cada seção, para as seções paralelas não se repetirem
+        skeleton = default_skeleton()
+        try:
+            plan = await llm_client.generate(
+                prompt=build_skeleton_prompt(**context),
+                task_type=TaskType.ANALYSIS,
+                max_tokens=1500,
+                temperature=0.4,
+                caller="orchestrator.chapter_skeleton",
+                book_id=state["book_id"],
+                validator=json_validator(["sections"])
+            )
+            calls.append(plan)
+            planned = parse_json_response(plan["content"])["sections"]
+            for item, planned_item in zip(skeleton, planned):
+                item["key_points"] = [str(point) for point in planned_item.get("key_points") or []]
+                item["concepts"] = [str(concept) for concept in planned_item.get("concepts") or []]
+        except Exception as e:
+            print(f"⚠️ Esqueleto do capítulo {state['chapter_number']} indisponível, usando seções padrão: {e}")
         
-        # TODO: Validações mais sofisticadas
-        # - Verificar citações
-        # - Checar contradições com capítulos anteriores
-        # - Validar estrutura
+        # 2. Seções em paralelo
+        semaphore = asyncio.Semaphore(max(1, settings.chapter_section_concurrency))
         
-        state["validation_passed"] = True
+        async def write(number: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._generate_section(state, context, skeleton, number, calls)
+        
+        sections = await asyncio.gather(*(write(n) for n in range(1, len(skeleton) + 1)))
+        texts = [section["content"] for section in sections if section["validation_passed"]]
+        
+        # 3. Costura: transições entre seções vizinhas
+        transitions: List[str] = []
+        if settings.chapter_stitch_enabled and len(texts) > 1:
+            try:
+                stitch = await llm_client.generate(
+                    prompt=build_stitch_prompt(state["chapter_number"], state["chapter_title"], texts),
+                    task_type=TaskType.RESEARCH,
+                    max_tokens=800,
+                    temperature=0.5,
+                    caller="orchestrator.chapter_stitch",
+                    book_id=state["book_id"],
+                    validator=json_validator(["transitions"])
+                )
+                calls.append(stitch)
+                transitions = [str(t) for t in parse_json_response(stitch["content"])["transitions"]]
+            except Exception as e:
+                print(f"⚠️ Costura do capítulo {state['chapter_number']} falhou, seções unidas sem transições: {e}")
+        
+        parts = texts[:1]
+        for i, text in enumerate(texts[1:]):
+            if i < len(transitions):
+                parts.append(transitions[i])
+            parts.append(text)
+        
+        # Uso somado de todas as chamadas; modelo/provedor da primeira seção
+        tokens: Dict[str, Any] = {}
+        for call in calls:
+            for key, value in (call.get("tokens") or {}).items():
+                if isinstance(value, (int, float)):
+                    tokens[key] = tokens.get(key, 0) + value
+        first = next((s for s in sections if s.get("model")), {})
+        
+        return {
+            "content": "\n\n".join(parts),
+            "model": first.get("model"),
+            "provider": first.get("provider"),
+            "tokens": tokens,
+            "cost": sum(call.get("cost", 0) or 0 for call in calls),
+            "sections": [
+                {key: value for key, value in section.items() if key != "content"}
+                for section in sections
+            ]
+        }
+    
+    async def _generate_section(
+        self,
+        state: OrchestratorState,
+        context: Dict[str, Any],
+        skeleton: List[Dict[str, Any]],
+        number: int,
+        calls: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Escreve uma seção, regenerando apenas ela se reprovada na validação"""
+        
+        target_words = settings.chapter_section_words
+        validate = section_validator(min_words=target_words // 3)
+        prompt = build_section_prompt(skeleton, number, target_words=target_words, **context)
+        
+        result: Dict[str, Any] = {}
+        content = ""
+        attempts = 0
+        for attempts in range(1, settings.chapter_section_retries + 2):
+            try:
+                result = await llm_client.generate(
+                    prompt=prompt,
+                    task_type=TaskType.GENERATION,
+                    max_tokens=settings.chapter_section_max_tokens,
+                    temperature=0.7,
+                    caller="orchestrator.section",
+                    book_id=state["book_id"],
+                    validator=validate  # Cascata escala o modelo só para esta seção
+                )
+                result = await self._continue_truncated(
+                    state, result,
+                    max_tokens=settings.chapter_section_max_tokens,
+                    budget=settings.chapter_section_max_tokens * (settings.chapter_max_continuations + 1),
+                    headings=[f"## {number}. {skeleton[number - 1]['title']}"]
+                )
+                calls.append(result)
+                content = result["content"]
+            except Exception as e:
+                result = {}
+                content = f"{GENERATION_ERROR_PREFIX}: {str(e)}"
+            if validate(content):
+                break
+        
+        passed = validate(content)
+        book_events.publish(state["book_id"], "section_completed", {
+            "chapter": state["chapter_number"],
+            "section": number,
+            "title": skeleton[number - 1]["title"],
+            "attempts": attempts,
+            "validation_passed": passed,
+            "words": len(content.split()),
+            "tokens": result.get("tokens", {})
+        })
+        
+        return {
+            "number": number,
+            "title": skeleton[number - 1]["title"],
+            "content": content,
+            "attempts": attempts,
+            "validation_passed": passed,
+            "model": result.get("model"),
+            "provider": result.get("provider")
+        }
+    
+    async def _validate_content(self, state: OrchestratorState) -> OrchestratorState:
+        """Valida conteúdo gerado"""
+        
+        # Mesmo validador usado pela cascata de modelos em _generate_chapter
+        state["validation_passed"] = validate_chapter_content(state.get("generated_content", ""))
+        # Geração por seções: capítulo só passa se todas as seções passaram
+        sections = (state.get("metadata") or {}).get("sections")
+        if sections and not all(section["validation_passed"] for section in sections):
+            state["validation_passed"] = False
+        if not state["validation_passed"]:
+            # Contado no nó: alterações feitas na função de decisão não entram no estado
+            state["retry_count"] += 1
         return state
     
     def _should_retry(self, state: OrchestratorState) -> str:
@@ -347,10 +919,13 @@ class BookOrchestratorAgent:
         if state["validation_passed"]:
             return "success"
         
-        if state["retry_count"] >= 2:
+        if state["retry_count"] > 2:
+            return "fail"
+        
+        # Seções reprovadas já foram regeneradas uma a uma; refazer o capítulo não ajuda
+        if settings.chapter_generation_mode == "sections":
             return "fail"
         
-        state["retry_count"] += 1
         return "retry"
     
     async def _index_to_rag(self, state: OrchestratorState) -> OrchestratorState:
@@ -367,18 +942,24 @@ class BookOrchestratorAgent:
                 "title": state["chapter_title"],
                 "topic": state["topic"],
                 **state.get("metadata", {})
-            }
+            },
+            dependencies=state.get("dependencies")
         )
         
+        # RAG salvo junto do checkpoint: capítulos retomados encontram os anteriores indexados
+        if settings.checkpoint_enabled:
+            rag.save(str(rag_checkpoint_dir(book_id)))
+        
         return state
 
 
-    async def optimize_prompt(self, user_prompt: str) -> Dict[str, Any]:
+    async def optimize_prompt(self, user_prompt: str, use_cache: bool = True) -> Dict[str, Any]:
         """
         Otimiza o prompt do usuário usando LLM
         
         Args:
             user_prompt: Prompt inicial do usuário
+            use_cache: Reaproveita resposta de um prompt idêntico (False força nova geração)
             
         Returns:
             Dict com prompt otimizado e sugestões
@@ -412,7 +993,10 @@ O prompt otimizado deve:
                 prompt=optimization_prompt,
                 task_type=TaskType.ANALYSIS,
                 max_tokens=1500,
-                temperature=0.7
+                temperature=0.7,
+                use_cache=use_cache,
+                caller="orchestrator.optimize_prompt",
+                validator=json_validator(["optimized_prompt"])
             )
             
             # Parse JSON response
@@ -506,13 +1090,19 @@ O prompt otimizado deve:
                 "suggestions": ["Erro ao otimizar prompt. Use o prompt original."]
             }
     
-    async def generate_book_outline(self, prompt: str, target_audience: str = "profissionais") -> Dict[str, Any]:
+    async def generate_book_outline(
+        self,
+        prompt: str,
+        target_audience: str = "profissionais",
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
         """
         Gera o escopo completo do livro (outline) com todos os capítulos
         
         Args:
             prompt: Prompt (pode ser otimizado ou original)
             target_audience: Público-alvo
+            use_cache: Reaproveita outline de entrada idêntica (False força nova geração)
             
         Returns:
             Dict com outline estruturado do livro
@@ -580,6 +1170,14 @@ Retorne um JSON com a seguinte estrutura:
       "key_topics": ["tópico1", "tópico2"],
       "dependencies": [],
       "estimated_pages": {pages_per_chapter if pages_per_chapter else total_pages // user_chapters}
+    }},
+    {{
+      "number": 2,
+      "title": "<título do capítulo>",
+      "description": "<o que será abordado em 2-3 frases>",
+      "key_topics": ["tópico1", "tópico2"],
+      "dependencies": [1],
+      "estimated_pages": {pages_per_chapter if pages_per_chapter else total_pages // user_chapters}
     }}
     // ... exatamente {user_chapters} capítulos no total
   ],
@@ -594,6 +1192,7 @@ CRÍTICOS:
 - DISTRIBUA AS PÁGINAS EQUILIBRADAMENTE ENTRE OS CAPÍTULOS
 - RESPEITE ESTRICTAMENTE AS ESPECIFICAÇÕES DO USUÁRIO
 - NÃO ADICIONE CAPÍTULOS EXTRAS
+- "dependencies": números dos capítulos anteriores cujo conteúdo o capítulo pressupõe (normalmente [N-1]); use [] só para o capítulo 1 ou capítulos realmente independentes
 """
         
         try:
@@ -601,17 +1200,14 @@ CRÍTICOS:
                 prompt=outline_prompt,
                 task_type=TaskType.ANALYSIS,
                 max_tokens=3000,
-                temperature=0.6
+                temperature=0.6,
+                use_cache=use_cache,
+                caller="orchestrator.outline",
+                validator=json_validator(["chapters"])
             )
             
             # Parse JSON
-            content = result["content"]
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            outline = json.loads(content)
+            outline = parse_json_response(result["content"])
             
             # Validação crítica das especificações do usuário
             actual_chapters = len(outline.get("chapters", []))
@@ -629,7 +1225,7 @@ CRÍTICOS:
                             "title": f"Capítulo {i}",
                             "description": "Conteúdo a ser desenvolvido",
                             "key_topics": [],
-                            "dependencies": [],
+                            "dependencies": None,  # Depende do anterior (linear)
                             "estimated_pages": pages_per_chapter or (total_pages // user_chapters)
                         })
             
@@ -672,7 +1268,8 @@ CRÍTICOS:
         outline: Dict[str, Any],
         book_id: Optional[str] = None,
         skip_research: bool = False,
-        writing_tone: str = "didatico"
+        writing_tone: str = "didatico",
+        resume: bool = False
     ) -> Dict[str, Any]:
         """
         Gera o livro completo baseado no outline
@@ -680,12 +1277,14 @@ CRÍTICOS:
         Este é o pipeline master que orquestra tudo:
         1. Cria subagentes para domínios detectados
         2. Executa pesquisa profunda
-        3. Gera cada capítulo sequencialmente
+        3. Gera os capítulos seguindo o grafo de dependências do outline
+           (independentes em paralelo, até BOOK_CHAPTER_CONCURRENCY)
         4. Estrutura tudo no RAG
         
         Args:
             outline: Outline gerado por generate_book_outline()
             book_id: ID opcional do livro (gerado se None)
+            resume: mantém capítulos concluídos e retoma os interrompidos (ver resume_book)
             
         Returns:
             Dict com status e book_id para tracking
@@ -693,22 +1292,40 @@ CRÍTICOS:
         if book_id is None:
             book_id = str(uuid.uuid4())
         
-        # Inicializar RAG para este livro
-        if book_id not in self.rag_systems:
-            self.rag_systems[book_id] = GraphRAG(book_id)
-        
-        # Registrar livro ativo
-        self.active_books[book_id] = {
-            "status": "generating",
-            "outline": outline,
-            "progress": {
-                "current_chapter": 0,
-                "total_chapters": outline["total_chapters"],
-                "chapters_completed": [],
-                "current_stage": "initializing"
-            },
-            "chapters": []
-        }
+        # Execução anterior do mesmo livro: capítulos com spec inalterada são reaproveitados
+        previous: Dict[int, Dict[str, Any]] = {}
+        if not resume and settings.book_incremental_regeneration:
+            previous_book = self._load_book(book_id)
+            if previous_book is not None:
+                previous = {
+                    ch["chapter_number"]: ch for ch in previous_book["chapters"] if ch.get("spec_hash")
+                }
+        
+        if resume and book_id in self.active_books:
+            self.active_books[book_id]["status"] = "generating"
+            self.active_books[book_id].pop("error", None)
+        else:
+            # Registrar livro ativo
+            self.active_books[book_id] = {
+                "status": "generating",
+                "outline": outline,
+                "params": {"skip_research": skip_research, "writing_tone": writing_tone},
+                "progress": {
+                    "current_chapter": 0,
+                    "total_chapters": outline["total_chapters"],
+                    "chapters_completed": [],
+                    "chapters_in_progress": [],
+                    "chapters_reused": [],
+                    "current_stage": "initializing"
+                },
+                "chapters": []
+            }
+        self._persist_book(book_id)
+        book_events.publish(book_id, "book_started", {
+            "title": outline.get("book_title"),
+            "total_chapters": outline["total_chapters"],
+            "resume": resume
+        })
         
         try:
             # Detectar e criar subagentes
@@ -729,39 +1346,23 @@ CRÍTICOS:
                             research_query=outline.get("refined_prompt", "")
                         )
             
-            # Gerar capítulos sequencialmente
-            chapters = outline.get("chapters", [])
-            
-            for chapter_info in chapters:
-                chapter_number = chapter_info["number"]
-                
-                # Atualizar progresso
-                self.active_books[book_id]["progress"]["current_chapter"] = chapter_number
-                self.active_books[book_id]["progress"]["current_stage"] = "generating"
-                
-                # Gerar capítulo usando workflow existente
-                result = await self.generate_chapter(
-                    book_id=book_id,
-                    chapter_number=chapter_number,
-                    chapter_title=chapter_info["title"],
-                    topic=outline.get("book_title", "Ebook"),
-                    target_audience=outline.get("target_audience", "profissionais"),
-                    total_chapters=outline["total_chapters"],
-                    skip_research=skip_research,
-                    writing_tone=writing_tone
-                )
-                
-                # Salvar capítulo
-                self.active_books[book_id]["chapters"].append(result)
-                self.active_books[book_id]["progress"]["chapters_completed"].append(chapter_number)
+            # Gerar capítulos respeitando as dependências do outline
+            await self._generate_chapters(book_id, outline, skip_research, writing_tone, resume, previous)
             
             # Marcar como completo
             self.active_books[book_id]["status"] = "completed"
             self.active_books[book_id]["progress"]["current_stage"] = "completed"
+            self._persist_book(book_id)
+            self.sweep_memory()
+            book_events.publish(book_id, "book_completed", {
+                "title": outline.get("book_title"),
+                "chapters": len(self.active_books[book_id]["chapters"])
+            })
             
             return {
                 "status": "completed",
                 "book_id": book_id,
+                "chapters_reused": len(self.active_books[book_id]["progress"].get("chapters_reused", [])),
                 "message": f"Livro '{outline.get('book_title')}' gerado com sucesso!"
             }
             
@@ -773,6 +1374,9 @@ CRÍTICOS:
             self.active_books[book_id]["status"] = "error"
             self.active_books[book_id]["error"] = str(e)
             self.active_books[book_id]["progress"]["current_stage"] = "failed"
+            self._persist_book(book_id)
+            self.sweep_memory()
+            book_events.publish(book_id, "book_failed", {"error": str(e)})
             
             return {
                 "status": "error",
@@ -780,17 +1384,348 @@ CRÍTICOS:
                 "error": str(e)
             }
     
+    def _chapter_dependencies(self, chapters: List[Dict[str, Any]]) -> Dict[int, List[int]]:
+        """
+        Grafo de dependências entre capítulos a partir do outline
+        Capítulo sem o campo "dependencies" depende do anterior (geração linear); só são
+        aceitas dependências para capítulos anteriores do outline, o que garante um DAG
+        Outline sem nenhuma dependência declarada (todas [] ou ausentes) é tratado como
+        linear: o LLM costuma copiar o [] do exemplo em vez de declarar capítulos independentes
+        """
+        graph: Dict[int, List[int]] = {}
+        previous: Optional[int] = None
+        declares_dependencies = any(chapter_info.get("dependencies") for chapter_info in chapters)
+        
+        for chapter_info in chapters:
+            number = chapter_info["number"]
+            declared = chapter_info.get("dependencies") if declares_dependencies else None
+            
+            if declared is None:
+                graph[number] = [previous] if previous is not None else []
+            else:
+                deps = []
+                for dep in declared:
+                    try:
+                        dep = int(dep)
+                    except (TypeError, ValueError):
+                        continue
+                    if dep in graph and dep not in deps:
+                        deps.append(dep)
+                graph[number] = deps
+            
+            previous = number
+        
+        return graph
+    
+    async def _generate_chapters(
+        self,
+        book_id: str,
+        outline: Dict[str, Any],
+        skip_research: bool,
+        writing_tone: str,
+        resume: bool = False,
+        previous: Optional[Dict[int, Dict[str, Any]]] = None
+    ):
+        """
+        Agenda os capítulos pelo grafo de dependências: um capítulo começa quando
+        todas as suas dependências terminaram, com até BOOK_CHAPTER_CONCURRENCY em paralelo
+        Ao retomar, capítulos já concluídos são mantidos e os demais continuam do checkpoint
+        previous: capítulos da execução anterior; os de spec inalterada (outline, parâmetros,
+        modelo e conteúdo das dependências) são reaproveitados sem chamar o LLM
+        """
+        book = self.active_books[book_id]
+        progress = book["progress"]
+        chapters = {ch["number"]: ch for ch in outline.get("chapters", [])}
+        graph = self._chapter_dependencies(list(chapters.values()))
+        width = max(1, settings.book_chapter_concurrency)
+        
+        results: Dict[int, Dict[str, Any]] = {}
+        if resume:
+            results = {ch["chapter_number"]: ch for ch in book["chapters"] if ch["chapter_number"] in graph}
+        progress["chapters_completed"] = [n for n in progress["chapters_completed"] if n in results]
+        
+        pending = {n: deps for n, deps in graph.items() if n not in results}
+        done: set = set(results)
+        running: Dict[asyncio.Task, int] = {}
+        specs: Dict[int, str] = {}
+        previous = previous or {}
+        depth_level = outline.get("depth_level", 3)
+        citation_style = outline.get("citation_style", "ABNT")
+        rag = self.rag_systems[book_id]
+        
+        # Capítulos que saíram do outline deixam de alimentar o RAG
+        stale = [n for n in previous if n not in graph and rag.remove_chapter(n)]
+        if stale and settings.checkpoint_enabled:
+            rag.save(str(rag_checkpoint_dir(book_id)))
+        
+        def update_progress():
+            in_progress = sorted(running.values())
+            progress["chapters_in_progress"] = in_progress
+            if in_progress:
+                progress["current_chapter"] = in_progress[0]
+        
+        try:
+            while pending or running:
+                ready = [n for n, deps in pending.items() if all(d in done for d in deps)]
+                
+                # Spec de cada capítulo liberado; inalterada = reaproveita a versão anterior
+                reused = []
+                for number in ready:
+                    specs[number] = self._chapter_spec_hash(
+                        outline, chapters[number], skip_research, writing_tone, depth_level, citation_style,
+                        [results[d] for d in graph[number]]
+                    )
+                    cached = previous.get(number)
+                    if cached and cached["spec_hash"] == specs[number] and cached.get("validation_passed"):
+                        del pending[number]
+                        results[number] = cached
+                        done.add(number)
+                        reused.append(number)
+                        progress["chapters_completed"].append(number)
+                        progress.setdefault("chapters_reused", []).append(number)
+                        book_events.publish(book_id, "chapter_reused", {"chapter": number, "title": cached["chapter_title"]})
+                if reused:
+                    book["chapters"] = [results[n] for n in sorted(results)]
+                    continue  # Dependentes podem ter sido liberados
+                
+                for number in ready[:width - len(running)]:
+                    chapter_info = chapters[number]
+                    del pending[number]
+                    book_events.publish(book_id, "chapter_started", {
+                        "chapter": number,
+                        "title": chapter_info["title"],
+                        "dependencies": graph[number]
+                    })
+                    if not resume:
+                        # Versão anterior sai do RAG antes de o capítulo ser regenerado
+                        rag.remove_chapter(number)
+                    running[asyncio.create_task(self.generate_chapter(
+                        book_id=book_id,
+                        chapter_number=number,
+                        chapter_title=chapter_info["title"],
+                        topic=outline.get("book_title", "Ebook"),
+                        target_audience=outline.get("target_audience", "profissionais"),
+                        total_chapters=outline["total_chapters"],
+                        depth_level=depth_level,
+                        citation_style=citation_style,
+                        skip_research=skip_research,
+                        writing_tone=writing_tone,
+                        dependencies=graph[number],
+                        resume=resume
+                    ))] = number
+                
+                if settings.research_prefetch_enabled and not skip_research:
+                    self._prefetch_research(book_id, outline, chapters, sorted(running.values()) + sorted(pending))
+                
+                update_progress()
+                progress["current_stage"] = "generating"
+                self._persist_book(book_id)
+                
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    number = running.pop(task)
+                    results[number] = {**task.result(), "spec_hash": specs.get(number)}
+                    research_prefetcher.discard(book_id, number)
+                    done.add(number)
+                    progress["chapters_completed"].append(number)
+                    # Capítulos salvos na ordem do livro, não na de conclusão
+                    book["chapters"] = [results[n] for n in sorted(results)]
+                    book_events.publish(book_id, "chapter_completed", {"chapter": number, **results[number]})
+                
+                update_progress()
+                self._persist_book(book_id)
+                book_events.publish(book_id, "progress", {
+                    "completed": len(done),
+                    "total_chapters": len(graph),
+                    "chapters_in_progress": progress["chapters_in_progress"]
+                })
+        finally:
+            # Falha fatal num capítulo interrompe os demais
+            for task in running:
+                task.cancel()
+            research_prefetcher.discard(book_id)
+    
+    def _chapter_spec_hash(
+        self,
+        outline: Dict[str, Any],
+        chapter_info: Dict[str, Any],
+        skip_research: bool,
+        writing_tone: str,
+        depth_level: int,
+        citation_style: str,
+        dependencies: List[Dict[str, Any]]
+    ) -> str:
+        """
+        Hash de tudo que determina o capítulo gerado: entrada do outline, dados do livro
+        usados no prompt, parâmetros, configuração de modelos e conteúdo das dependências
+        Dependência regenerada muda de conteúdo e invalida os capítulos que dependem dela
+        """
+        spec = {
+            "chapter": chapter_info,
+            "book": {
+                "title": outline.get("book_title"),
+                "target_audience": outline.get("target_audience")
+            },
+            "params": {
+                "skip_research": skip_research,
+                "writing_tone": writing_tone,
+                "depth_level": depth_level,
+                "citation_style": citation_style
+            },
+            "model": {
+                "mode": settings.chapter_generation_mode,
+                "route": llm_client.providers.route_for_caller("orchestrator.chapter"),
+                "cascade": llm_client.cascade_for(TaskType.GENERATION)
+            },
+            "dependencies": {
+                str(dep["chapter_number"]): hashlib.sha256((dep.get("content") or "").encode("utf-8")).hexdigest()
+                for dep in dependencies
+            }
+        }
+        encoded = json.dumps(spec, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+    
+    def _prefetch_research(
+        self,
+        book_id: str,
+        outline: Dict[str, Any],
+        chapters: Dict[int, Dict[str, Any]],
+        upcoming: List[int]
+    ):
+        """
+        Antecipa a pesquisa dos capítulos em execução e dos próximos do outline, mantendo
+        no máximo BOOK_CHAPTER_CONCURRENCY + RESEARCH_PREFETCH_LOOKAHEAD pesquisas não consumidas
+        A pesquisa é especulativa: se o capítulo não tiver lacunas, o resultado é descartado
+        """
+        limit = max(1, settings.book_chapter_concurrency) + settings.research_prefetch_lookahead
+        topic = outline.get("book_title", "Ebook")
+        
+        for number in upcoming:
+            if research_prefetcher.pending(book_id) >= limit:
+                break
+            research_prefetcher.schedule(book_id, number, self._research_query(topic, chapters[number]["title"]))
+    
+    def _persist_book(self, book_id: str):
+        """Grava o registro do livro no store de checkpoints"""
+        if not settings.checkpoint_enabled:
+            return
+        try:
+            book_store.save(book_id, self.active_books[book_id])
+        except Exception as e:
+            # Falha de persistência não interrompe a geração
+            print(f"⚠️ Falha ao salvar checkpoint do livro {book_id}: {e}")
+    
+    def _load_book(self, book_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Livro em memória ou, se despejado ou gerado por outro processo (worker da fila),
+        o registro mais recente no store, lido sem reidratar: o worker continua atualizando-o
+        """
+        book = self.active_books.peek(book_id)
+        if book is not None:
+            return self.active_books[book_id]
+        return book_store.load(book_id)
+    
+    def _restore_book(self, book_id: str) -> bool:
+        """Reidrata o livro do store para a memória (o RAG volta no primeiro acesso)"""
+        return self.active_books.get(book_id) is not None
+    
+    def _load_rag(self, book_id: str) -> GraphRAG:
+        """RAG do livro salvo em disco (checkpoint ou despejo da memória), ou vazio"""
+        rag = GraphRAG(book_id)
+        rag_dir = rag_checkpoint_dir(book_id)
+        if (rag_dir / f"{book_id}_graph.pkl").exists():
+            rag.load(str(rag_dir))
+        return rag
+    
+    def _is_generating(self, book_id: str) -> bool:
+        book = self.active_books.peek(book_id)
+        return book is not None and book["status"] == "generating"
+    
+    def sweep_memory(self) -> Dict[str, List[str]]:
+        """Despeja livros e RAGs ociosos ou além dos limites (persistidos antes)"""
+        return {
+            "books": self.active_books.sweep(),
+            "rag": self.rag_systems.sweep()
+        }
+    
+    def get_memory_usage(self) -> Dict[str, Any]:
+        """Memória estimada por livro (registro e RAG) e estatísticas dos registros"""
+        books = self.active_books.memory_usage()
+        rags = self.rag_systems.memory_usage()
+        
+        usage: Dict[str, Dict[str, Any]] = {}
+        for book_id in sorted(set(books) | set(rags)):
+            book = self.active_books.peek(book_id)
+            rag = self.rag_systems.peek(book_id)
+            usage[book_id] = {
+                "status": book["status"] if book else None,
+                "book_bytes": books.get(book_id, {}).get("bytes", 0),
+                "rag_bytes": rags.get(book_id, {}).get("bytes", 0),
+                "rag_vectors": rag.memory_usage()["vectors"] if rag else 0,
+                "idle_seconds": min(
+                    entry["idle_seconds"] for entry in (books.get(book_id), rags.get(book_id)) if entry
+                )
+            }
+        
+        return {
+            "books": usage,
+            "total_bytes": sum(entry["book_bytes"] + entry["rag_bytes"] for entry in usage.values()),
+            "registries": {
+                "books": self.active_books.get_stats(),
+                "rag": self.rag_systems.get_stats()
+            }
+        }
+    
+    async def resume_book(self, book_id: str) -> Dict[str, Any]:
+        """
+        Retoma a geração de um livro interrompido (queda do processo ou erro)
+        Capítulos concluídos são mantidos; os interrompidos continuam do último nó salvo
+        """
+        # Só o livro em memória conta: um registro "generating" no store é de um processo que caiu
+        if self._is_generating(book_id):
+            return {"status": "generating", "book_id": book_id, "message": "Geração já em andamento"}
+        
+        if not self._restore_book(book_id):
+            return {
+                "status": "not_found",
+                "error": f"Book ID {book_id} not found"
+            }
+        
+        book = self.active_books[book_id]
+        if book["status"] == "completed":
+            return {"status": "completed", "book_id": book_id, "message": "Livro já concluído"}
+        
+        params = book.get("params", {})
+        return await self.generate_full_book(
+            outline=book["outline"],
+            book_id=book_id,
+            skip_research=params.get("skip_research", False),
+            writing_tone=params.get("writing_tone", "didatico"),
+            resume=True
+        )
+    
+    def list_resumable_books(self) -> List[Dict[str, Any]]:
+        """Livros com geração interrompida registrados no store de checkpoints"""
+        if not settings.checkpoint_enabled:
+            return []
+        return [
+            book for book in book_store.list()
+            if book["status"] != "completed" and not (
+                self._is_generating(book["book_id"])
+            )
+        ]
+    
     def get_book_status(self, book_id: str) -> Dict[str, Any]:
         """
         Retorna status atual da geração do livro
         """
-        if book_id not in self.active_books:
+        book = self._load_book(book_id)
+        if book is None:
             return {
                 "status": "not_found",
                 "error": f"Book ID {book_id} not found"
             }
         
-        book = self.active_books[book_id]
         
         return {
             "status": book["status"],
@@ -803,13 +1738,13 @@ CRÍTICOS:
         """
         Retorna livro completo gerado
         """
-        if book_id not in self.active_books:
+        book = self._load_book(book_id)
+        if book is None:
             return {
                 "status": "not_found",
                 "error": f"Book ID {book_id} not found"
             }
         
-        book = self.active_books[book_id]
         
         return {
             "status": book["status"],
@@ -0,0 +1,93 @@
+"""
+Pesquisa antecipada (especulativa) dos próximos capítulos
+A consulta de pesquisa de um capítulo depende apenas do outline, então ela pode rodar
+em segundo plano enquanto os capítulos anteriores são gerados; o nó deep_research
+consome o resultado pronto em vez de pesquisar no caminho crítico
+"""
+from typing import Dict, Any, Optional, Tuple, Set
+import asyncio
+
+from agents.deep_research import research_agent
+
+
+class ResearchPrefetcher:
+    """Tarefas de pesquisa por (livro, capítulo), mantidas até o capítulo consumir o resultado"""
+
+    def __init__(self):
+        self.tasks: Dict[Tuple[str, int], Tuple[str, asyncio.Task]] = {}
+        self.scheduled: Set[Tuple[str, int]] = set()  # Capítulos já antecipados nesta execução
+        self.stats = {"scheduled": 0, "hits": 0, "misses": 0, "discarded": 0}
+
+    def pending(self, book_id: str) -> int:
+        """Pesquisas antecipadas do livro ainda não consumidas"""
+        return sum(1 for key in self.tasks if key[0] == book_id)
+
+    def schedule(self, book_id: str, chapter_number: int, query: str) -> bool:
+        """Inicia a pesquisa do capítulo em segundo plano (uma vez por capítulo)"""
+        key = (book_id, chapter_number)
+        if key in self.scheduled:
+            return False
+
+        task = asyncio.create_task(research_agent.research(
+            query=query,
+            academic_only=True,
+            max_results=10
+        ))
+        # Erro é tratado em take(); evita aviso de exceção não recuperada se for descartada
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self.tasks[key] = (query, task)
+        self.scheduled.add(key)
+        self.stats["scheduled"] += 1
+        return True
+
+    async def take(self, book_id: str, chapter_number: int, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Resultado antecipado da pesquisa do capítulo (aguarda se ainda estiver rodando)
+        None se não houve antecipação, a consulta mudou ou a pesquisa falhou
+        """
+        entry = self.tasks.pop((book_id, chapter_number), None)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        prefetched_query, task = entry
+        if prefetched_query != query:
+            task.cancel()
+            self.stats["misses"] += 1
+            return None
+
+        try:
+            # shield: cancelar o nó não deixa a tarefa órfã nem confunde o cancelamento
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        except Exception as e:
+            print(f"⚠️ Pesquisa antecipada do capítulo {chapter_number} falhou: {e}")
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        return result
+
+    def discard(self, book_id: str, chapter_number: Optional[int] = None):
+        """
+        Cancela as pesquisas não consumidas (capítulos que não precisaram de pesquisa)
+        Sem chapter_number encerra a execução do livro inteiro
+        """
+        for key in [key for key in self.tasks if key[0] == book_id]:
+            if chapter_number is not None and key[1] != chapter_number:
+                continue
+            _, task = self.tasks.pop(key)
+            task.cancel()
+            self.stats["discarded"] += 1
+
+        if chapter_number is None:
+            self.scheduled = {key for key in self.scheduled if key[0] != book_id}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "in_flight": len(self.tasks)}
+
+
+# Instância global
+research_prefetcher = ResearchPrefetcher()
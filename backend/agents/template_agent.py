@@ -4,37 +4,14 @@ Usa OpenAI (imagens + HTML/CSS) + OpenRouter (texto) com otimização de custos
 """
 from typing import Dict, Any, List, Optional
 import logging
-import json
 import openai
 from config.settings import settings
 from services.llm_client import llm_client, TaskType
+from agents.validators import json_validator, parse_json_response
+from services.metering import metering, MODEL_PRICING
 
 logger = logging.getLogger(__name__)
 
-# Tabela de preços por 1M tokens (aproximados, atualizar conforme necessário)
-MODEL_PRICING = {
-    # OpenAI
-    "gpt-4o": {"input": 2.50, "output": 10.00},
-    "gpt-4o-mini": {"input": 0.15, "output": 0.60},
-    "gpt-4-turbo": {"input": 10.00, "output": 30.00},
-    "gpt-3.5-turbo": {"input": 0.50, "output": 1.50},
-    "dall-e-3": {"per_image": 0.04},  # 1024x1024 standard
-    "dall-e-2": {"per_image": 0.02},  # 1024x1024
-    
-    # OpenRouter (via anthropic)
-    "anthrop ic/claude-3.5-sonnet": {"input": 3.00, "output": 15.00},
-    "anthropic/claude-3-haiku": {"input": 0.25, "output": 1.25},
-    "anthropic/claude-3-opus": {"input": 15.00, "output": 75.00},
-    
-    # OpenRouter (via google)
-    "google/gemini-pro-1.5": {"input": 0.00, "output": 0.00},  # Free tier
-    "google/gemini-flash-1.5": {"input": 0.00, "output": 0.00},  # Free tier
-    
-    # OpenRouter (via meta)
-    "meta-llama/llama-3.1-8b-instruct": {"input": 0.05, "output": 0.08},
-    "meta-llama/llama-3.1-70b-instruct": {"input": 0.35, "output": 0.40},
-}
-
 
 class TemplateAgent:
     """
@@ -147,8 +124,9 @@ class TemplateAgent:
     ) -> Dict[str, Any]:
         """Gera estrutura JSON do template (usa modelo mais barato)"""
         
-        # Escolher modelo mais barato para JSON
-        model = self._select_cheapest_model(task="json_generation")
+        # Com cascata configurada o LLM client começa pelo modelo barato e só escala
+        # se o JSON vier inválido; sem ela, escolhe o modelo mais barato para JSON
+        model = None if llm_client.cascade_for(TaskType.GENERATION) else self._select_cheapest_model(task="json_generation")
         
         prompt = f"""Gere um template de {template_type} com {pages} páginas no estilo {theme}.
 
@@ -179,30 +157,25 @@ Tipos disponíveis: page, chapter, image, textBlock, layout
 Seja criativo e profissional!"""
 
         # Gerar via LLM Client (usa fallback automático)
+        # Mesma entrada gera a mesma estrutura: reaproveita do cache
         response = await llm_client.generate(
             prompt=prompt,
             task_type=TaskType.GENERATION,
             model=model,
             max_tokens=2000,
-            temperature=0.7
+            temperature=0.7,
+            use_cache=True,
+            caller="template.structure",
+            validator=json_validator(["nodes"])
         )
         
-        content = response["content"]
-        
         # Parse JSON
-        template_data = json.loads(content)
-        
-        # Calcular custo
-        cost = self._calculate_cost(
-            model=response["model"],
-            input_tokens=response["tokens"].get("prompt_tokens", 500),
-            output_tokens=response["tokens"].get("completion_tokens", 1500)
-        )
+        template_data = parse_json_response(response["content"])
         
         return {
             "nodes": template_data.get("nodes", []),
             "edges": template_data.get("edges", []),
-            "cost": cost,
+            "cost": response.get("cost", 0.0),
             "model": response["model"]
         }
     
@@ -240,7 +213,15 @@ Seja criativo e profissional!"""
                 images[node["id"]] = response.data[0].url
                 
                 # Custo fixo por imagem
-                total_cost += MODEL_PRICING["dall-e-2"]["per_image"]
+                image_cost = MODEL_PRICING["dall-e-2"]["per_image"]
+                total_cost += image_cost
+                metering.record(
+                    caller="template.images",
+                    model="dall-e-2",
+                    provider="openai",
+                    cost=image_cost,
+                    images=1
+                )
                 
                 logger.info(f"Imagem gerada para {node['id']}: {image_prompt}")
                 
@@ -267,10 +248,12 @@ Seja criativo e profissional!"""
         html_map = {}
         total_cost = 0.0
         
-        # Gerar HTML para pages e chapters
-        for node in nodes:
-            if node["type"] in ["page", "chapter"]:
-                prompt = f"""Gere HTML elegante e moderno para {node['type']} com tema {theme}.
+        # Gerar HTML para pages e chapters (em lote, com concorrência limitada)
+        html_nodes = [node for node in nodes if node["type"] in ["page", "chapter"]]
+        requests = []
+        
+        for node in html_nodes:
+            prompt = f"""Gere HTML elegante e moderno para {node['type']} com tema {theme}.
 
 Título: {node['data'].get('title') or node['data'].get('label', '')}
 Conteúdo base: {node['data'].get('content', '')}
@@ -279,23 +262,25 @@ Retorne APENAS HTML sem tags <html>, <head> ou <body>.
 Use classes CSS inline ou estilos modernos.
 Seja profissional e bonito!"""
 
-                response = await llm_client.generate(
-                    prompt=prompt,
-                    task_type=TaskType.GENERATION,
-                    model=model,
-                    max_tokens=500,
-                    temperature=0.8
-                )
-                
-                html_map[node["id"]] = response["content"]
-                
-                cost = self._calculate_cost(
-                    model=response["model"],
-                    input_tokens=response["tokens"].get("prompt_tokens", 100),
-                    output_tokens=response["tokens"].get("completion_tokens", 300)
-                )
-                
-                total_cost += cost
+            requests.append({
+                "prompt": prompt,
+                "task_type": TaskType.GENERATION,
+                "model": model,
+                "max_tokens": 500,
+                "temperature": 0.8,
+                "caller": "template.html"
+            })
+        
+        batch = await llm_client.generate_many(requests)
+        
+        for node, response in zip(html_nodes, batch["results"]):
+            if response["status"] != "success":
+                # Node mantém o conteúdo base da estrutura
+                logger.warning(f"HTML não gerado para {node['id']}: {response['error']}")
+                continue
+            
+            html_map[node["id"]] = response["content"]
+            total_cost += response.get("cost", 0.0)
         
         return {
             "html": html_map,
@@ -320,29 +305,6 @@ Seja profissional e bonito!"""
         
         return "google/gemini-flash-1.5"  # Default mais barato
     
-    def _calculate_cost(
-        self,
-        model: str,
-        input_tokens: int,
-        output_tokens: int
-    ) -> float:
-        """Calcula custo em dólares"""
-        
-        # Normalizar nome do modelo
-        model_key = model.replace("::free", "").strip()
-        
-        if model_key not in MODEL_PRICING:
-            logger.warning(f"Pricing not found for {model_key}, assuming free")
-            return 0.0
-        
-        pricing = MODEL_PRICING[model_key]
-        
-        # Calcular (preço é por 1M tokens)
-        input_cost = (input_tokens / 1_000_000) * pricing.get("input", 0)
-        output_cost = (output_tokens / 1_000_000) * pricing.get("output", 0)
-        
-        return input_cost + output_cost
-    
     def _record_usage(self, result: Dict[str, Any]):
         """Registra uso no histórico"""
         
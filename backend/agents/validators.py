@@ -0,0 +1,71 @@
+"""
+Validadores de saída de LLM
+Usados pelo orquestrador (nó validate_content) e pela cascata de modelos do
+LLMClient, que só escala para um modelo mais forte quando a validação falha
+"""
+from typing import Any, Callable, Iterable
+import json
+
+# Tamanho mínimo de um capítulo utilizável
+MIN_CHAPTER_LENGTH = 500
+
+# Prefixo gravado pelo orquestrador quando a geração falha
+GENERATION_ERROR_PREFIX = "Erro na geração"
+
+
+def validate_chapter_content(content: str) -> bool:
+    """Capítulo gerado: não vazio, sem erro de geração e com tamanho mínimo"""
+
+    if not content or len(content) < MIN_CHAPTER_LENGTH:
+        return False
+
+    # TODO: Validações mais sofisticadas
+    # - Verificar citações
+    # - Checar contradições com capítulos anteriores
+    # - Validar estrutura
+    return not content.startswith(GENERATION_ERROR_PREFIX)
+
+
+def parse_json_response(content: str) -> Any:
+    """Extrai o JSON da resposta, removendo blocos de código markdown"""
+
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0].strip()
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0].strip()
+    return json.loads(content)
+
+
+def json_validator(required_keys: Iterable[str] = ()) -> Callable[[str], bool]:
+    """Validador de resposta JSON (objeto) contendo as chaves obrigatórias"""
+
+    keys = tuple(required_keys)
+
+    def validate(content: str) -> bool:
+        try:
+            data = parse_json_response(content)
+        except (ValueError, IndexError):
+            return False
+        return isinstance(data, dict) and all(data.get(key) for key in keys)
+
+    return validate
+
+
+def text_validator(min_words: int = 50) -> Callable[[str], bool]:
+    """Validador de texto livre com número mínimo de palavras"""
+
+    def validate(content: str) -> bool:
+        return bool(content) and len(content.split()) >= min_words
+
+    return validate
+
+
+def section_validator(min_words: int = 150) -> Callable[[str], bool]:
+    """Validador de uma seção do capítulo (modo de geração por seções)"""
+
+    def validate(content: str) -> bool:
+        if not content or content.startswith(GENERATION_ERROR_PREFIX):
+            return False
+        return len(content.split()) >= min_words
+
+    return validate
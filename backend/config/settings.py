@@ -4,7 +4,7 @@ Carrega variáveis do .env e fornece validação de tipos.
 """
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
-from typing import Optional
+from typing import Optional, Dict, List
 import os
 
 
@@ -20,15 +20,34 @@ class Settings(BaseSettings):
     
     # OpenRouter API
     openrouter_api_key: str = Field(default="", description="OpenRouter API Key")
+    openrouter_api_keys: str = Field(default="", description="Chaves adicionais separadas por vírgula")
     openrouter_base_url: str = Field(default="https://openrouter.ai/api/v1")
     
     # OpenAI API
     openai_api_key: str = Field(default="", description="OpenAI API Key")
+    openai_api_keys: str = Field(default="", description="Chaves adicionais separadas por vírgula")
     openai_base_url: str = Field(default="https://api.openai.com/v1")
     
     # Gemini API
     gemini_api_key: str = Field(default="", description="Gemini API Key")
+    gemini_api_keys: str = Field(default="", description="Chaves adicionais separadas por vírgula (somente REST)")
+    gemini_base_url: str = Field(default="https://generativelanguage.googleapis.com/v1beta")
+    gemini_default_model: str = Field(default="gemini-1.5-pro", description="Modelo usado quando nenhum é informado")
+    gemini_use_rest: bool = Field(default=True, description="Chama a API REST no pool HTTP; false usa o SDK")
+    gemini_executor_workers: int = Field(default=4, description="Threads do executor dedicado ao SDK do Gemini")
     
+    # Local LLM (servidor compatível com OpenAI na rede local: vLLM, llama.cpp, Ollama...)
+    local_llm_base_url: str = Field(default="", description="Ex.: http://192.168.0.10:8000/v1 (vazio desativa)")
+    local_llm_api_key: str = Field(default="", description="Chave opcional do servidor local")
+    local_llm_model: str = Field(default="", description="Modelo usado nas rotas locais (ex.: local/llama-3.1-8b-instruct)")
+    local_llm_model_patterns: List[str] = Field(default=["local/*"], description="Padrões de modelo atendidos pelo servidor local")
+    local_llm_callers: List[str] = Field(
+        default=["api.topic", "mermaid", "template.structure"],
+        description="Consumidores roteados para o servidor local quando não informam modelo"
+    )
+    local_llm_max_in_flight: int = Field(default=4, description="Chamadas simultâneas no servidor local")
+    local_llm_stream_usage: bool = Field(default=True, description="Servidor aceita stream_options.include_usage")
+
     # Pixabay API
     pixabay_api_key: str = Field(default="", description="Pixabay API Key")
     
@@ -39,8 +58,138 @@ class Settings(BaseSettings):
     research_model: str = Field(default="anthropic/claude-3-haiku")
     generation_model: str = Field(default="google/gemini-pro-1.5")
     image_model: str = Field(default="black-forest-labs/flux-schnell")
-    model_timeout: int = Field(default=3, description="Timeout em segundos")
-    
+    model_timeout: int = Field(default=3, description="Timeout padrão do pool HTTP (chamadas de LLM usam timeouts adaptativos)")
+
+    # LLM Adaptive Timeouts (derivados do TTFT e tokens/s observados por modelo e tarefa)
+    llm_timeout_floor: float = Field(default=5.0, description="Timeout mínimo em segundos")
+    llm_timeout_ceiling: float = Field(default=180.0, description="Timeout máximo em segundos")
+    llm_timeout_multiplier: float = Field(default=2.0, description="Margem sobre a duração esperada")
+    llm_timeout_prior_ttft: float = Field(default=3.0, description="TTFT assumido sem histórico")
+    llm_timeout_prior_tokens_per_sec: float = Field(default=30.0, description="Tokens/s assumidos sem histórico")
+    llm_timeout_min_samples: int = Field(default=3, description="Amostras para confiar no perfil observado")
+    llm_stream_idle_timeout: float = Field(default=30.0, description="Silêncio máximo entre trechos de um stream")
+
+    # HTTP Connection Pool (LLM providers)
+    http_max_connections: int = Field(default=50, description="Máximo de conexões por provider")
+    http_max_keepalive_connections: int = Field(default=20, description="Conexões ociosas mantidas abertas")
+    http_keepalive_expiry: float = Field(default=60.0, description="Segundos até fechar conexão ociosa")
+    http_connect_timeout: float = Field(default=10.0, description="Timeout de conexão em segundos")
+    http_enable_http2: bool = Field(default=False, description="Usa HTTP/2 (requer pacote h2)")
+
+    # LLM Response Cache
+    llm_cache_enabled: bool = Field(default=True, description="Habilita o cache de respostas de LLM")
+    llm_cache_max_entries: int = Field(default=512, description="Entradas mantidas no LRU em memória")
+    llm_cache_ttl: int = Field(default=7 * 24 * 3600, description="Validade das entradas em segundos (0 = sem expiração)")
+    llm_cache_dir: str = Field(default="data/llm_cache", description="Diretório do cache em disco (relativo ao backend)")
+    llm_cache_max_temperature: float = Field(default=0.3, description="Chamadas com temperatura até este valor usam cache por padrão")
+    llm_singleflight_enabled: bool = Field(default=True, description="Agrupa chamadas idênticas concorrentes numa única execução")
+
+    # LLM Hedged Requests
+    llm_hedging_enabled: bool = Field(default=False, description="Hedging padrão para chamadas sem parâmetro explícito")
+    llm_hedge_percentile: float = Field(default=0.95, description="Percentil de latência que dispara o hedge")
+    llm_hedge_default_delay: float = Field(default=8.0, description="Limiar em segundos enquanto não há amostras suficientes")
+    llm_hedge_min_delay: float = Field(default=1.0, description="Limiar mínimo em segundos")
+    llm_hedge_min_samples: int = Field(default=10, description="Amostras necessárias para usar o percentil")
+    llm_hedge_budget: Dict[str, float] = Field(
+        default={"research": 0.2, "analysis": 0.1, "generation": 0.1},
+        description="Fração máxima de chamadas com hedge por tipo de tarefa"
+    )
+
+    # LLM Model Cascade
+    llm_cascade_enabled: bool = Field(default=False, description="Chamadas com validador tentam primeiro o modelo barato da cascata (muda o modelo que gera cada capítulo)")
+    llm_cascade: Dict[str, List[str]] = Field(
+        default={
+            "research": ["meta-llama/llama-3.1-8b-instruct", "anthropic/claude-3-haiku"],
+            "analysis": ["google/gemini-flash-1.5", "anthropic/claude-3.5-sonnet"],
+            "generation": ["google/gemini-flash-1.5", "anthropic/claude-3.5-sonnet"]
+        },
+        description="Modelos por tipo de tarefa, do mais barato ao mais forte; escala só se a validação falhar"
+    )
+
+    # Model Health / Circuit Breaker
+    model_health_ewma_alpha: float = Field(default=0.3, description="Peso da amostra mais recente nas médias EWMA")
+    model_health_window: int = Field(default=100, description="Chamadas recentes usadas em percentis e taxa de erro")
+    model_health_prior_latency: float = Field(default=5.0, description="Latência assumida para modelos sem histórico")
+    circuit_failure_threshold: int = Field(default=3, description="Falhas consecutivas que abrem o circuito")
+    circuit_error_rate_threshold: float = Field(default=0.5, description="Taxa de erro que abre o circuito")
+    circuit_min_calls: int = Field(default=10, description="Chamadas mínimas antes de avaliar a taxa de erro")
+    circuit_cooldown: float = Field(default=60.0, description="Segundos com o circuito aberto antes do teste")
+
+    # LLM Rate Limits (por provider; rpm/tpm <= 0 desativa o bucket)
+    llm_rate_limits: Dict[str, Dict[str, float]] = Field(
+        default={
+            "openrouter": {"rpm": 200, "tpm": 0, "max_in_flight": 16, "max_in_flight_per_key": 8},
+            "openai": {"rpm": 500, "tpm": 200000, "max_in_flight": 16, "max_in_flight_per_key": 8},
+            "google": {"rpm": 60, "tpm": 1000000, "max_in_flight": 8, "max_in_flight_per_key": 4},
+        },
+        description="Requisições/min, tokens/min e chamadas simultâneas por provider e por chave"
+    )
+    rate_limit_default_backoff: float = Field(default=5.0, description="Pausa após 429 sem Retry-After")
+
+    # LLM Key Pools (várias chaves por provider)
+    llm_key_selection: str = Field(default="least_loaded", description="least_loaded ou round_robin")
+    llm_key_quota_quarantine: float = Field(default=900.0, description="Quarentena em segundos após cota esgotada")
+    llm_key_invalid_quarantine: float = Field(default=3600.0, description="Quarentena em segundos após 401/403")
+
+    # LLM Retry Policy (retries no mesmo modelo antes do fallback)
+    llm_retry_enabled: bool = Field(default=True, description="Repete erros transitórios no mesmo modelo")
+    llm_retry_rules: Dict[str, Dict[str, float]] = Field(
+        default={},
+        description="Sobrescreve regras por classe (rate_limit, overloaded, bad_gateway, server_error, connection, timeout)"
+    )
+    llm_retry_max_wait: float = Field(default=10.0, description="Esperas maiores seguem direto para o fallback")
+    llm_retry_budget_ratio: float = Field(default=0.2, description="Retries permitidos por chamada nova")
+    llm_retry_budget_capacity: float = Field(default=20.0, description="Saldo máximo de retries acumulado")
+    llm_batch_max_concurrency: int = Field(default=4, description="Concorrência padrão de LLMClient.generate_many")
+
+    # LLM Metering (ledger de tokens e custos)
+    metering_enabled: bool = Field(default=True, description="Grava cada chamada de LLM no ledger")
+    metering_dir: str = Field(default="data/metering", description="Diretório do ledger JSONL (relativo ao backend)")
+
+    # Book Generation
+    book_chapter_concurrency: int = Field(default=3, description="Capítulos independentes (sem dependência no outline) gerados em paralelo")
+    research_prefetch_enabled: bool = Field(default=True, description="Pesquisa dos próximos capítulos em segundo plano enquanto os atuais são gerados")
+    research_prefetch_lookahead: int = Field(default=2, description="Capítulos ainda não iniciados cuja pesquisa pode ser antecipada")
+    chapter_max_continuations: int = Field(default=2, description="Continuações de um capítulo cortado por max_tokens (finish_reason length), em vez de regenerá-lo")
+    chapter_output_token_budget: int = Field(default=12000, description="Tokens de saída por capítulo somando a geração e as continuações")
+    chapter_continuation_tail_chars: int = Field(default=2000, description="Caracteres finais do texto enviados no prompt de continuação")
+    chapter_continuation_min_tokens: int = Field(default=300, description="Orçamento restante mínimo para valer uma nova continuação")
+    chapter_generation_mode: str = Field(default="single", description="single (capítulo numa única chamada) ou sections (esqueleto, seções em paralelo e costura)")
+    chapter_section_concurrency: int = Field(default=3, description="Seções de um capítulo escritas em paralelo (modo sections)")
+    chapter_section_words: int = Field(default=600, description="Tamanho alvo de cada seção em palavras (modo sections)")
+    chapter_section_max_tokens: int = Field(default=1500, description="Limite de tokens de saída por seção (modo sections)")
+    chapter_section_retries: int = Field(default=1, description="Novas tentativas de uma seção reprovada na validação (modo sections)")
+    chapter_stitch_enabled: bool = Field(default=True, description="Passada de costura com transições entre as seções (modo sections)")
+    book_incremental_regeneration: bool = Field(default=True, description="Nova geração de um livro existente reaproveita capítulos cuja spec (outline, parâmetros, modelo, dependências) não mudou")
+    checkpoint_enabled: bool = Field(default=True, description="Salva o estado do grafo após cada nó e o progresso do livro para retomar após queda")
+    checkpoint_dir: str = Field(default="data/checkpoints", description="Diretório do SQLite de checkpoints e do RAG salvo por livro (relativo ao backend)")
+
+    # Memória (livros e RAGs ociosos são persistidos e saem da memória; voltam sob demanda)
+    book_memory_max_books: int = Field(default=20, description="Registros de livros mantidos em memória (LRU)")
+    rag_memory_max_books: int = Field(default=5, description="RAGs (mental graph + FAISS) mantidos em memória (LRU)")
+    book_memory_ttl: float = Field(default=1800, description="Segundos sem acesso até um livro/RAG ocioso sair da memória")
+    book_memory_sweep_interval: float = Field(default=300, description="Segundos entre varreduras periódicas que aplicam o TTL da memória (0 desativa)")
+
+    # Book Events (stream SSE de progresso por livro)
+    book_events_enabled: bool = Field(default=True, description="Publica eventos de nó, progresso e texto parcial em /api/book/{book_id}/events")
+    book_events_db: str = Field(default="data/events/book_events.sqlite", description="Log SQLite de eventos, compartilhado com os workers (relativo ao backend)")
+    book_events_stream_text: bool = Field(default=False, description="Gera capítulos em streaming publicando o texto parcial (com a cascata ativa, o modelo escala só pelas novas tentativas do grafo)")
+    book_events_partial_interval: float = Field(default=0.5, description="Intervalo mínimo (s) entre eventos de texto parcial de um capítulo")
+    book_events_poll_interval: float = Field(default=0.3, description="Intervalo (s) de leitura do log pelo endpoint SSE")
+    book_events_retention_hours: int = Field(default=72, description="Eventos mais antigos são removidos do log")
+
+    # Job Queue (geração de livros, capítulos, outlines, pesquisa e exportação fora do processo web)
+    job_queue_backend: str = Field(default="sqlite", description="Backend da fila (sqlite ou um broker registrado em services/job_queue.py)")
+    job_queue_db: str = Field(default="data/jobs/jobs.sqlite", description="Banco SQLite da fila (relativo ao backend)")
+    job_worker_mode: str = Field(default="process", description="process (workers em processos próprios), inline (no loop do servidor) ou external (python job_worker.py)")
+    job_worker_processes: int = Field(default=1, description="Processos de worker iniciados com o servidor no modo process")
+    job_worker_concurrency: int = Field(default=2, description="Jobs simultâneos por processo de worker")
+    job_max_attempts: int = Field(default=3, description="Tentativas antes de mover o job para dead-letter")
+    job_retry_base_delay: float = Field(default=30.0, description="Espera antes da 2ª tentativa em segundos (dobra a cada falha)")
+    job_retry_max_delay: float = Field(default=600.0, description="Teto da espera entre tentativas em segundos")
+    job_lease_seconds: float = Field(default=120.0, description="Lease do worker; job sem heartbeat nesse prazo volta para a fila")
+    job_poll_interval: float = Field(default=1.0, description="Intervalo de consulta à fila quando ociosa, em segundos")
+
     # Application
     backend_port: int = Field(default=8000)
     frontend_port: int = Field(default=5173)
@@ -0,0 +1,58 @@
+"""
+Processo de worker da fila de jobs
+Executa jobs de livro, capítulo, outline, pesquisa e exportação num event loop
+separado do servidor web
+
+Uso:
+    python job_worker.py --concurrency 2
+
+Com JOB_WORKER_MODE=process o servidor inicia JOB_WORKER_PROCESSES destes processos;
+com JOB_WORKER_MODE=external eles são iniciados à parte (inclusive em outros hosts,
+com um backend de fila compartilhado).
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from config.settings import settings
+from services.job_queue import job_queue
+from services.http_pool import http_pool
+from services.llm_client import llm_client
+from agents.job_handlers import register_job_handlers
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("job_worker")
+
+
+async def main(concurrency: int):
+    register_job_handlers(job_queue)
+    job_queue.start(concurrency)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows: encerra por KeyboardInterrupt
+
+    logger.info(f"Worker {job_queue.worker_id} aguardando jobs")
+    try:
+        await stop.wait()
+    finally:
+        # Jobs interrompidos voltam para a fila quando o lease vencer
+        await job_queue.stop()
+        await http_pool.aclose()
+        llm_client.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker da fila de jobs")
+    parser.add_argument("--concurrency", type=int, default=settings.job_worker_concurrency)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args.concurrency))
+    except KeyboardInterrupt:
+        pass
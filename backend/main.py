@@ -2,17 +2,19 @@
 FastAPI Application Principal
 Endpoints para geração de ebooks, pesquisa, imagens e configuração
 """
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator
 import uvicorn
 import json
 import os
+import asyncio
 import httpx
 import traceback
 import logging
+from contextlib import asynccontextmanager, suppress
 from datetime import datetime
 
 from config.settings import settings
@@ -21,16 +23,61 @@ from api.backup import router as backup_router
 from routes.templates import router as templates_router
 from routes.diagrams import router as diagrams_router
 from agents.orchestrator import orchestrator
+from agents.validators import text_validator
 from services.llm_client import llm_client, TaskType
+from services.http_pool import http_pool
+from services.job_queue import job_queue, worker_processes
+from services.book_events import book_events
+from agents.job_handlers import register_job_handlers
 
 # Configuração de Logs
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+async def memory_sweep_loop(interval: float):
+    """Aplica o TTL da memória periodicamente, sem depender de novas inserções"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # No próprio loop: os registros LRU não têm lock e são alterados pelas rotas
+            evicted = orchestrator.sweep_memory()
+            if evicted["books"] or evicted["rag"]:
+                logger.info(f"Varredura de memória: {len(evicted['books'])} livro(s), {len(evicted['rag'])} RAG(s) despejados")
+        except Exception as e:
+            logger.warning(f"Falha na varredura periódica de memória: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ciclo de vida da aplicação: inicia os workers da fila e libera recursos no shutdown"""
+    register_job_handlers(job_queue)
+    if settings.job_worker_mode == "inline":
+        job_queue.start()
+    elif settings.job_worker_mode == "process":
+        worker_processes.start()
+    sweeper = None
+    if settings.book_memory_sweep_interval > 0:
+        sweeper = asyncio.create_task(memory_sweep_loop(settings.book_memory_sweep_interval))
+    
+    yield
+    
+    if sweeper:
+        sweeper.cancel()
+        with suppress(asyncio.CancelledError):
+            await sweeper
+    await job_queue.stop()
+    worker_processes.stop()
+    # Fechar pools HTTP dos providers de LLM
+    await http_pool.aclose()
+    llm_client.shutdown()
+
+
 app = FastAPI(
     title="Ebook Generator API",
     description="API para geração de ebooks técnicos de alta qualidade com RAG e agentes inteligentes",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS
@@ -232,17 +279,20 @@ class ChapterConfig(BaseModel):
     chapter_title: str
     topic: str
     context: Optional[str] = None
+    book_id: Optional[str] = None  # Livro do capítulo (RAG, checkpoints e eventos)
 
 
 class PromptRequest(BaseModel):
     """Request para otimização de prompt"""
     user_prompt: str
+    use_cache: bool = True
 
 
 class OutlineRequest(BaseModel):
     """Request para geração de outline"""
     prompt: str
     target_audience: str = "profissionais"
+    use_cache: bool = True
 
 
 class TopicRequest(BaseModel):
@@ -280,6 +330,21 @@ class ConnectionTest(BaseModel):
     message: Optional[str] = None
 
 
+# ==================== Server-Sent Events ====================
+
+# Evita buffering em proxies (nginx) e caches intermediários
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+
+def sse_event(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """Formata um evento no protocolo text/event-stream"""
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 # ==================== Health Check ====================
 
 @app.get("/api/health")
@@ -419,7 +484,7 @@ async def generate_chapter(request: ChapterConfig):
     """Gera um capítulo específico baseado no outline"""
     try:
         result = await orchestrator.generate_chapter(
-            book_id=f"book_{request.chapter_number}",  # TODO: ID real do livro
+            book_id=request.book_id or f"book_{request.chapter_number}",  # TODO: ID real do livro
             chapter_number=request.chapter_number,
             chapter_title=request.chapter_title,
             topic=request.topic,
@@ -436,12 +501,40 @@ async def generate_chapter(request: ChapterConfig):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/book/generate-chapter/stream")
+async def generate_chapter_stream(request: ChapterConfig):
+    """
+    Gera um capítulo via server-sent events (tokens chegam conforme são gerados)
+    Sem book_id o capítulo ganha um livro novo, informado no evento final
+    """
+    import uuid
+    
+    book_id = request.book_id or str(uuid.uuid4())
+    
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event in orchestrator.stream_chapter(
+                book_id=book_id,
+                chapter_number=request.chapter_number,
+                chapter_title=request.chapter_title,
+                topic=request.topic,
+                target_audience=request.context or "estudantes de graduação"
+            ):
+                yield sse_event(event.pop("event"), event)
+        except Exception as e:
+            logger.error(f"Erro ao gerar capítulo (stream): {e}")
+            logger.error(traceback.format_exc())
+            yield sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @app.post("/api/prompt/optimize")
 async def optimize_prompt(request: PromptRequest):
     """
     Otimiza o prompt do usuário usando LLM
     """
-    return await orchestrator.optimize_prompt(request.user_prompt)
+    return await orchestrator.optimize_prompt(request.user_prompt, use_cache=request.use_cache)
 
 
 @app.post("/api/book/generate-outline")
@@ -451,12 +544,13 @@ async def generate_outline(request: OutlineRequest):
     """
     return await orchestrator.generate_book_outline(
         prompt=request.prompt,
-        target_audience=request.target_audience
+        target_audience=request.target_audience,
+        use_cache=request.use_cache
     )
 
 
 @app.post("/api/book/generate-full")
-async def generate_full_book(request: FullBookRequest, background_tasks: BackgroundTasks):
+async def generate_full_book(request: FullBookRequest):
     """
     Inicia a geração completa do livro em background
     """
@@ -464,18 +558,22 @@ async def generate_full_book(request: FullBookRequest, background_tasks: Backgro
     
     book_id = request.book_id or str(uuid.uuid4())
     
-    # Executar em background para não bloquear
-    background_tasks.add_task(
-        orchestrator.generate_full_book,
-        outline=request.outline,
-        book_id=book_id,
-        skip_research=request.skip_research,
-        writing_tone=request.writing_tone
+    # Fila durável: executada pelos workers, fora do event loop das requisições
+    job = await job_queue.enqueue(
+        "book",
+        {
+            "outline": request.outline,
+            "book_id": book_id,
+            "skip_research": request.skip_research,
+            "writing_tone": request.writing_tone
+        },
+        key=book_id
     )
     
     return {
         "status": "started",
         "book_id": book_id,
+        "job_id": job.id,
         "message": "Geração iniciada em background"
     }
 
@@ -488,6 +586,117 @@ async def get_book_status(book_id: str):
     return orchestrator.get_book_status(book_id)
 
 
+@app.get("/api/book/resumable")
+async def list_resumable_books():
+    """
+    Livros com geração interrompida (queda do processo ou erro) que podem ser retomados
+    """
+    # Livros com job na fila ou em execução não estão interrompidos
+    books = [
+        book for book in orchestrator.list_resumable_books()
+        if await job_queue.active_job("book", book["book_id"]) is None
+    ]
+    return {
+        "status": "success",
+        "books": books
+    }
+
+
+@app.post("/api/book/{book_id}/resume")
+async def resume_book(book_id: str):
+    """
+    Retoma a geração de um livro a partir do último checkpoint
+    Capítulos concluídos são mantidos; os interrompidos continuam do último nó salvo
+    """
+    status = orchestrator.get_book_status(book_id)
+    if status.get("status") == "not_found":
+        raise HTTPException(status_code=404, detail=status["error"])
+    
+    active = await job_queue.active_job("book", book_id)
+    if status["status"] == "completed" or active is not None:
+        return {
+            "status": status["status"],
+            "book_id": book_id,
+            "job_id": active.id if active else None,
+            "message": "Nada a retomar"
+        }
+    
+    job = await job_queue.enqueue("book", {"book_id": book_id, "outline": status["outline"], "resume": True}, key=book_id)
+    
+    return {
+        "status": "resuming",
+        "book_id": book_id,
+        "job_id": job.id,
+        "chapters_completed": status["progress"].get("chapters_completed", []),
+        "message": "Geração retomada em background"
+    }
+
+
+# ==================== Job Queue Endpoints ====================
+
+class JobRequest(BaseModel):
+    """Job a enfileirar (kind: outline, chapter, book, research, export)"""
+    kind: str
+    payload: Dict[str, Any] = {}
+    key: Optional[str] = None
+    priority: Optional[int] = None
+    max_attempts: Optional[int] = None
+
+
+@app.post("/api/jobs")
+async def enqueue_job(request: JobRequest):
+    """Enfileira um job; com key, devolve o job ativo existente em vez de duplicar"""
+    if request.kind not in job_queue.handlers:
+        raise HTTPException(status_code=400, detail=f"Tipo de job desconhecido: {request.kind}")
+    
+    job = await job_queue.enqueue(
+        request.kind,
+        request.payload,
+        key=request.key,
+        priority=request.priority,
+        max_attempts=request.max_attempts
+    )
+    return {"status": "success", "job": job.describe()}
+
+
+@app.get("/api/jobs")
+async def list_jobs(status: Optional[str] = None, kind: Optional[str] = None, key: Optional[str] = None, limit: int = 100):
+    """Lista jobs (mais recentes primeiro); status=dead mostra a dead-letter"""
+    jobs = await job_queue.list(status=status, kind=kind, key=key, limit=min(max(1, limit), 1000))
+    return {"status": "success", "count": len(jobs), "jobs": [job.describe() for job in jobs]}
+
+
+@app.get("/api/jobs/stats")
+async def get_job_stats():
+    """Jobs por tipo e estado, workers locais e processos de worker"""
+    return {"status": "success", "stats": await job_queue.get_stats()}
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Estado, tentativas, erro e resultado de um job"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return {"status": "success", "job": job.describe()}
+
+
+@app.post("/api/jobs/{job_id}/retry")
+async def retry_job(job_id: str):
+    """Devolve um job da dead-letter (ou cancelado) à fila"""
+    if not await job_queue.requeue(job_id):
+        raise HTTPException(status_code=409, detail="Só jobs mortos ou cancelados podem ser reenfileirados")
+    return {"status": "success", "job": (await job_queue.get(job_id)).describe()}
+
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancela um job que ainda não começou"""
+    if not await job_queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Só jobs na fila podem ser cancelados")
+    return {"status": "success", "job": (await job_queue.get(job_id)).describe()}
+
+
 @app.get("/api/book/{book_id}")
 async def get_book(book_id: str):
     """
@@ -496,20 +705,14 @@ async def get_book(book_id: str):
     return orchestrator.get_book(book_id)
 
 
-@app.post("/api/chapter/generate-topic")
-async def generate_topic(request: TopicRequest):
-    """
-    Gera conteúdo para um tópico específico do capítulo
-    """
-    try:
-        logger.info(f"Gerando tópico: {request.topic_title} (Capítulo {request.chapter_number})")
-        
-        # Obter instruções de tom de escrita
-        from config.reliable_sources import get_writing_tone_instructions
-        tone_instructions = get_writing_tone_instructions(request.writing_tone)
-        
-        # Construir prompt para o tópico
-        prompt = f"""
+def build_topic_prompt(request: TopicRequest) -> str:
+    """Constrói o prompt de geração de um tópico do capítulo"""
+    
+    # Obter instruções de tom de escrita
+    from config.reliable_sources import get_writing_tone_instructions
+    tone_instructions = get_writing_tone_instructions(request.writing_tone)
+    
+    return f"""
 Você está escrevendo o {request.topic_title} do Capítulo {request.chapter_number}: "{request.chapter_title}" 
 do livro sobre "{request.book_topic}".
 
@@ -530,12 +733,27 @@ REGRAS:
 Tópico a gerar: {request.topic_title}
 """
 
-        # Gerar conteúdo
+
+@app.post("/api/chapter/generate-topic")
+async def generate_topic(request: TopicRequest):
+    """
+    Gera conteúdo para um tópico específico do capítulo
+    """
+    try:
+        logger.info(f"Gerando tópico: {request.topic_title} (Capítulo {request.chapter_number})")
+        
+        # Construir prompt para o tópico
+        prompt = build_topic_prompt(request)
+
+        # Gerar conteúdo (endpoint interativo: latência de cauda importa mais que custo extra)
         result = await llm_client.generate(
             prompt=prompt,
             task_type=TaskType.GENERATION,
             max_tokens=1000,
-            temperature=0.7
+            temperature=0.7,
+            hedge=True,
+            caller="api.topic",
+            validator=text_validator(min_words=150)  # Pede 300-500 palavras; bem menos que isso escala o modelo
         )
         
         content = result.get("content", "")
@@ -556,6 +774,45 @@ Tópico a gerar: {request.topic_title}
         raise HTTPException(status_code=500, detail=f"Erro ao gerar tópico: {str(e)}")
 
 
+@app.post("/api/chapter/generate-topic/stream")
+async def generate_topic_stream(request: TopicRequest):
+    """
+    Gera conteúdo de um tópico via server-sent events
+    Emite eventos "token" com cada trecho e um evento "done" com metadados
+    """
+    logger.info(f"Gerando tópico (stream): {request.topic_title} (Capítulo {request.chapter_number})")
+    prompt = build_topic_prompt(request)
+    
+    async def events() -> AsyncIterator[str]:
+        word_count = 0
+        try:
+            async for event in llm_client.generate_stream(
+                prompt=prompt,
+                task_type=TaskType.GENERATION,
+                max_tokens=1000,
+                temperature=0.7,
+                caller="api.topic"
+            ):
+                if event.get("done"):
+                    yield sse_event("done", {
+                        "word_count": word_count,
+                        "topic_title": request.topic_title,
+                        "model": event.get("model"),
+                        "provider": event.get("provider"),
+                        "tokens": event.get("tokens", {})
+                    })
+                    continue
+                
+                word_count += len(event["delta"].split())
+                yield sse_event("token", {"delta": event["delta"]})
+        except Exception as e:
+            logger.error(f"Erro ao gerar tópico (stream): {e}")
+            logger.error(traceback.format_exc())
+            yield sse_event("error", {"detail": f"Erro ao gerar tópico: {str(e)}"})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @app.post("/api/research/deep")
 async def deep_research(query: str, academic_only: bool = True):
     """
@@ -734,6 +991,158 @@ async def get_freepik_task_status(task_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ==================== LLM Endpoints ====================
+
+@app.get("/api/llm/cache/stats")
+async def get_llm_cache_stats():
+    """Estatísticas do cache de respostas de LLM e da coalescência de chamadas idênticas"""
+    from services.llm_cache import llm_cache
+    from services.singleflight import singleflight
+    
+    return {
+        "status": "success",
+        "stats": llm_cache.get_stats(),
+        "singleflight": singleflight.get_stats()
+    }
+
+
+@app.get("/api/llm/health")
+async def get_llm_health():
+    """Saúde por modelo: latência EWMA/p50/p95, tokens/s, taxa de erro e circuit breaker"""
+    return {
+        "status": "success",
+        "models": llm_client.health.snapshot()
+    }
+
+
+@app.delete("/api/llm/health")
+async def reset_llm_health(model: Optional[str] = None):
+    """Zera métricas de um modelo (ou de todos), fechando o circuit breaker"""
+    llm_client.health.reset(model)
+    return {"status": "success"}
+
+
+@app.get("/api/llm/providers")
+async def get_llm_providers():
+    """Providers registrados: URL base, padrões de modelo, streaming e limites"""
+    return {
+        "status": "success",
+        "providers": llm_client.providers.snapshot()
+    }
+
+
+@app.get("/api/llm/keys")
+async def get_llm_keys():
+    """
+    Pools de chaves por provider: carga, quarentena e uso por chave
+    Tokens e custo por chave: GET /api/llm/metering?group_by=key_id
+    """
+    from services.key_pool import key_pools
+    
+    return {
+        "status": "success",
+        "selection": settings.llm_key_selection,
+        "pools": key_pools.snapshot(llm_client.providers.specs())
+    }
+
+
+@app.get("/api/llm/rate-limits")
+async def get_llm_rate_limits():
+    """Estado dos rate limiters por provider e chave (fila, chamadas em voo, 429s)"""
+    from services.rate_limiter import rate_limiters
+    
+    return {
+        "status": "success",
+        "limiters": rate_limiters.snapshot()
+    }
+
+
+@app.get("/api/llm/retries")
+async def get_llm_retry_stats():
+    """Retries por classe de erro, backoff acumulado e saldo do orçamento de retries"""
+    from services.retry_policy import retry_policy
+    
+    return {
+        "status": "success",
+        "stats": retry_policy.get_stats()
+    }
+
+
+@app.get("/api/llm/cascade")
+async def get_llm_cascade_stats():
+    """Níveis da cascata por tarefa, aceites por modelo e escaladas por validação reprovada"""
+    from services.llm_client import llm_client
+    
+    return {
+        "status": "success",
+        "stats": llm_client.get_cascade_stats()
+    }
+
+
+@app.get("/api/llm/hedging")
+async def get_llm_hedging_stats():
+    """Contadores de hedged requests por tarefa e limiares por modelo"""
+    return {
+        "status": "success",
+        "stats": llm_client.get_hedge_stats()
+    }
+
+
+@app.get("/api/llm/metering")
+async def get_llm_metering(
+    group_by: str = "book_id",
+    book_id: Optional[str] = None,
+    caller: Optional[str] = None,
+    model: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+):
+    """
+    Tokens, custo e latência agregados a partir do ledger de medição
+    group_by: book_id, caller, model, provider ou key_id; since/until em ISO (ex.: 2025-01-31)
+    """
+    from services.metering import metering
+    
+    allowed = {"book_id", "caller", "model", "provider", "key_id"}
+    if group_by not in allowed:
+        raise HTTPException(status_code=400, detail=f"group_by deve ser um de {sorted(allowed)}")
+    
+    return {
+        "status": "success",
+        **metering.aggregate(
+            group_by=group_by, since=since, until=until,
+            book_id=book_id, caller=caller, model=model
+        )
+    }
+
+
+@app.get("/api/llm/metering/records")
+async def get_llm_metering_records(
+    limit: int = 100,
+    book_id: Optional[str] = None,
+    caller: Optional[str] = None
+):
+    """Registros mais recentes do ledger de medição"""
+    from services.metering import metering
+    
+    return {
+        "status": "success",
+        "records": metering.recent(limit=limit, book_id=book_id, caller=caller)
+    }
+
+
+@app.delete("/api/llm/cache")
+async def clear_llm_cache():
+    """Limpa o cache de respostas de LLM (memória e disco)"""
+    from services.llm_cache import llm_cache
+    
+    removed = llm_cache.clear()
+    return {
+        "status": "success",
+        "removed": removed
+    }
+
+
 # ==================== Dynamic Agent Endpoints ====================
 
 @app.post("/api/agents/create")
@@ -857,7 +1266,8 @@ async def delete_outline_history(outline_id: str):
 async def get_active_books():
     """Lista todos os livros em geração ativa"""
     try:
-        active_books = orchestrator.active_books
+        # Livros em memória; os despejados continuam acessíveis por /api/book/{book_id}
+        active_books = dict(orchestrator.active_books.items())
         return {
             "status": "success",
             "active_books": active_books,
@@ -866,6 +1276,22 @@ async def get_active_books():
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
+@app.get("/api/books/memory")
+async def get_books_memory():
+    """Memória estimada por livro em memória (registro e RAG) e despejos dos registros LRU/TTL"""
+    return {
+        "status": "success",
+        **orchestrator.get_memory_usage()
+    }
+
+@app.post("/api/books/memory/sweep")
+async def sweep_books_memory():
+    """Despeja agora livros e RAGs ociosos ou além dos limites (persistidos em disco antes)"""
+    return {
+        "status": "success",
+        "evicted": orchestrator.sweep_memory()
+    }
+
 @app.get("/api/logs")
 async def get_logs():
     """Retorna logs da aplicação"""
@@ -910,6 +1336,57 @@ async def get_logs():
             "logs": "No logs available"
         }
 
+async def book_exists(book_id: str) -> bool:
+    """Livro com registro (memória ou checkpoint), eventos gravados ou job de geração ativo"""
+    return (
+        orchestrator.get_book_status(book_id).get("status") != "not_found"
+        or bool(await book_events.aread(book_id, 0, limit=1))
+        or await job_queue.active_job("book", book_id) is not None
+    )
+
+
+@app.get("/api/book/{book_id}/events")
+async def stream_book_events(book_id: str, request: Request, after: int = 0):
+    """
+    Stream SSE da geração do livro: início/fim de cada nó do grafo (com duração e tokens),
+    texto parcial dos capítulos, capítulos concluídos e o evento final (book_completed/book_failed)
+    Reconexões continuam do header Last-Event-ID (ou de ?after=<id>)
+    """
+    # Sem registro, eventos nem job na fila o livro não existe: o stream ficaria consultando para sempre
+    if not await book_exists(book_id):
+        raise HTTPException(status_code=404, detail=f"Livro {book_id} não encontrado")
+    
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        after = int(last_event_id)
+    elif after == 0:
+        after = await book_events.acurrent_run_start(book_id)
+    
+    async def events() -> AsyncIterator[str]:
+        try:
+            # Livro já encerrado sem eventos pendentes: entrega só o estado final
+            status = orchestrator.get_book_status(book_id)
+            if status["status"] in ("completed", "error") and not await book_events.aread(book_id, after, limit=1):
+                final = "book_completed" if status["status"] == "completed" else "book_failed"
+                yield sse_event(final, {"status": status["status"], "chapters": status["chapters_count"]})
+                return
+            
+            async for event in book_events.subscribe(book_id, after):
+                if event is None:
+                    # Job cancelado ou descartado antes de começar: nada mais vai chegar
+                    if not await book_exists(book_id):
+                        yield sse_event("book_failed", {"status": "not_found", "error": f"Livro {book_id} não encontrado"})
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_event(event["event"], {**event["data"], "ts": event["ts"]}, event_id=event["id"])
+        except Exception as e:
+            logger.error(f"Erro no stream de eventos do livro {book_id}: {e}")
+            yield sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @app.get("/api/book/{book_id}/status")
 async def get_book_generation_status(book_id: str):
     """Verifica status da geração do livro"""
@@ -928,20 +1405,24 @@ async def get_book_generation_status(book_id: str):
         progress = status.get("progress", {})
         current_chapter = progress.get("current_chapter", 0)
         total_chapters = progress.get("total_chapters", 0)
+        completed = len(progress.get("chapters_completed", []))
         
-        # Calcular porcentagem
+        # Calcular porcentagem (capítulos independentes terminam fora de ordem)
         percent = 0
         if total_chapters > 0:
-            percent = int((current_chapter / total_chapters) * 100)
+            percent = int((completed / total_chapters) * 100)
             
         return {
             "status": status.get("status", "unknown"),
             "book_id": book_id,
             "progress": percent,
             "current_chapter": current_chapter,
+            "chapters_in_progress": progress.get("chapters_in_progress", []),
+            "completed_chapters": completed,
             "total_chapters": total_chapters,
             "message": f"Gerando capítulo {current_chapter} de {total_chapters}..." if status.get("status") == "generating" else "Geração concluída",
-            "logs": []
+            # Últimos eventos de nó/capítulo (o stream completo está em /api/book/{book_id}/events)
+            "logs": await book_events.arecent(book_id, limit=50, exclude=["chapter_partial"])
         }
     except Exception as e:
         return {
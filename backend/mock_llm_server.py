@@ -0,0 +1,376 @@
+"""
+Servidor LLM simulado compatível com a API da OpenAI
+Permite testes de carga e latência sem custo e sem rede
+
+Uso:
+    python mock_llm_server.py --port 8100 --latency-ms 800 --tokens-per-sec 60
+
+No .env do backend:
+    OPENROUTER_BASE_URL=http://localhost:8100/v1
+    OPENAI_BASE_URL=http://localhost:8100/v1
+    OPENROUTER_API_KEY=mock
+    GEMINI_API_KEY=              # vazio, para o roteamento não usar o SDK do Gemini
+
+Parâmetros podem ser alterados em tempo de execução via POST /mock/config
+ou por requisição com os cabeçalhos X-Mock-Latency-Ms, X-Mock-Error e X-Mock-Tokens-Per-Sec.
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import uuid
+import uvicorn
+
+
+class MockConfig(BaseModel):
+    """Parâmetros de simulação"""
+    latency_ms: float = 500.0  # Tempo até o primeiro token
+    latency_jitter_ms: float = 200.0  # Dispersão da latência
+    latency_distribution: str = "lognormal"  # fixed | uniform | normal | lognormal
+    tokens_per_sec: float = 80.0  # Velocidade de geração (0 = instantâneo)
+    error_rate: float = 0.0  # Fração de respostas 500
+    rate_limit_rate: float = 0.0  # Fração de respostas 429
+    retry_after: float = 2.0  # Retry-After das respostas 429
+    seed: Optional[int] = None  # Semente para execuções reproduzíveis
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+config = MockConfig(
+    latency_ms=_env_float("MOCK_LLM_LATENCY_MS", 500.0),
+    latency_jitter_ms=_env_float("MOCK_LLM_LATENCY_JITTER_MS", 200.0),
+    latency_distribution=os.getenv("MOCK_LLM_LATENCY_DISTRIBUTION", "lognormal"),
+    tokens_per_sec=_env_float("MOCK_LLM_TOKENS_PER_SEC", 80.0),
+    error_rate=_env_float("MOCK_LLM_ERROR_RATE", 0.0),
+    rate_limit_rate=_env_float("MOCK_LLM_RATE_LIMIT_RATE", 0.0),
+    retry_after=_env_float("MOCK_LLM_RETRY_AFTER", 2.0),
+)
+
+rng = random.Random(config.seed)
+stats = {"requests": 0, "streams": 0, "errors_injected": 0, "rate_limited": 0, "completion_tokens": 0}
+
+app = FastAPI(title="Mock LLM Server", version="1.0.0")
+
+
+# ==================== Simulação ====================
+
+def sample_latency(override_ms: Optional[float] = None) -> float:
+    """Sorteia a latência até o primeiro token, em segundos"""
+
+    if override_ms is not None:
+        return max(0.0, override_ms) / 1000.0
+
+    mean = config.latency_ms
+    jitter = config.latency_jitter_ms
+    distribution = config.latency_distribution
+
+    if distribution == "fixed" or jitter <= 0:
+        value = mean
+    elif distribution == "uniform":
+        value = rng.uniform(mean - jitter, mean + jitter)
+    elif distribution == "normal":
+        value = rng.gauss(mean, jitter)
+    else:
+        # Lognormal: cauda longa, como latências reais de LLM
+        sigma = min(2.0, jitter / max(mean, 1.0))
+        value = rng.lognormvariate(0, sigma) * mean
+
+    return max(0.0, value) / 1000.0
+
+
+def pick_failure(request: Request) -> Optional[int]:
+    """Decide se a requisição deve falhar (500 ou 429)"""
+
+    forced = request.headers.get("x-mock-error")
+    if forced:
+        return int(forced)
+    if rng.random() < config.rate_limit_rate:
+        return 429
+    if rng.random() < config.error_rate:
+        return 500
+    return None
+
+
+def failure_response(status: int) -> JSONResponse:
+    if status == 429:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(config.retry_after)},
+            content={"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit_error"}}
+        )
+
+    stats["errors_injected"] += 1
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": f"Injected error {status} (mock)", "type": "server_error"}}
+    )
+
+
+# ==================== Respostas ====================
+
+LOREM = (
+    "Este conteúdo simulado descreve conceitos fundamentais com exemplos práticos, "
+    "conectando teoria e aplicação de forma didática para o leitor técnico. "
+    "Cada parágrafo aprofunda um aspecto do tema, apresenta trade-offs e referências. "
+).split()
+
+
+def seeded_random(prompt: str) -> random.Random:
+    """Mesmo prompt gera a mesma resposta"""
+    return random.Random(int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16], 16))
+
+
+def build_outline(prompt: str) -> str:
+    match = re.search(r"N[úu]mero exato de cap[íi]tulos:\s*(\d+)", prompt)
+    total = int(match.group(1)) if match else 8
+    chapters = [
+        {
+            "number": i,
+            "title": f"Capítulo {i}: Tópico simulado {i}",
+            "description": "Descrição simulada do capítulo para testes de carga.",
+            "key_topics": [f"tópico {i}.1", f"tópico {i}.2"],
+            "dependencies": [i - 1] if i > 1 and i % 3 != 1 else [],
+            "estimated_pages": 3
+        }
+        for i in range(1, total + 1)
+    ]
+    return json.dumps({
+        "book_title": "Livro Simulado",
+        "refined_prompt": "Prompt refinado (mock)",
+        "total_chapters": total,
+        "chapters": chapters,
+        "research_areas": ["área simulada"],
+        "required_libraries": [],
+        "detected_domains": []
+    }, ensure_ascii=False)
+
+
+def build_text(prompt: str, max_tokens: int) -> str:
+    """Texto com tamanho proporcional a max_tokens (seções Markdown para capítulos)"""
+
+    generator = seeded_random(prompt)
+    target_words = max(5, int(max_tokens * 0.6))
+    sections = re.findall(r"^## (\d\..+)$", prompt, flags=re.MULTILINE)
+
+    words: List[str] = []
+    section_index = 0
+    while len(words) < target_words:
+        if sections and len(words) >= section_index * (target_words // len(sections)) and section_index < len(sections):
+            words.append(f"\n\n## {sections[section_index]}\n\n")
+            section_index += 1
+        words.append(generator.choice(LOREM))
+    return " ".join(words)
+
+
+def build_response(prompt: str, max_tokens: int) -> str:
+    """Resposta canônica conforme o tipo de prompt detectado"""
+
+    lowered = prompt.lower()
+
+    if "mermaid" in lowered:
+        return "graph TD\n    A[Início] --> B{Decisão}\n    B -->|Sim| C[Ação]\n    B -->|Não| D[Outra ação]"
+    if '"book_title"' in prompt and '"chapters"' in prompt:
+        return build_outline(prompt)
+    if '"optimized_prompt"' in prompt:
+        return json.dumps({
+            "optimized_prompt": "Prompt otimizado (mock)",
+            "suggested_title": "Livro Simulado",
+            "target_audience": "profissionais",
+            "key_topics": ["tópico 1", "tópico 2"],
+            "estimated_chapters": 8,
+            "suggestions": ["sugestão simulada"]
+        }, ensure_ascii=False)
+    if '"nodes"' in prompt and '"edges"' in prompt:
+        return json.dumps({
+            "nodes": [
+                {"id": "page-1", "type": "page", "position": {"x": 250, "y": 0}, "data": {"label": "Capa", "content": "Título"}},
+                {"id": "chapter-1", "type": "chapter", "position": {"x": 100, "y": 150}, "data": {"title": "Capítulo 1", "content": "Introdução"}}
+            ],
+            "edges": [{"id": "e1-2", "source": "page-1", "target": "chapter-1"}]
+        }, ensure_ascii=False)
+    if "html" in lowered and "retorne apenas html" in lowered:
+        return "<section style=\"font-family: serif\"><h1>Título simulado</h1><p>Conteúdo simulado.</p></section>"
+
+    return build_text(prompt, max_tokens)
+
+
+def split_tokens(text: str) -> List[str]:
+    """Divide em "tokens" (palavras com o espaço seguinte)"""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+def truncate(tokens: List[str], max_tokens: int) -> Tuple[List[str], str]:
+    if len(tokens) > max_tokens:
+        return tokens[:max_tokens], "length"
+    return tokens, "stop"
+
+
+# ==================== Endpoints ====================
+
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    """Endpoint compatível com /chat/completions da OpenAI (com e sem streaming)"""
+
+    body: Dict[str, Any] = await request.json()
+    stats["requests"] += 1
+
+    failure = pick_failure(request)
+    if failure:
+        await asyncio.sleep(sample_latency() / 4)
+        return failure_response(failure)
+
+    messages = body.get("messages", [])
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    model = body.get("model", "mock-model")
+    max_tokens = int(body.get("max_tokens") or 1000)
+
+    latency_header = request.headers.get("x-mock-latency-ms")
+    tps_header = request.headers.get("x-mock-tokens-per-sec")
+    latency = sample_latency(float(latency_header) if latency_header else None)
+    tokens_per_sec = float(tps_header) if tps_header else config.tokens_per_sec
+
+    tokens, finish_reason = truncate(split_tokens(build_response(prompt, max_tokens)), max_tokens)
+    usage = {
+        "prompt_tokens": max(1, len(prompt) // 4),
+        "completion_tokens": len(tokens),
+        "total_tokens": max(1, len(prompt) // 4) + len(tokens),
+        "total_cost": 0
+    }
+    stats["completion_tokens"] += len(tokens)
+    completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+
+    if body.get("stream"):
+        stats["streams"] += 1
+        return StreamingResponse(
+            stream_tokens(completion_id, model, tokens, finish_reason, usage, latency, tokens_per_sec),
+            media_type="text/event-stream"
+        )
+
+    # Sem streaming: latência + tempo de geração completo
+    generation_time = len(tokens) / tokens_per_sec if tokens_per_sec > 0 else 0
+    await asyncio.sleep(latency + generation_time)
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "".join(tokens)},
+            "finish_reason": finish_reason
+        }],
+        "usage": usage
+    }
+
+
+async def stream_tokens(
+    completion_id: str,
+    model: str,
+    tokens: List[str],
+    finish_reason: str,
+    usage: Dict[str, Any],
+    latency: float,
+    tokens_per_sec: float
+) -> AsyncIterator[str]:
+    """Emite chunks SSE no formato da OpenAI no ritmo configurado"""
+
+    def chunk(delta: Dict[str, Any], finish: Optional[str] = None, with_usage: bool = False) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]
+        }
+        if with_usage:
+            payload["usage"] = usage
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    await asyncio.sleep(latency)
+    yield chunk({"role": "assistant"})
+
+    # Agrupa tokens para manter o ritmo sem um sleep por token em taxas altas
+    batch = max(1, int(tokens_per_sec / 50)) if tokens_per_sec > 0 else len(tokens) or 1
+    for start in range(0, len(tokens), batch):
+        piece = tokens[start:start + batch]
+        yield chunk({"content": "".join(piece)})
+        if tokens_per_sec > 0:
+            await asyncio.sleep(len(piece) / tokens_per_sec)
+
+    yield chunk({}, finish=finish_reason, with_usage=True)
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/v1/models")
+@app.get("/models")
+async def list_models():
+    """Lista mínima de modelos para clientes que consultam /models"""
+    return {"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "mock"}]}
+
+
+@app.get("/mock/config")
+async def get_config():
+    """Parâmetros atuais e contadores"""
+    return {"config": config.model_dump(), "stats": stats}
+
+
+@app.post("/mock/config")
+async def update_config(update: Dict[str, Any]):
+    """Altera parâmetros em tempo de execução (ex.: {"error_rate": 0.2})"""
+    global config, rng
+    config = config.model_copy(update={k: v for k, v in update.items() if k in MockConfig.model_fields})
+    if "seed" in update:
+        rng = random.Random(config.seed)
+    return {"config": config.model_dump()}
+
+
+@app.post("/mock/reset")
+async def reset_stats():
+    """Zera os contadores"""
+    for key in stats:
+        stats[key] = 0
+    return {"stats": stats}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor LLM simulado (compatível com OpenAI)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms)
+    parser.add_argument("--latency-jitter-ms", type=float, default=config.latency_jitter_ms)
+    parser.add_argument("--latency-distribution", default=config.latency_distribution,
+                        choices=["fixed", "uniform", "normal", "lognormal"])
+    parser.add_argument("--tokens-per-sec", type=float, default=config.tokens_per_sec)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=config.rate_limit_rate)
+    parser.add_argument("--retry-after", type=float, default=config.retry_after)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        latency_distribution=args.latency_distribution,
+        tokens_per_sec=args.tokens_per_sec,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    rng = random.Random(args.seed)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -123,3 +123,298 @@ def build_chapter_prompt(
         citation_style=citation_style,
         requested_charts=", ".join(requested_charts or ["Nenhum"])
     )
+
+
+# === Geração por seções (CHAPTER_GENERATION_MODE=sections) ===
+# As mesmas seis seções do ENHANCED_EBOOK_PROMPT, escritas em paralelo a partir de um esqueleto
+
+CHAPTER_SECTIONS = [
+    {
+        "title": "Introdução e Contexto",
+        "guidelines": [
+            "Motivação e relevância",
+            "Conexão com capítulo anterior: {previous_chapter_title}",
+            "Objetivos de aprendizagem",
+            "Pré-requisitos"
+        ]
+    },
+    {
+        "title": "Fundamentação Teórica",
+        "guidelines": [
+            "Conceitos-chave com definições precisas [com citações]",
+            "Equações/algoritmos quando aplicável",
+            "Diagramas conceituais (descreva para geração posterior)"
+        ]
+    },
+    {
+        "title": "Estado da Arte",
+        "guidelines": [
+            "Últimos avanços (2023-2024) [use a pesquisa científica]",
+            "Comparação de abordagens",
+            "Tendências e direções futuras"
+        ]
+    },
+    {
+        "title": "Aplicações Práticas",
+        "guidelines": [
+            "Casos de uso reais",
+            "Exemplos de código/implementação",
+            "Exercícios propostos"
+        ]
+    },
+    {
+        "title": "Análise Crítica",
+        "guidelines": [
+            "Limitações e desafios",
+            "Trade-offs",
+            "Considerações éticas/sociais (se aplicável)"
+        ]
+    },
+    {
+        "title": "Resumo e Próximos Passos",
+        "guidelines": [
+            "Síntese dos pontos-chave",
+            "Preparação para próximo capítulo: {next_chapter_title}",
+            "Leituras recomendadas [da pesquisa]"
+        ]
+    }
+]
+
+CHAPTER_CONTEXT_PROMPT = """
+Você é um especialista PhD em {topic}, escrevendo um ebook técnico de qualidade editorial para {target_audience}.
+
+=== CONTEXTO DO LIVRO (CAPÍTULOS ANTERIORES) ===
+{previous_chapters_summary}
+
+=== INSIGHTS DO MENTAL GRAPH ===
+Conceitos já abordados: {covered_concepts}
+Pré-requisitos estabelecidos: {prerequisites}
+Tendência narrativa: {narrative_flow}
+Lacunas a preencher: {knowledge_gaps}
+
+=== CONTEXTO RECUPERADO (RAG) ===
+{rag_context}
+
+=== PESQUISA CIENTÍFICA RECENTE (VERIFICADA) ===
+{research_results}
+[Todas as fontes são rastreáveis e verificadas. Use-as com confiança.]
+
+CAPÍTULO {chapter_number}: {chapter_title}
+"""
+
+SKELETON_PROMPT = """
+=== TAREFA: ESQUELETO DO CAPÍTULO ===
+Planeje o capítulo nas seções abaixo, sem escrevê-lo. Para cada seção, liste os pontos
+que ela deve cobrir e os conceitos que introduz, sem repetir conteúdo entre seções.
+
+Seções:
+{sections}
+
+Retorne APENAS um JSON válido:
+{{
+  "sections": [
+    {{"number": 1, "title": "...", "key_points": ["...", "..."], "concepts": ["..."]}}
+  ]
+}}
+"""
+
+SECTION_PROMPT = """
+=== ESQUELETO DO CAPÍTULO (TODAS AS SEÇÕES) ===
+{skeleton}
+
+DIRETRIZES DE ESCRITA:
+1. Tom: Técnico-formal com humanização. Use voz ativa quando possível.
+2. Profundidade: Nível {depth_level} (1=introdutório, 5=avançado/pesquisa)
+3. Exemplos: Mínimo {min_examples} exemplos práticos.
+4. Citações: Use formato {citation_style}. SEMPRE cite fontes da pesquisa científica.
+5. Comprimento: Aproximadamente {target_words} palavras.
+6. **Factualidade**: Use APENAS informações do contexto recuperado e da pesquisa. NÃO invente dados.
+7. **Escopo**: Escreva SOMENTE a seção {section_number}. O conteúdo das demais seções é escrito
+   em paralelo por outros autores: não antecipe nem repita seus pontos.
+
+=== SEÇÃO A ESCREVER ===
+## {section_number}. {section_title}
+Pontos a cobrir:
+{key_points}
+Orientações:
+{guidelines}
+
+Comece diretamente pelo título "## {section_number}. {section_title}" e escreva a seção agora.
+"""
+
+STITCH_PROMPT = """
+Você está revisando o capítulo {chapter_number} ("{chapter_title}") de um ebook, cujas seções
+foram escritas separadamente. Para cada junção abaixo, escreva uma frase de transição curta
+(1 a 2 frases) que conecte o fim de uma seção ao início da seguinte, no mesmo tom do texto.
+
+{boundaries}
+
+Retorne APENAS um JSON válido, com uma transição por junção, na ordem:
+{{"transitions": ["...", "..."]}}
+"""
+
+
+def _format_context(
+    topic: str,
+    target_audience: str,
+    chapter_number: int,
+    chapter_title: str,
+    rag_context: str = "",
+    research_results: str = "",
+    previous_chapters_summary: str = "",
+    covered_concepts: list = None,
+    prerequisites: list = None,
+    narrative_flow: str = "linear",
+    knowledge_gaps: list = None,
+    writing_tone_instructions: str = "",
+    **_
+) -> str:
+    """Contexto compartilhado por todas as chamadas da geração por seções"""
+
+    context = CHAPTER_CONTEXT_PROMPT.format(
+        topic=topic,
+        target_audience=target_audience,
+        previous_chapters_summary=previous_chapters_summary,
+        covered_concepts=", ".join(covered_concepts or []),
+        prerequisites=", ".join(prerequisites or []),
+        narrative_flow=narrative_flow,
+        knowledge_gaps=", ".join(knowledge_gaps or []),
+        rag_context=rag_context,
+        research_results=research_results,
+        chapter_number=chapter_number,
+        chapter_title=chapter_title
+    )
+    if writing_tone_instructions:
+        context = writing_tone_instructions + "\n\n" + context
+    return context
+
+
+def _section_guidelines(section: dict, previous_chapter_title: str, next_chapter_title: str) -> list:
+    return [
+        guideline.format(
+            previous_chapter_title=previous_chapter_title or "-",
+            next_chapter_title=next_chapter_title or "-"
+        )
+        for guideline in section["guidelines"]
+    ]
+
+
+def default_skeleton() -> list:
+    """Esqueleto sem pontos específicos, usado se o planejamento do capítulo falhar"""
+    return [
+        {"number": i, "title": section["title"], "key_points": [], "concepts": []}
+        for i, section in enumerate(CHAPTER_SECTIONS, start=1)
+    ]
+
+
+def build_skeleton_prompt(
+    previous_chapter_title: str = "",
+    next_chapter_title: str = "",
+    **context
+) -> str:
+    """Prompt do esqueleto do capítulo (pontos e conceitos de cada seção)"""
+
+    sections = "\n".join(
+        f"{i}. {section['title']}: " + "; ".join(
+            _section_guidelines(section, previous_chapter_title, next_chapter_title)
+        )
+        for i, section in enumerate(CHAPTER_SECTIONS, start=1)
+    )
+    return _format_context(**context) + SKELETON_PROMPT.format(sections=sections)
+
+
+def build_section_prompt(
+    skeleton: list,
+    section_number: int,
+    previous_chapter_title: str = "",
+    next_chapter_title: str = "",
+    depth_level: int = 3,
+    min_examples: int = 1,
+    target_words: int = 500,
+    citation_style: str = "ABNT",
+    **context
+) -> str:
+    """Prompt de uma seção, com o esqueleto completo como contexto compartilhado"""
+
+    section = skeleton[section_number - 1]
+    definition = CHAPTER_SECTIONS[section_number - 1]
+
+    skeleton_text = "\n".join(
+        f"{item['number']}. {item['title']}: {'; '.join(item.get('key_points') or []) or '-'}"
+        for item in skeleton
+    )
+    key_points = "\n".join(f"- {point}" for point in section.get("key_points") or []) or "- (livre)"
+    guidelines = "\n".join(
+        f"- {guideline}"
+        for guideline in _section_guidelines(definition, previous_chapter_title, next_chapter_title)
+    )
+
+    return _format_context(**context) + SECTION_PROMPT.format(
+        skeleton=skeleton_text,
+        depth_level=depth_level,
+        min_examples=min_examples,
+        citation_style=citation_style,
+        target_words=target_words,
+        section_number=section_number,
+        section_title=section["title"],
+        key_points=key_points,
+        guidelines=guidelines
+    )
+
+
+def build_stitch_prompt(chapter_number: int, chapter_title: str, sections: list, excerpt_chars: int = 600) -> str:
+    """Prompt da passada de costura: só o fim e o início de seções vizinhas, não o capítulo inteiro"""
+
+    boundaries = "\n\n".join(
+        f"--- JUNÇÃO {i} ---\n"
+        f"[FIM DA SEÇÃO {i}]\n...{sections[i - 1][-excerpt_chars:]}\n"
+        f"[INÍCIO DA SEÇÃO {i + 1}]\n{sections[i][:excerpt_chars]}..."
+        for i in range(1, len(sections))
+    )
+    return STITCH_PROMPT.format(
+        chapter_number=chapter_number,
+        chapter_title=chapter_title,
+        boundaries=boundaries
+    )
+
+
+# === Continuação de saída cortada pelo limite de tokens ===
+
+CONTINUATION_PROMPT = """
+Você está escrevendo o capítulo {chapter_number} ("{chapter_title}") de um ebook técnico sobre {topic}.
+A geração anterior foi interrompida pelo limite de tamanho da resposta.
+
+Estrutura prevista do capítulo:
+{sections}
+
+=== FINAL DO TEXTO JÁ ESCRITO ===
+...{tail}
+
+Continue o texto EXATAMENTE do ponto onde ele parou (inclusive no meio de uma frase),
+mantendo o tom, o formato markdown e a estrutura acima. Não repita o que já foi escrito,
+não reinicie seções já concluídas e não adicione comentários sobre a continuação.
+"""
+
+
+def build_continuation_prompt(
+    chapter_number: int,
+    chapter_title: str,
+    topic: str,
+    tail: str,
+    headings: list = None
+) -> str:
+    """
+    Prompt de continuação: só o fim do texto produzido, sem o contexto completo do capítulo
+    headings: títulos previstos (padrão: as seis seções do capítulo)
+    """
+
+    sections = "\n".join(headings or [
+        f"## {i}. {section['title']}" for i, section in enumerate(CHAPTER_SECTIONS, start=1)
+    ])
+    return CONTINUATION_PROMPT.format(
+        chapter_number=chapter_number,
+        chapter_title=chapter_title,
+        topic=topic,
+        sections=sections,
+        tail=tail
+    )
@@ -12,6 +12,19 @@ import pickle
 from pathlib import Path
 
 
+# Modelo de embeddings compartilhado por todos os livros (carregado uma vez por processo)
+_embeddings: Optional[HuggingFaceEmbeddings] = None
+
+
+def shared_embeddings() -> HuggingFaceEmbeddings:
+    global _embeddings
+    if _embeddings is None:
+        _embeddings = HuggingFaceEmbeddings(
+            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        )
+    return _embeddings
+
+
 @dataclass
 class ConceptNode:
     """Nó representando um conceito no mental graph"""
@@ -47,9 +60,7 @@ class BookMentalGraph:
         self.edges: List[ConceptEdge] = []
         
         # Inicializar embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        self.embeddings = shared_embeddings()
         
         # Inicializar vector store
         self.vectorstore: Optional[FAISS] = None
@@ -67,9 +78,16 @@ class BookMentalGraph:
         """Adiciona uma relação entre conceitos"""
         self.edges.append(edge)
     
-    def add_chapter(self, chapter_number: int, content: str, metadata: Dict[str, Any] = None):
+    def add_chapter(
+        self,
+        chapter_number: int,
+        content: str,
+        metadata: Dict[str, Any] = None,
+        dependencies: Optional[List[int]] = None
+    ):
         """
         Adiciona um capítulo completo ao RAG e Mental Graph
+        dependencies: capítulos pré-requisito do outline (None relaciona com o anterior)
         """
         # 1. Criar nó do capítulo
         chapter_node = ConceptNode(
@@ -107,8 +125,18 @@ class BookMentalGraph:
         else:
             self.vectorstore.add_documents(documents)
         
-        # 5. Relacionar com capítulo anterior
-        if chapter_number > 1:
+        # 5. Relacionar com os pré-requisitos declarados no outline
+        if dependencies is not None:
+            for dependency in dependencies:
+                self.add_relation(ConceptEdge(
+                    source_id=f"chapter_{dependency}",
+                    target_id=chapter_node.id,
+                    relation_type="prerequisite",
+                    strength=0.8
+                ))
+        
+        # Sem dependências declaradas: relacionar com capítulo anterior
+        elif chapter_number > 1:
             previous_chapter_id = f"chapter_{chapter_number - 1}"
             if previous_chapter_id in self.nodes:
                 self.add_relation(ConceptEdge(
@@ -118,10 +146,37 @@ class BookMentalGraph:
                     strength=0.8
                 ))
     
+    def remove_chapter(self, chapter_number: int) -> bool:
+        """
+        Remove o capítulo do grafo e seus chunks do vector store
+        Usado antes de regenerar um capítulo, para o RAG não misturar versões
+        """
+        chapter_id = f"chapter_{chapter_number}"
+        removed = self.nodes.pop(chapter_id, None) is not None
+        self.edges = [
+            edge for edge in self.edges
+            if edge.source_id != chapter_id and edge.target_id != chapter_id
+        ]
+        
+        if self.vectorstore is not None:
+            doc_ids = [
+                doc_id for doc_id, doc in self.vectorstore.docstore._dict.items()
+                if doc.metadata.get("chapter_number") == chapter_number
+            ]
+            if doc_ids:
+                self.vectorstore.delete(doc_ids)
+                removed = True
+        
+        return removed
+    
     def retrieve_chapters(self, start: int, end: int) -> List[ConceptNode]:
         """Recupera capítulos anteriores"""
+        return self.retrieve_chapter_numbers(range(start, end + 1))
+    
+    def retrieve_chapter_numbers(self, numbers: List[int]) -> List[ConceptNode]:
+        """Recupera capítulos específicos (ex.: dependências de um capítulo)"""
         chapters = []
-        for i in range(start, end + 1):
+        for i in sorted(numbers):
             chapter_id = f"chapter_{i}"
             if chapter_id in self.nodes:
                 chapters.append(self.nodes[chapter_id])
@@ -197,6 +252,19 @@ class BookMentalGraph:
                 })
         return sorted(summaries, key=lambda x: x["chapter_number"])
     
+    def memory_usage(self) -> Dict[str, int]:
+        """Tamanho estimado em memória: vetores do FAISS, textos dos chunks e nós do grafo"""
+        vectors = dimension = text = 0
+        if self.vectorstore is not None:
+            vectors = self.vectorstore.index.ntotal
+            dimension = self.vectorstore.index.d
+            text = sum(len(doc.page_content) for doc in self.vectorstore.docstore._dict.values())
+        nodes = sum(len(node.content) for node in self.nodes.values())
+        return {
+            "vectors": vectors,
+            "bytes": vectors * dimension * 4 + text + nodes  # float32 por dimensão
+        }
+    
     def update_book_structure(self):
         """Atualiza estrutura global do livro após adicionar capítulo"""
         # TODO: Recalcular importâncias, detectar contradições, etc.
@@ -233,7 +301,8 @@ class BookMentalGraph:
         if vectorstore_path.exists():
             self.vectorstore = FAISS.load_local(
                 str(vectorstore_path),
-                self.embeddings
+                self.embeddings,
+                allow_dangerous_deserialization=True  # Arquivos gravados pelo próprio save()
             )
 
 
@@ -246,9 +315,19 @@ class GraphRAG:
     def __init__(self, book_id: str = "default"):
         self.mental_graph = BookMentalGraph(book_id)
     
-    def add_chapter(self, chapter_number: int, content: str, metadata: Dict[str, Any] = None):
+    def add_chapter(
+        self,
+        chapter_number: int,
+        content: str,
+        metadata: Dict[str, Any] = None,
+        dependencies: Optional[List[int]] = None
+    ):
         """Adiciona capítulo ao sistema"""
-        self.mental_graph.add_chapter(chapter_number, content, metadata)
+        self.mental_graph.add_chapter(chapter_number, content, metadata, dependencies)
+    
+    def remove_chapter(self, chapter_number: int) -> bool:
+        """Remove capítulo do sistema"""
+        return self.mental_graph.remove_chapter(chapter_number)
     
     def retrieve(self, query: str, filters: Dict[str, Any] = None, k: int = 10, rerank: bool = True):
         """Recupera contexto relevante"""
@@ -258,6 +337,10 @@ class GraphRAG:
         """Recupera capítulos"""
         return self.mental_graph.retrieve_chapters(start, end)
     
+    def retrieve_chapter_numbers(self, numbers: List[int]):
+        """Recupera capítulos específicos"""
+        return self.mental_graph.retrieve_chapter_numbers(numbers)
+    
     def analyze_narrative_flow(self, chapters):
         """Analisa fluxo narrativo"""
         return self.mental_graph.analyze_narrative_flow(chapters)
@@ -266,6 +349,10 @@ class GraphRAG:
         """Retorna resumos"""
         return self.mental_graph.get_summaries()
     
+    def memory_usage(self) -> Dict[str, int]:
+        """Tamanho estimado em memória"""
+        return self.mental_graph.memory_usage()
+    
     def save(self, directory: str):
         """Salva estado"""
         self.mental_graph.save(directory)
@@ -0,0 +1,209 @@
+"""
+Stream de eventos por livro
+Eventos de nó do grafo, progresso, texto parcial e resultados de cada capítulo, gravados
+num log SQLite: o servidor web entrega por SSE mesmo quando a geração roda num processo
+de worker da fila, e o cliente retoma do último id recebido (Last-Event-ID)
+"""
+from typing import Optional, Dict, Any, List, AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Eventos que encerram o stream de um livro
+TERMINAL_EVENTS = ("book_completed", "book_failed")
+
+
+class BookEventLog:
+    """
+    Log append-only de eventos por livro
+    O SQLite nunca roda no event loop: escritas vão para uma thread única (preserva a
+    ordem dos eventos) e as leituras assíncronas usam asyncio.to_thread
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_prune = 0.0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="book-events")
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS book_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    book_id TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    ts TEXT NOT NULL,
+                    created REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS book_events_book ON book_events (book_id, id);
+            """)
+            self._conn = conn
+        return self._conn
+
+    def publish(self, book_id: str, event: str, data: Optional[Dict[str, Any]] = None):
+        """Enfileira a gravação de um evento (não bloqueia); falhas nunca interrompem a geração"""
+
+        if not settings.book_events_enabled:
+            return
+        # Serializa já: o dict pode ser alterado pelo chamador antes da gravação
+        payload = json.dumps(data or {}, ensure_ascii=False, default=str)
+        self._writer.submit(self._write, book_id, event, payload, datetime.now(timezone.utc).isoformat())
+
+    def _write(self, book_id: str, event: str, payload: str, ts: str):
+        try:
+            with self._lock:
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT INTO book_events (book_id, event, data, ts, created) VALUES (?, ?, ?, ?, ?)",
+                        (book_id, event, payload, ts, time.time())
+                    )
+            self._maybe_prune()
+        except sqlite3.Error as e:
+            logger.warning(f"Falha ao gravar evento {event} do livro {book_id}: {e}")
+
+    def _maybe_prune(self):
+        """Remove eventos mais antigos que a retenção (no máximo uma vez por hora)"""
+        now = time.time()
+        if now - self._last_prune < 3600:
+            return
+        self._last_prune = now
+        with self._lock:
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM book_events WHERE created < ?",
+                    (now - settings.book_events_retention_hours * 3600,)
+                )
+
+    def read(
+        self,
+        book_id: str,
+        after_id: int = 0,
+        limit: int = 500,
+        exclude: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Eventos do livro com id maior que after_id, em ordem"""
+
+        sql = "SELECT id, event, data, ts FROM book_events WHERE book_id = ? AND id > ?"
+        params: List[Any] = [book_id, after_id]
+        if exclude:
+            sql += f" AND event NOT IN ({', '.join('?' * len(exclude))})"
+            params.extend(exclude)
+        with self._lock:
+            rows = self.conn.execute(sql + " ORDER BY id LIMIT ?", (*params, limit)).fetchall()
+        return [
+            {"id": event_id, "event": event, "data": json.loads(data), "ts": ts}
+            for event_id, event, data, ts in rows
+        ]
+
+    def recent(self, book_id: str, limit: int = 50, exclude: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Últimos eventos do livro, em ordem cronológica"""
+
+        sql = "SELECT id, event, data, ts FROM book_events WHERE book_id = ?"
+        params: List[Any] = [book_id]
+        if exclude:
+            sql += f" AND event NOT IN ({', '.join('?' * len(exclude))})"
+            params.extend(exclude)
+        with self._lock:
+            rows = self.conn.execute(sql + " ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+        return [
+            {"id": event_id, "event": event, "data": json.loads(data), "ts": ts}
+            for event_id, event, data, ts in reversed(rows)
+        ]
+
+    def current_run_start(self, book_id: str) -> int:
+        """Id anterior ao último book_started: uma retomada não reenvia o fim da execução anterior"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MAX(id) FROM book_events WHERE book_id = ? AND event = 'book_started'",
+                (book_id,)
+            ).fetchone()
+        return row[0] - 1 if row and row[0] else 0
+
+    # Versões assíncronas para o servidor web
+
+    async def aread(self, book_id: str, after_id: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.read, book_id, after_id, limit)
+
+    async def arecent(self, book_id: str, limit: int = 50, exclude: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.recent, book_id, limit, exclude)
+
+    async def acurrent_run_start(self, book_id: str) -> int:
+        return await asyncio.to_thread(self.current_run_start, book_id)
+
+    async def subscribe(
+        self,
+        book_id: str,
+        after_id: int = 0,
+        heartbeat: float = 15.0
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Entrega os eventos já gravados e segue acompanhando o log até um evento final
+        Consulta o SQLite em intervalos curtos, o que funciona com qualquer processo produtor;
+        emite None após `heartbeat` segundos sem eventos (keepalive da conexão)
+        """
+        last_id = after_id
+        idle_since = time.monotonic()
+        while True:
+            events = await self.aread(book_id, last_id)
+            for event in events:
+                last_id = event["id"]
+                yield event
+                if event["event"] in TERMINAL_EVENTS:
+                    return
+            if events:
+                idle_since = time.monotonic()
+                continue
+            if time.monotonic() - idle_since >= heartbeat:
+                idle_since = time.monotonic()
+                yield None
+            await asyncio.sleep(settings.book_events_poll_interval)
+
+
+class PartialTextBuffer:
+    """Agrupa deltas de texto em eventos chapter_partial a cada intervalo configurado"""
+
+    def __init__(self, events: BookEventLog, book_id: str, chapter_number: int):
+        self.events = events
+        self.book_id = book_id
+        self.chapter_number = chapter_number
+        self.pending: List[str] = []
+        self.total_chars = 0
+        self.last_flush = time.monotonic()
+
+    def add(self, delta: str):
+        self.pending.append(delta)
+        self.total_chars += len(delta)
+        if time.monotonic() - self.last_flush >= settings.book_events_partial_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.events.publish(self.book_id, "chapter_partial", {
+            "chapter": self.chapter_number,
+            "delta": "".join(self.pending),
+            "chars": self.total_chars
+        })
+        self.pending = []
+        self.last_flush = time.monotonic()
+
+
+# Instância global
+book_events = BookEventLog(str(Path(__file__).resolve().parent.parent / settings.book_events_db))  # Relativo ao backend
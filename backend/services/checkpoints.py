@@ -0,0 +1,369 @@
+"""
+Checkpoints duráveis da geração de livros
+SQLite local com dois papéis: checkpointer do LangGraph (estado do grafo de cada
+capítulo após cada nó) e registro dos livros (outline, progresso e capítulos prontos)
+para retomar a geração depois de uma queda do processo
+"""
+from typing import Optional, Dict, Any, List, Iterator, AsyncIterator, Sequence, Tuple
+from datetime import datetime, timezone
+from pathlib import Path
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    WRITES_IDX_MAP,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS books (
+    book_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+class CheckpointDatabase:
+    """Conexão SQLite compartilhada (WAL, acesso serializado por lock)"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        with self._lock:
+            with self.conn:
+                return self.conn.execute(sql, params).fetchall()
+
+    def executemany(self, sql: str, rows: List[Sequence[Any]]):
+        with self._lock:
+            with self.conn:
+                self.conn.executemany(sql, rows)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpointer do LangGraph sobre o sqlite3 da biblioteca padrão
+    Cada checkpoint guarda o estado completo (channel_values); o grafo de um capítulo
+    é pequeno, então não vale separar os valores por versão de canal
+    """
+
+    def __init__(self, db: CheckpointDatabase):
+        super().__init__()
+        self.db = db
+
+    def _tuple(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        parent_checkpoint_id: Optional[str],
+        type_: str,
+        checkpoint: bytes,
+        metadata: bytes
+    ) -> CheckpointTuple:
+        writes = self.db.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        )
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=json.loads(metadata),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ]
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        if checkpoint_id:
+            rows = self.db.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id)
+            )
+        else:
+            # IDs de checkpoint (uuid6) crescem com o tempo: o maior é o mais recente
+            rows = self.db.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns)
+            )
+
+        if not rows:
+            return None
+        return self._tuple(thread_id, checkpoint_ns, *rows[0])
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.db.execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata "
+            f"FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+            params
+        )
+
+        yielded = 0
+        for thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata in rows:
+            if filter and not all(json.loads(metadata).get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None and yielded >= limit:
+                break
+            yielded += 1
+            yield self._tuple(thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        # Metadados em JSON para permitir filtros em list() sem desserializar o checkpoint
+        serialized_metadata = json.dumps(get_checkpoint_metadata(config, metadata), default=str)
+
+        self.db.execute(
+            "INSERT OR REPLACE INTO checkpoints "
+            "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                thread_id,
+                checkpoint_ns,
+                checkpoint["id"],
+                config["configurable"].get("checkpoint_id"),
+                type_,
+                serialized,
+                serialized_metadata
+            )
+        )
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"]
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized = self.serde.dumps_typed(value)
+            rows.append((
+                thread_id, checkpoint_ns, checkpoint_id, task_id,
+                WRITES_IDX_MAP.get(channel, idx), channel, type_, serialized, task_path
+            ))
+
+        # Escritas especiais (erro, interrupção) substituem; as normais não são regravadas
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        self.db.executemany(
+            f"{verb} INTO writes "
+            "(thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.db.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+        self.db.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    # Versões assíncronas: o SQLite roda numa thread para não bloquear o event loop
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+class BookStore:
+    """Registro durável dos livros em geração (outline, parâmetros, progresso, capítulos)"""
+
+    def __init__(self, db: CheckpointDatabase):
+        self.db = db
+
+    def save(self, book_id: str, record: Dict[str, Any]):
+        self.db.execute(
+            "INSERT OR REPLACE INTO books (book_id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+            (
+                book_id,
+                record.get("status", "unknown"),
+                json.dumps(record, ensure_ascii=False, default=str),
+                datetime.now(timezone.utc).isoformat()
+            )
+        )
+
+    def load(self, book_id: str) -> Optional[Dict[str, Any]]:
+        rows = self.db.execute("SELECT data FROM books WHERE book_id = ?", (book_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def list(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Resumo dos livros registrados (mais recentes primeiro)"""
+        sql = "SELECT book_id, status, updated_at FROM books"
+        params: List[Any] = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        rows = self.db.execute(sql + " ORDER BY updated_at DESC", params)
+        return [{"book_id": b, "status": s, "updated_at": u} for b, s, u in rows]
+
+    def delete(self, book_id: str):
+        self.db.execute("DELETE FROM books WHERE book_id = ?", (book_id,))
+
+
+def checkpoint_root() -> Path:
+    """Diretório de checkpoints, relativo ao backend como os demais dados persistidos"""
+    return Path(__file__).resolve().parent.parent / settings.checkpoint_dir
+
+
+def rag_checkpoint_dir(book_id: str) -> Path:
+    """Diretório onde o RAG (mental graph + FAISS) do livro é salvo a cada capítulo"""
+    return checkpoint_root() / "rag" / book_id
+
+
+# Instâncias globais
+checkpoint_db = CheckpointDatabase(str(checkpoint_root() / "checkpoints.sqlite"))
+checkpointer = SQLiteCheckpointSaver(checkpoint_db)
+book_store = BookStore(checkpoint_db)
@@ -0,0 +1,82 @@
+"""
+Pool de clientes HTTP de longa duração para os providers de LLM
+Um httpx.AsyncClient por provider, com keep-alive, HTTP/2 opcional e limites configuráveis
+"""
+from typing import Dict, Optional
+import asyncio
+import logging
+import httpx
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    """HTTP/2 no httpx depende do pacote opcional `h2`"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HTTPClientPool:
+    """
+    Mantém um AsyncClient reutilizável por provider
+    Evita um handshake TCP+TLS novo a cada chamada de LLM
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._http2 = settings.http_enable_http2 and _http2_available()
+
+        if settings.http_enable_http2 and not self._http2:
+            logger.warning("HTTP_ENABLE_HTTP2 ativo, mas o pacote 'h2' não está instalado. Usando HTTP/1.1")
+
+    def _build_client(self, provider: str) -> httpx.AsyncClient:
+        """Cria cliente com limites de pool e keep-alive das settings"""
+
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry
+        )
+
+        logger.info(f"Criando pool HTTP para {provider} (http2={self._http2})")
+
+        return httpx.AsyncClient(
+            limits=limits,
+            timeout=httpx.Timeout(settings.model_timeout, connect=settings.http_connect_timeout),
+            http2=self._http2
+        )
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        """Retorna o cliente do provider, criando sob demanda"""
+
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._build_client(provider)
+            self._clients[provider] = client
+        return client
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        """Resumo dos clientes abertos"""
+        return {
+            provider: {"closed": client.is_closed, "http2": self._http2}
+            for provider, client in self._clients.items()
+        }
+
+    async def aclose(self, provider: Optional[str] = None):
+        """Fecha um cliente específico ou todos (shutdown da aplicação)"""
+
+        providers = [provider] if provider else list(self._clients.keys())
+        clients = [self._clients.pop(p) for p in providers if p in self._clients]
+
+        await asyncio.gather(
+            *(client.aclose() for client in clients if not client.is_closed),
+            return_exceptions=True
+        )
+
+
+# Instância global
+http_pool = HTTPClientPool()
@@ -0,0 +1,571 @@
+"""
+Fila de jobs durável com pool de workers
+Jobs de livro, capítulo, outline, pesquisa e exportação saem do processo web:
+ficam num backend persistente (SQLite por padrão, substituível por um broker) e
+são executados por workers com lease, retries com backoff e dead-letter
+"""
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from pathlib import Path
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Estados de um job
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+DEAD = "dead"  # Esgotou as tentativas (dead-letter)
+CANCELLED = "cancelled"
+
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+# Prioridade padrão por tipo (maior sai primeiro): chamadas interativas na frente de livros inteiros
+DEFAULT_PRIORITIES = {
+    "outline": 10,
+    "research": 5,
+    "chapter": 5,
+    "export": 3,
+    "book": 0,
+}
+
+JobHandler = Callable[[Dict[str, Any], "Job"], Awaitable[Any]]
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class Job:
+    """Unidade de trabalho da fila"""
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    status: str = QUEUED
+    key: Optional[str] = None  # Deduplicação: um job ativo por (kind, key), ex.: book_id
+    priority: int = 0
+    attempts: int = 0
+    max_attempts: int = 3
+    run_after: float = 0.0  # Epoch a partir do qual pode ser executado (backoff de retry)
+    lease_until: float = 0.0  # Epoch em que o lease do worker expira
+    worker: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: str = ""
+    updated_at: str = ""
+    finished_at: Optional[str] = None
+
+    def describe(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class JobBackend(ABC):
+    """
+    Armazenamento da fila
+    Implementações precisam garantir que claim() entregue cada job a um único worker,
+    inclusive entre processos e hosts. Os métodos são bloqueantes: a JobQueue os chama
+    em threads (asyncio.to_thread), fora do event loop
+    """
+
+    @abstractmethod
+    def enqueue(self, job: Job) -> Job:
+        """Grava o job, ou devolve o job ativo com o mesmo (kind, key)"""
+        ...
+
+    @abstractmethod
+    def claim(self, worker: str, lease_seconds: float, kinds: Optional[List[str]] = None) -> Optional[Job]:
+        """Reserva o próximo job pronto (ou com lease expirado) para o worker"""
+        ...
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker: str, lease_seconds: float) -> bool:
+        """Renova o lease; False se o job não pertence mais ao worker"""
+        ...
+
+    @abstractmethod
+    def complete(self, job_id: str, worker: str, result: Any) -> bool:
+        """Marca o job como concluído; False se ele não pertence mais ao worker"""
+        ...
+
+    @abstractmethod
+    def fail(self, job_id: str, worker: str, error: str, retry_at: Optional[float]) -> bool:
+        """
+        Volta o job para a fila em retry_at, ou move para dead-letter se None
+        False se ele não pertence mais ao worker
+        """
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def list(
+        self,
+        status: Optional[str] = None,
+        kind: Optional[str] = None,
+        key: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Job]:
+        ...
+
+    @abstractmethod
+    def requeue(self, job_id: str) -> bool:
+        """Devolve um job morto ou cancelado à fila, zerando as tentativas"""
+        ...
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> bool:
+        """Cancela um job ainda na fila"""
+        ...
+
+    @abstractmethod
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Quantidade de jobs por tipo e estado"""
+        ...
+
+
+class SQLiteJobBackend(JobBackend):
+    """
+    Backend padrão: SQLite local (WAL), seguro entre processos do mesmo host
+    A reserva usa BEGIN IMMEDIATE para que dois workers nunca peguem o mesmo job
+    """
+
+    COLUMNS = (
+        "id", "kind", "payload", "status", "key", "priority", "attempts", "max_attempts",
+        "run_after", "lease_until", "worker", "result", "error", "created_at", "updated_at", "finished_at"
+    )
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    key TEXT,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL DEFAULT 3,
+                    run_after REAL NOT NULL DEFAULT 0,
+                    lease_until REAL NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    finished_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created_at);
+                CREATE INDEX IF NOT EXISTS jobs_key ON jobs (kind, key, status);
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _row_to_job(self, row: tuple) -> Job:
+        data = dict(zip(self.COLUMNS, row))
+        data["payload"] = json.loads(data["payload"])
+        data["result"] = json.loads(data["result"]) if data["result"] is not None else None
+        return Job(**data)
+
+    def _select(self, where: str, params: tuple, suffix: str = "") -> List[Job]:
+        rows = self.conn.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE {where} {suffix}", params
+        ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def enqueue(self, job: Job) -> Job:
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if job.key is not None:
+                    existing = self._select(
+                        "kind = ? AND key = ? AND status IN (?, ?)",
+                        (job.kind, job.key, *ACTIVE_STATUSES)
+                    )
+                    if existing:
+                        self.conn.execute("COMMIT")
+                        return existing[0]
+
+                self.conn.execute(
+                    f"INSERT INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                    (
+                        job.id, job.kind, json.dumps(job.payload, ensure_ascii=False, default=str), job.status,
+                        job.key, job.priority, job.attempts, job.max_attempts, job.run_after, job.lease_until,
+                        job.worker, None, job.error, job.created_at, job.updated_at, job.finished_at
+                    )
+                )
+                self.conn.execute("COMMIT")
+                return job
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def claim(self, worker: str, lease_seconds: float, kinds: Optional[List[str]] = None) -> Optional[Job]:
+        now = time.time()
+        kind_filter = ""
+        params: tuple = (QUEUED, now, RUNNING, now)
+        if kinds:
+            kind_filter = f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params += tuple(kinds)
+
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Pronto para rodar, ou "running" com lease vencido (worker morreu no meio)
+                candidates = self._select(
+                    f"((status = ? AND run_after <= ?) OR (status = ? AND lease_until < ?)){kind_filter}",
+                    params,
+                    "ORDER BY priority DESC, created_at LIMIT 1"
+                )
+                if not candidates:
+                    self.conn.execute("COMMIT")
+                    return None
+
+                job = candidates[0]
+                job.status = RUNNING
+                job.attempts += 1
+                job.worker = worker
+                job.lease_until = now + lease_seconds
+                job.updated_at = _now_iso()
+                self.conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = ?, worker = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                    (job.status, job.attempts, job.worker, job.lease_until, job.updated_at, job.id)
+                )
+                self.conn.execute("COMMIT")
+                return job
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _update(self, sql: str, params: tuple) -> int:
+        with self._lock:
+            return self.conn.execute(sql, params).rowcount
+
+    def heartbeat(self, job_id: str, worker: str, lease_seconds: float) -> bool:
+        return self._update(
+            "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = ?",
+            (time.time() + lease_seconds, _now_iso(), job_id, worker, RUNNING)
+        ) > 0
+
+    # complete/fail só valem para o dono do lease: um worker que perdeu o job não
+    # sobrescreve o estado gravado pelo worker que o reservou depois
+
+    def complete(self, job_id: str, worker: str, result: Any) -> bool:
+        now = _now_iso()
+        return self._update(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, updated_at = ?, finished_at = ? "
+            "WHERE id = ? AND worker = ?",
+            (SUCCEEDED, json.dumps(result, ensure_ascii=False, default=str), now, now, job_id, worker)
+        ) > 0
+
+    def fail(self, job_id: str, worker: str, error: str, retry_at: Optional[float]) -> bool:
+        now = _now_iso()
+        if retry_at is None:
+            return self._update(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ?, finished_at = ? WHERE id = ? AND worker = ?",
+                (DEAD, error, now, now, job_id, worker)
+            ) > 0
+        return self._update(
+            "UPDATE jobs SET status = ?, error = ?, run_after = ?, lease_until = 0, worker = NULL, "
+            "updated_at = ? WHERE id = ? AND worker = ?",
+            (QUEUED, error, retry_at, now, job_id, worker)
+        ) > 0
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            jobs = self._select("id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def list(
+        self,
+        status: Optional[str] = None,
+        kind: Optional[str] = None,
+        key: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Job]:
+        clauses, params = ["1 = 1"], []
+        for column, value in (("status", status), ("kind", kind), ("key", key)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        with self._lock:
+            return self._select(" AND ".join(clauses), tuple(params), f"ORDER BY created_at DESC LIMIT {int(limit)}")
+
+    def requeue(self, job_id: str) -> bool:
+        return self._update(
+            "UPDATE jobs SET status = ?, attempts = 0, run_after = 0, lease_until = 0, worker = NULL, "
+            "finished_at = NULL, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+            (QUEUED, _now_iso(), job_id, DEAD, CANCELLED)
+        ) > 0
+
+    def cancel(self, job_id: str) -> bool:
+        now = _now_iso()
+        return self._update(
+            "UPDATE jobs SET status = ?, updated_at = ?, finished_at = ? WHERE id = ? AND status = ?",
+            (CANCELLED, now, now, job_id, QUEUED)
+        ) > 0
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            rows = self.conn.execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status").fetchall()
+        counts: Dict[str, Dict[str, int]] = {}
+        for kind, status, count in rows:
+            counts.setdefault(kind, {})[status] = count
+        return counts
+
+
+# Backends disponíveis: um broker (Redis, RabbitMQ, SQS...) entra registrando sua fábrica aqui
+JOB_BACKENDS: Dict[str, Callable[[], JobBackend]] = {
+    # Caminho relativo ao backend, como os demais dados persistidos
+    "sqlite": lambda: SQLiteJobBackend(str(Path(__file__).resolve().parent.parent / settings.job_queue_db)),
+}
+
+
+def register_job_backend(name: str, factory: Callable[[], JobBackend]):
+    """Registra um backend alternativo, selecionado por JOB_QUEUE_BACKEND"""
+    JOB_BACKENDS[name] = factory
+
+
+class JobQueue:
+    """Fila com handlers por tipo de job e workers assíncronos"""
+
+    def __init__(self):
+        self._backend: Optional[JobBackend] = None
+        self.handlers: Dict[str, JobHandler] = {}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, str] = {}  # job_id -> tipo, neste processo
+
+    @property
+    def backend(self) -> JobBackend:
+        if self._backend is None:
+            factory = JOB_BACKENDS.get(settings.job_queue_backend)
+            if factory is None:
+                raise ValueError(f"Backend de fila desconhecido: {settings.job_queue_backend}")
+            self._backend = factory()
+        return self._backend
+
+    def register_handler(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    async def _call(self, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Executa uma operação bloqueante do backend numa thread"""
+        return await asyncio.to_thread(method, *args, **kwargs)
+
+    async def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        key: Optional[str] = None,
+        priority: Optional[int] = None,
+        max_attempts: Optional[int] = None
+    ) -> Job:
+        """Coloca um job na fila (ou devolve o job ativo com o mesmo kind/key)"""
+
+        now = _now_iso()
+        job = await self._call(self.backend.enqueue, Job(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            payload=payload,
+            key=key,
+            priority=DEFAULT_PRIORITIES.get(kind, 0) if priority is None else priority,
+            max_attempts=max_attempts or settings.job_max_attempts,
+            created_at=now,
+            updated_at=now
+        ))
+        logger.info(f"Job {job.kind} {job.id} na fila (key={key}, status={job.status})")
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self._call(self.backend.get, job_id)
+
+    async def list(self, **filters: Any) -> List[Job]:
+        return await self._call(self.backend.list, **filters)
+
+    async def active_job(self, kind: str, key: str) -> Optional[Job]:
+        """Job na fila ou em execução para o (kind, key)"""
+        for status in ACTIVE_STATUSES:
+            jobs = await self._call(self.backend.list, status=status, kind=kind, key=key, limit=1)
+            if jobs:
+                return jobs[0]
+        return None
+
+    async def requeue(self, job_id: str) -> bool:
+        return await self._call(self.backend.requeue, job_id)
+
+    async def cancel(self, job_id: str) -> bool:
+        return await self._call(self.backend.cancel, job_id)
+
+    def retry_delay(self, attempts: int) -> float:
+        return min(settings.job_retry_max_delay, settings.job_retry_base_delay * (2 ** max(0, attempts - 1)))
+
+    async def _heartbeat(self, job: Job, execution: asyncio.Task):
+        """Renova o lease; se outro worker assumiu o job, interrompe a execução local"""
+        interval = max(1.0, settings.job_lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                renewed = await self._call(self.backend.heartbeat, job.id, job.worker, settings.job_lease_seconds)
+            except Exception as e:
+                # Falha transitória do backend: tenta de novo no próximo intervalo
+                logger.warning(f"Falha ao renovar o lease do job {job.id}: {e}")
+                continue
+            if not renewed:
+                logger.warning(f"Job {job.id} perdeu o lease, interrompendo a execução em {job.worker}")
+                execution.cancel()
+                return
+
+    async def run_job(self, job: Job):
+        """Executa um job reservado, registrando sucesso, retry ou dead-letter"""
+
+        handler = self.handlers.get(job.kind)
+        if handler is None:
+            await self._call(self.backend.fail, job.id, job.worker, f"Sem handler para jobs do tipo {job.kind}", None)
+            return
+
+        self._running[job.id] = job.kind
+        execution = asyncio.create_task(handler(job.payload, job))
+        heartbeat = asyncio.create_task(self._heartbeat(job, execution))
+        logger.info(f"Worker {job.worker} executando job {job.kind} {job.id} (tentativa {job.attempts})")
+
+        try:
+            result = await execution
+        except asyncio.CancelledError:
+            if not heartbeat.done():
+                raise  # Worker encerrado: o job volta à fila quando o lease vencer
+            # Lease perdido: o novo dono do job registra o resultado
+            return
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:1000]
+            if job.attempts >= job.max_attempts:
+                logger.error(f"Job {job.kind} {job.id} movido para dead-letter: {error}")
+                await self._call(self.backend.fail, job.id, job.worker, error, None)
+            else:
+                delay = self.retry_delay(job.attempts)
+                logger.warning(f"Job {job.kind} {job.id} falhou ({error}), nova tentativa em {delay:.0f}s")
+                await self._call(self.backend.fail, job.id, job.worker, error, time.time() + delay)
+        else:
+            if await self._call(self.backend.complete, job.id, job.worker, result):
+                logger.info(f"Job {job.kind} {job.id} concluído")
+            else:
+                logger.warning(f"Job {job.kind} {job.id} concluído após perder o lease; resultado descartado")
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job.id, None)
+
+    async def _worker_loop(self, index: int):
+        kinds = list(self.handlers)
+        # Id por worker: um job reassumido por outro worker do mesmo processo tem outro dono
+        worker = f"{self.worker_id}/{index}"
+        while True:
+            try:
+                job = await self._call(self.backend.claim, worker, settings.job_lease_seconds, kinds)
+            except Exception as e:
+                logger.error(f"Worker {index}: falha ao reservar job: {e}")
+                job = None
+
+            if job is None:
+                await asyncio.sleep(settings.job_poll_interval)
+                continue
+
+            if job.attempts > job.max_attempts:
+                # Lease vencido repetidamente: o job derruba o worker a cada tentativa
+                logger.error(f"Job {job.kind} {job.id} movido para dead-letter após {job.max_attempts} tentativas")
+                await self._call(
+                    self.backend.fail, job.id, job.worker, job.error or "Lease expirado em todas as tentativas", None
+                )
+                continue
+
+            await self.run_job(job)
+
+    def start(self, concurrency: Optional[int] = None):
+        """Inicia workers no event loop atual"""
+        if self._workers:
+            return
+        count = max(1, concurrency or settings.job_worker_concurrency)
+        self._workers = [asyncio.create_task(self._worker_loop(i)) for i in range(count)]
+        logger.info(f"{count} workers de jobs iniciados ({self.worker_id}, kinds={list(self.handlers)})")
+
+    async def stop(self):
+        """Interrompe os workers; jobs em execução voltam à fila quando o lease vencer"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": settings.job_queue_backend,
+            "worker_mode": settings.job_worker_mode,
+            "worker_id": self.worker_id,
+            "local_workers": len(self._workers),
+            "running_here": dict(self._running),
+            "worker_processes": worker_processes.snapshot(),
+            "counts": await self._call(self.backend.counts)
+        }
+
+
+class WorkerProcesses:
+    """
+    Processos de worker (job_worker.py) iniciados pelo servidor web
+    Cada processo tem seu próprio event loop, então gerações longas não disputam
+    o loop que atende as requisições HTTP
+    """
+
+    def __init__(self):
+        self.processes: List[subprocess.Popen] = []
+
+    def start(self, count: Optional[int] = None):
+        script = Path(__file__).resolve().parent.parent / "job_worker.py"
+        for _ in range(max(1, count or settings.job_worker_processes)):
+            process = subprocess.Popen(
+                [sys.executable, str(script), "--concurrency", str(settings.job_worker_concurrency)],
+                cwd=str(script.parent)
+            )
+            self.processes.append(process)
+            logger.info(f"Processo de worker iniciado (pid {process.pid})")
+
+    def stop(self, timeout: float = 10.0):
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [{"pid": p.pid, "alive": p.poll() is None, "returncode": p.returncode} for p in self.processes]
+
+
+# Instâncias globais
+job_queue = JobQueue()
+worker_processes = WorkerProcesses()
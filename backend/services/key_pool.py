@@ -0,0 +1,126 @@
+"""
+Pool de chaves de API por provider
+Distribui chamadas entre várias chaves (menos carregada ou round-robin) e
+coloca em quarentena temporária chaves que esgotaram cota ou foram recusadas
+"""
+from typing import Dict, Any, List
+import logging
+import time
+from config.settings import settings
+from services.providers import ProviderSpec
+from services.rate_limiter import rate_limiters, key_fingerprint
+from services.retry_policy import LLMProviderError
+
+logger = logging.getLogger(__name__)
+
+# Mensagens de 429 que indicam cota esgotada (não apenas excesso momentâneo de requisições)
+QUOTA_MARKERS = ("insufficient_quota", "quota", "credits", "billing")
+
+
+class KeyPool:
+    """Chaves de um provider com estado de quarentena"""
+
+    def __init__(self, provider: str, keys: List[str]):
+        self.provider = provider
+        self.keys = keys
+        self.quarantined_until: Dict[str, float] = {}
+        self.quarantine_reason: Dict[str, str] = {}
+        self._next = 0
+
+    def _available(self) -> List[str]:
+        now = time.monotonic()
+        return [k for k in self.keys if self.quarantined_until.get(k, 0.0) <= now]
+
+    def _load(self, key: str) -> int:
+        limiter = rate_limiters.get(self.provider, key)
+        return limiter.in_flight + limiter.waiting
+
+    def select(self) -> str:
+        """Escolhe a chave da próxima chamada"""
+
+        if len(self.keys) <= 1:
+            return self.keys[0] if self.keys else ""
+
+        available = self._available()
+        if not available:
+            wait = min(self.quarantined_until.values()) - time.monotonic()
+            raise LLMProviderError(
+                self.provider, 429, "todas as chaves em quarentena", retry_after=max(0.0, wait)
+            )
+
+        if settings.llm_key_selection == "round_robin":
+            key = available[self._next % len(available)]
+            self._next += 1
+            return key
+
+        # Menos carregada: chamadas em voo + na fila do rate limiter; empate alterna as chaves
+        start = self._next % len(available)
+        rotated = available[start:] + available[:start]
+        self._next += 1
+        return min(rotated, key=self._load)
+
+    def quarantine(self, key: str, seconds: float, reason: str):
+        self.quarantined_until[key] = time.monotonic() + seconds
+        self.quarantine_reason[key] = reason
+        logger.warning(
+            f"Chave {self.provider}/{key_fingerprint(key)} em quarentena por {seconds:.0f}s ({reason})"
+        )
+
+    def report_error(self, key: str, error: BaseException):
+        """Quarentena para chaves sem cota (402, 429 de cota) ou recusadas (401/403)"""
+
+        if len(self.keys) <= 1 or not isinstance(error, LLMProviderError):
+            return
+
+        status = error.status_code
+        message = str(error).lower()
+
+        if status in (401, 403):
+            self.quarantine(key, settings.llm_key_invalid_quarantine, f"chave recusada ({status})")
+        elif status == 402 or (status == 429 and any(marker in message for marker in QUOTA_MARKERS)):
+            self.quarantine(key, settings.llm_key_quota_quarantine, f"cota esgotada ({status})")
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        result = []
+        for key in self.keys:
+            limiter = rate_limiters.get(self.provider, key)
+            remaining = self.quarantined_until.get(key, 0.0) - now
+            result.append({
+                "key_id": key_fingerprint(key),
+                "in_flight": limiter.in_flight,
+                "waiting": limiter.waiting,
+                "requests": limiter.stats["requests"],
+                "tokens": limiter.stats["tokens"],
+                "throttled": limiter.stats["throttled"],
+                "quarantined_for": round(remaining, 1) if remaining > 0 else 0,
+                "quarantine_reason": self.quarantine_reason.get(key) if remaining > 0 else None
+            })
+        return result
+
+
+class KeyPoolRegistry:
+    """Um pool por provider, criado a partir das chaves declaradas no ProviderSpec"""
+
+    def __init__(self):
+        self._pools: Dict[str, KeyPool] = {}
+
+    def get(self, spec: ProviderSpec) -> KeyPool:
+        pool = self._pools.get(spec.name)
+        if pool is None:
+            pool = KeyPool(spec.name, list(spec.api_keys))
+            self._pools[spec.name] = pool
+        return pool
+
+    def select(self, spec: ProviderSpec) -> str:
+        return self.get(spec).select()
+
+    def report_error(self, spec: ProviderSpec, key: str, error: BaseException):
+        self.get(spec).report_error(key, error)
+
+    def snapshot(self, specs: List[ProviderSpec]) -> Dict[str, Any]:
+        return {spec.name: self.get(spec).snapshot() for spec in specs if spec.api_keys}
+
+
+# Instância global
+key_pools = KeyPoolRegistry()
@@ -0,0 +1,137 @@
+"""
+Cache de respostas de LLM endereçado por conteúdo
+Camada LRU em memória + camada persistente em disco (JSON) com TTL
+"""
+from typing import Optional, Dict, Any
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import time
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    Cache de completions idênticas
+    A chave é o hash de (provider, model, prompt, max_tokens, temperature)
+    """
+
+    def __init__(self):
+        self.max_entries = settings.llm_cache_max_entries
+        self.ttl = settings.llm_cache_ttl
+
+        # Diretório relativo ao backend, como os demais dados persistidos
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.cache_dir = os.path.join(backend_dir, settings.llm_cache_dir)
+
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0
+        }
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str, max_tokens: int, temperature: float) -> str:
+        """Gera a chave de conteúdo da requisição"""
+        raw = json.dumps(
+            [provider, model, prompt, max_tokens, round(float(temperature), 3)],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        # Subdiretório pelo prefixo evita milhares de arquivos num único diretório
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl > 0 and time.time() - entry.get("created_at", 0) > self.ttl
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Busca na memória e depois no disco"""
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            if not self._expired(entry):
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry["value"]
+            del self._memory[key]
+
+        path = self._path(key)
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                if not self._expired(entry):
+                    self._remember(key, entry)
+                    self.stats["disk_hits"] += 1
+                    return entry["value"]
+                os.remove(path)
+            except Exception as e:
+                logger.warning(f"Erro ao ler cache {key[:12]}: {e}")
+
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Grava nas duas camadas"""
+
+        entry = {"created_at": time.time(), "value": value}
+        self._remember(key, entry)
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            self.stats["writes"] += 1
+        except Exception as e:
+            logger.warning(f"Erro ao gravar cache {key[:12]}: {e}")
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        """Insere na camada LRU, descartando o item menos usado se cheia"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> int:
+        """Limpa as duas camadas, retornando quantos arquivos foram removidos"""
+
+        self._memory.clear()
+        removed = 0
+        if os.path.exists(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for filename in files:
+                    if filename.endswith(".json"):
+                        try:
+                            os.remove(os.path.join(root, filename))
+                            removed += 1
+                        except OSError:
+                            pass
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores de hit/miss e ocupação"""
+
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl
+        }
+
+
+# Instância global
+llm_cache = LLMResponseCache()
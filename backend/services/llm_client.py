@@ -2,15 +2,28 @@
 Cliente unificado para LLMs com suporte a OpenRouter e Gemini
 Inclui sistema de fallback, timeout e seleção inteligente de modelos
 """
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator, Callable, Iterable, Awaitable
+from concurrent.futures import Executor, ThreadPoolExecutor
 import httpx
 import asyncio
+import functools
+import json
+import re
 from enum import Enum
 import time
 import google.generativeai as genai
 import logging
 import traceback
 from config.settings import settings
+from services.http_pool import http_pool
+from services.llm_cache import llm_cache
+from services.model_health import model_health
+from services.rate_limiter import rate_limiters, estimate_tokens, parse_retry_after
+from services.retry_policy import retry_policy, LLMProviderError, classify_error
+from services.providers import provider_registry, ProviderSpec
+from services.key_pool import key_pools
+from services.metering import metering, resolve_cost
+from services.singleflight import singleflight
 
 # Configuração de Logs
 logger = logging.getLogger(__name__)
@@ -23,21 +36,62 @@ class TaskType(Enum):
     IMAGE = "image"  # Geração de imagens
 
 
+# Nomes no estilo OpenRouter que diferem do nome na API do Gemini
+GEMINI_MODEL_ALIASES = {
+    "gemini-pro": "gemini-1.5-pro",
+    "gemini-flash": "gemini-1.5-flash",
+}
+
+
+def gemini_model_name(model: Optional[str]) -> str:
+    """
+    Converte o identificador usado no model_map para o nome da API do Gemini
+    Ex.: "google/gemini-flash-1.5" -> "gemini-1.5-flash", "google/gemini-pro-1.5" -> "gemini-1.5-pro"
+    """
+    if not model:
+        return settings.gemini_default_model
+
+    name = model.split("/", 1)[-1]
+    name = GEMINI_MODEL_ALIASES.get(name, name)
+
+    # OpenRouter usa variante-versão; a API usa versão-variante
+    match = re.fullmatch(r"gemini-(pro|flash|flash-8b)-(\d+\.\d+)(.*)", name)
+    if match:
+        variant, version, suffix = match.groups()
+        name = f"gemini-{version}-{variant}{suffix}"
+    return name
+
+
+# Motivos de parada dos providers que indicam saída cortada pelo limite de tokens
+LENGTH_FINISH_REASONS = {"length", "max_tokens", "MAX_TOKENS"}
+
+
+def normalize_finish_reason(reason: Any) -> Optional[str]:
+    """
+    Motivo de parada no formato OpenAI: "length" quando a saída atingiu max_tokens,
+    "stop" no fim natural; os demais em minúsculas (ex.: "content_filter", "safety")
+    """
+    if reason is None:
+        return None
+    reason = getattr(reason, "name", reason)  # Enum do SDK do Gemini
+    if reason in LENGTH_FINISH_REASONS:
+        return "length"
+    reason = str(reason).lower()
+    return "stop" if reason in ("stop", "end_turn", "stop_sequence") else reason
+
+
 class LLMClient:
     """
     Cliente unificado para múltiplos LLMs
-    Gerencia OpenRouter e Gemini com fallback automático
+    Roteia pelo registro de providers (OpenRouter, OpenAI, Gemini, servidor local)
+    com fallback automático
     """
     
     def __init__(self):
-        self.openrouter_base = settings.openrouter_base_url
-        self.openrouter_key = settings.openrouter_api_key
-        self.openai_base = settings.openai_base_url
-        self.openai_key = settings.openai_api_key
+        self.providers = provider_registry
         self.gemini_key = settings.gemini_api_key
-        self.timeout = settings.model_timeout
         
-        # Configurar Gemini
+        # Configurar Gemini (caminho via SDK)
         if self.gemini_key:
             genai.configure(api_key=self.gemini_key)
         
@@ -64,8 +118,18 @@ class LLMClient:
             ]
         }
         
-        # Cache de performance
-        self.performance_cache: Dict[str, float] = {}
+        # Saúde dos modelos (latência, erros, circuit breaker)
+        self.health = model_health
+        
+        # Orçamento de hedging por tipo de tarefa
+        self.hedge_stats: Dict[str, Dict[str, int]] = {}
+        
+        # Aceites e escaladas da cascata por tipo de tarefa
+        self.cascade_stats: Dict[str, Dict[str, Any]] = {}
+        
+        # Gemini via SDK (quando GEMINI_USE_REST=false): handles por modelo e executor próprio
+        self._gemini_models: Dict[str, Any] = {}
+        self._gemini_executor: Optional[ThreadPoolExecutor] = None
     
     async def generate(
         self,
@@ -73,16 +137,274 @@ class LLMClient:
         task_type: TaskType = TaskType.GENERATION,
         model: Optional[str] = None,
         max_tokens: int = 4000,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        use_cache: Optional[bool] = None,
+        hedge: Optional[bool] = None,
+        caller: str = "unknown",
+        book_id: Optional[str] = None,
+        validator: Optional[Callable[[str], bool]] = None
     ) -> Dict[str, Any]:
         """
         Gera resposta usando LLM apropriado com fallback
+        
+        caller/book_id identificam quem consome a chamada no ledger de medição
+        (custo por funcionalidade e por livro).
+        
+        validator: com modelo automático e cascata configurada para a tarefa
+        (LLM_CASCADE), tenta primeiro o modelo barato e só escala para o próximo
+        quando validator(content) rejeita a resposta.
+        
+        use_cache: None usa o cache apenas para chamadas determinísticas
+        (temperatura <= LLM_CACHE_MAX_TEMPERATURE); True/False força ou ignora o cache.
+        hedge: dispara o próximo modelo em paralelo se o primeiro demorar além do
+        percentil de latência (None segue LLM_HEDGING_ENABLED).
+        """
+        if hedge is None:
+            hedge = settings.llm_hedging_enabled
+        
+        # Consumidores de alto volume e baixo risco vão para o servidor local, se configurado
+        if model is None:
+            model = self.providers.route_for_caller(caller)
+        
+        if model is None and validator is not None and self.cascade_for(task_type):
+            return await self._generate_cascade(
+                prompt, task_type, validator, max_tokens, temperature, use_cache, hedge, caller, book_id
+            )
+        
+        started = time.monotonic()
+        
+        if use_cache is None:
+            use_cache = temperature <= settings.llm_cache_max_temperature
+        use_cache = use_cache and settings.llm_cache_enabled
+        
+        # Chave normalizada da requisição, compartilhada por cache e single-flight.
+        # Sem modelo explícito a chave usa a tarefa, estável mesmo com reordenação por performance
+        request_key = llm_cache.make_key(
+            provider=self._resolve_provider(model) if model else "auto",
+            model=model or f"auto/{task_type.value}",
+            prompt=prompt.strip(),
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        
+        if use_cache:
+            cached = llm_cache.get(request_key)
+            if cached is not None:
+                logger.info(f"Cache hit para {model or task_type.value}")
+                # Resposta reaproveitada não gera gasto novo
+                result = {**cached, "cached": True, "cost": 0.0, "cost_source": "cache"}
+                self._meter(result, caller, book_id, started)
+                return result
+        
+        async def run() -> Dict[str, Any]:
+            result = await self._generate_uncached(prompt, task_type, model, max_tokens, temperature, hedge)
+            cost, cost_source = resolve_cost(result["model"], result.get("tokens") or {}, result.get("cost"))
+            result = {**result, "cost": cost, "cost_source": cost_source}
+            if use_cache:
+                llm_cache.set(request_key, result)
+            return result
+        
+        try:
+            if not settings.llm_singleflight_enabled:
+                result = await run()
+            else:
+                # Chamadas idênticas concorrentes aguardam a mesma execução upstream
+                result = await singleflight.do(request_key, run)
+        except Exception as e:
+            metering.record(
+                caller=caller,
+                book_id=book_id,
+                model=model or f"auto/{task_type.value}",
+                provider=self._resolve_provider(model) if model else "auto",
+                latency=time.monotonic() - started,
+                status="error",
+                error=str(e)[:300]
+            )
+            raise
+        
+        if result.get("coalesced"):
+            # O custo já foi registrado pela chamada que executou upstream
+            result = {**result, "cost": 0.0, "cost_source": "coalesced"}
+        
+        self._meter(result, caller, book_id, started)
+        return result
+    
+    def cascade_for(self, task_type: TaskType) -> List[str]:
+        """Modelos da cascata da tarefa, do mais barato ao mais forte ([] se desativada)"""
+        if not settings.llm_cascade_enabled:
+            return []
+        return list(settings.llm_cascade.get(task_type.value, []))
+    
+    async def _generate_cascade(
+        self,
+        prompt: str,
+        task_type: TaskType,
+        validator: Callable[[str], bool],
+        max_tokens: int,
+        temperature: float,
+        use_cache: Optional[bool],
+        hedge: bool,
+        caller: str,
+        book_id: Optional[str]
+    ) -> Dict[str, Any]:
+        """
+        Cascata de modelos: cada nível é uma chamada normal (cache, fallback, medição)
+        e a resposta é aceita no primeiro nível aprovado pelo validador. Se nenhum
+        nível passar, devolve a resposta do mais forte para o chamador decidir.
+        """
+        tiers = self.cascade_for(task_type)
+        stats = self.cascade_stats.setdefault(task_type.value, {
+            "requests": 0,
+            "accepted": {},
+            "escalations": 0,
+            "exhausted": 0
+        })
+        stats["requests"] += 1
+        
+        last_result = None
+        last_error = None
+        cost = 0.0
+        
+        for tier, tier_model in enumerate(tiers):
+            try:
+                result = await self.generate(
+                    prompt=prompt,
+                    task_type=task_type,
+                    model=tier_model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    use_cache=use_cache,
+                    hedge=hedge,
+                    caller=caller,
+                    book_id=book_id
+                )
+            except Exception as e:
+                logger.warning(f"Cascata {task_type.value}: nível {tier} ({tier_model}) falhou: {e}")
+                last_error = e
+                continue
+            
+            cost += result.get("cost", 0.0) or 0.0
+            last_result = {**result, "cost": cost, "cascade_tier": tier}
+            
+            if validator(result["content"]):
+                stats["accepted"][tier_model] = stats["accepted"].get(tier_model, 0) + 1
+                return {**last_result, "validation_passed": True}
+            
+            if tier < len(tiers) - 1:
+                stats["escalations"] += 1
+                logger.info(
+                    f"Cascata {task_type.value}: resposta de {tier_model} reprovada, escalando para {tiers[tier + 1]}"
+                )
+        
+        stats["exhausted"] += 1
+        if last_result is not None:
+            return {**last_result, "validation_passed": False}
+        
+        # Nenhum nível respondeu: segue o roteamento normal da tarefa
+        logger.warning(f"Cascata {task_type.value} sem resposta ({last_error}), usando roteamento padrão")
+        return await self.generate(
+            prompt=prompt,
+            task_type=task_type,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            use_cache=use_cache,
+            hedge=hedge,
+            caller=caller,
+            book_id=book_id
+        )
+    
+    def get_cascade_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.llm_cascade_enabled,
+            "tiers": settings.llm_cascade,
+            "tasks": self.cascade_stats
+        }
+    
+    def _meter(self, result: Dict[str, Any], caller: str, book_id: Optional[str], started: float):
+        """Registra a chamada concluída no ledger de medição"""
+        
+        metering.record(
+            caller=caller,
+            book_id=book_id,
+            model=result.get("model", "unknown"),
+            provider=result.get("provider", "unknown"),
+            key_id=result.get("key_id"),
+            tokens=result.get("tokens") or {},
+            latency=time.monotonic() - started,
+            cost=result.get("cost", 0.0) or 0.0,
+            cost_source=result.get("cost_source"),
+            cached=bool(result.get("cached")),
+            coalesced=bool(result.get("coalesced")),
+            stream=bool(result.get("stream"))
+        )
+    
+    async def generate_many(
+        self,
+        requests: List[Dict[str, Any]],
+        max_concurrency: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Executa um lote de gerações com concorrência limitada
+        
+        Cada item de requests contém os argumentos de generate() (prompt, task_type,
+        model, ...). A ordem dos resultados segue a dos pedidos; falhas são reportadas
+        por item ({"status": "error"}) sem abortar o lote. Todas as chamadas passam
+        pelo rate limiter dos providers.
         """
+        limit = max(1, max_concurrency or settings.llm_batch_max_concurrency)
+        semaphore = asyncio.Semaphore(limit)
+        started = time.monotonic()
+        
+        async def run(index: int, request: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    result = await self.generate(**request)
+                    return {"index": index, "status": "success", **result}
+                except Exception as e:
+                    logger.error(f"Lote: item {index} falhou: {e}")
+                    return {"index": index, "status": "error", "error": str(e)}
+        
+        results = await asyncio.gather(*(run(i, request) for i, request in enumerate(requests)))
+        
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        total_cost = 0.0
+        for result in results:
+            if result["status"] != "success":
+                continue
+            tokens = result.get("tokens") or {}
+            for field_name in usage:
+                usage[field_name] += tokens.get(field_name, 0) or 0
+            total_cost += result.get("cost", 0) or 0
+        
+        if not usage["total_tokens"]:
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        
+        succeeded = sum(1 for r in results if r["status"] == "success")
+        
+        return {
+            "results": list(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "tokens": usage,
+            "cost": total_cost,
+            "elapsed": round(time.monotonic() - started, 3)
+        }
+    
+    def _resolve_provider(self, model: str) -> str:
+        """Provider que atenderá o modelo, pelas mesmas regras de roteamento de generate()"""
+        return self.providers.resolve(model).name
+    
+    async def _generate_uncached(
+        self,
+        prompt: str,
+        task_type: TaskType,
+        model: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        hedge: bool = False
+    ) -> Dict[str, Any]:
+        """Executa a geração nos providers, sem consultar o cache"""
         logger.info(f"Iniciando geração - Task: {task_type}, Model: {model}")
-        logger.info(f"OpenRouter Key: {'✓' if self.openrouter_key else '✗'}")
-        logger.info(f"OpenAI Key: {'✓' if self.openai_key else '✗'}")
-        logger.info(f"Gemini Key: {'✓' if self.gemini_key else '✗'}")
-        logger.info(f"Timeout: {self.timeout}s")
         
         # Selecionar modelo se não especificado
         if model is None:
@@ -90,45 +412,44 @@ class LLMClient:
         
         logger.info(f"Modelo selecionado: {model}")
         
-        # Tentar Gemini primeiro se for modelo Google
-        if "gemini" in model.lower() and self.gemini_key:
+        # Provider direto (Gemini, OpenAI, servidor local) quando o modelo pertence a ele
+        spec = self.providers.resolve(model)
+        if spec.name != "openrouter" and self.health.is_available(model):
+            timeout = self.health.compute_timeout(model, task_type.value, max_tokens)
             try:
-                result = await self._generate_gemini(prompt, max_tokens, temperature)
-                if result:
-                    return result
-            except Exception as e:
-                logger.warning(f"Gemini failed: {e}, falling back to other providers")
-        
-        # Tentar OpenAI se for modelo OpenAI
-        if "gpt" in model.lower() or "openai" in model.lower() and self.openai_key:
-            try:
-                result = await self._generate_openai(prompt, model, max_tokens, temperature)
+                if spec.kind == "gemini":
+                    call = lambda: self._generate_gemini(prompt, max_tokens, temperature, timeout=timeout, model=model)
+                else:
+                    call = lambda: self._generate_openai_compatible(spec, prompt, model, max_tokens, temperature, timeout)
+                result = await self._attempt(model, call, task_type)
                 if result:
                     return result
             except Exception as e:
-                logger.warning(f"OpenAI failed: {e}, falling back to OpenRouter")
+                logger.warning(f"{spec.name} failed: {e}, falling back to OpenRouter")
         
-        # Usar OpenRouter (com fallback automático)
-        models_to_try = self.model_map.get(task_type, [model])
+        # Usar OpenRouter (com fallback automático), pulando modelos com circuito aberto
+        models_to_try = self._fallback_models(model, task_type, direct=spec.name != "openrouter")
         last_error = None
         
+        if hedge and len(models_to_try) > 1:
+            return await self._generate_hedged(prompt, task_type, models_to_try, max_tokens, temperature)
+        
         for attempt_model in models_to_try:
             try:
-                result = await self._generate_openrouter(
-                    prompt=prompt,
-                    model=attempt_model,
-                    max_tokens=max_tokens,
-                    temperature=temperature
+                return await self._attempt(
+                    attempt_model,
+                    lambda: self._generate_openrouter(
+                        prompt=prompt,
+                        model=attempt_model,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        timeout=self.health.compute_timeout(attempt_model, task_type.value, max_tokens)
+                    ),
+                    task_type
                 )
                 
-                # Atualizar cache de performance
-                self._update_performance_cache(attempt_model, success=True)
-                
-                return result
-                
-            except asyncio.TimeoutError:
+            except (asyncio.TimeoutError, httpx.TimeoutException):
                 logger.warning(f"Timeout com {attempt_model}, tentando próximo modelo...")
-                self._update_performance_cache(attempt_model, success=False)
                 last_error = "Timeout"
                 continue
                 
@@ -141,24 +462,210 @@ class LLMClient:
         logger.error(f"Todos os modelos falharam. Último erro: {last_error}")
         raise Exception(f"Todos os modelos falharam. Último erro: {last_error}")
     
-    async def _generate_openrouter(
+    async def _generate_hedged(
         self,
         prompt: str,
-        model: str,
+        task_type: TaskType,
+        models: List[str],
         max_tokens: int,
         temperature: float
     ) -> Dict[str, Any]:
-        """Gera resposta via OpenRouter com timeout"""
+        """
+        Hedged request sobre a lista de fallback
+        
+        Dispara o modelo primário; se ele não responder dentro do percentil de
+        latência observado, dispara o próximo candidato em paralelo (no máximo um
+        hedge por chamada, limitado pelo orçamento da tarefa). A primeira resposta
+        válida vence e as demais são canceladas. Falhas seguem para o próximo modelo.
+        """
+        candidates = list(models)
+        primary = candidates[0]
+        pending: Dict[asyncio.Task, str] = {}
+        started_at: Dict[str, float] = {}
+        hedged = False
+        last_error = None
         
-        headers = {
-            "Authorization": f"Bearer {self.openrouter_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "http://localhost:8000",  # Opcional
-            "X-Title": "Ebook Generator"  # Opcional
+        stats = self.hedge_stats.setdefault(task_type.value, {"requests": 0, "hedged": 0, "hedge_wins": 0})
+        stats["requests"] += 1
+        
+        def launch(attempt_model: str):
+            started_at[attempt_model] = time.monotonic()
+            task = asyncio.create_task(self._attempt(
+                attempt_model,
+                lambda: self._generate_openrouter(
+                    prompt=prompt,
+                    model=attempt_model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    timeout=self.health.compute_timeout(attempt_model, task_type.value, max_tokens)
+                ),
+                task_type
+            ))
+            pending[task] = attempt_model
+        
+        launch(candidates.pop(0))
+        
+        try:
+            while pending:
+                delay = None
+                # Hedge só faz sentido enquanto o primário ainda está em voo
+                if not hedged and candidates and primary in pending.values() and self._hedge_allowed(task_type):
+                    elapsed = time.monotonic() - started_at[primary]
+                    delay = max(0.0, self._hedge_delay(primary) - elapsed)
+                
+                done, _ = await asyncio.wait(
+                    list(pending.keys()),
+                    timeout=delay,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                if not done:
+                    # Primário passou do limiar: disparar hedge
+                    hedge_model = candidates.pop(0)
+                    logger.info(f"Hedging: {primary} acima do limiar, disparando {hedge_model}")
+                    stats["hedged"] += 1
+                    hedged = True
+                    launch(hedge_model)
+                    continue
+                
+                for task in done:
+                    attempt_model = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.error(f"Erro com {attempt_model}: {e}")
+                        last_error = str(e)
+                        continue
+                    
+                    if result and result.get("content"):
+                        if attempt_model != primary:
+                            stats["hedge_wins"] += 1
+                        return result
+                
+                # Só falhas até agora: seguir a lista de fallback normalmente
+                if not pending and candidates:
+                    launch(candidates.pop(0))
+        finally:
+            # _tracked libera o health tracker ao ser cancelado
+            for task in pending:
+                task.cancel()
+        
+        logger.error(f"Todos os modelos falharam (hedged). Último erro: {last_error}")
+        raise Exception(f"Todos os modelos falharam. Último erro: {last_error}")
+    
+    def _hedge_allowed(self, task_type: TaskType) -> bool:
+        """Respeita a fração máxima de chamadas com hedge configurada para a tarefa"""
+        
+        budget = settings.llm_hedge_budget.get(task_type.value, 0.0)
+        stats = self.hedge_stats.get(task_type.value)
+        if budget <= 0 or not stats:
+            return False
+        return (stats["hedged"] + 1) / stats["requests"] <= budget
+    
+    def _hedge_delay(self, model: str) -> float:
+        """Limiar de hedge: percentil configurado das latências recentes do modelo"""
+        
+        if self.health.sample_count(model) < settings.llm_hedge_min_samples:
+            return settings.llm_hedge_default_delay
+        
+        threshold = self.health.percentile(model, settings.llm_hedge_percentile)
+        return max(settings.llm_hedge_min_delay, threshold)
+    
+    async def _attempt(
+        self,
+        model: str,
+        call: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+        task_type: Optional[TaskType] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Uma tentativa num modelo: erros transitórios (429, 502/503, conexão) são
+        repetidos no mesmo modelo conforme a política de retry antes do fallback
+        O health tracker recebe uma única falha, quando a política desiste
+        """
+        try:
+            return await retry_policy.run(model, lambda: self._tracked(model, call, task_type))
+        except Exception as e:
+            self._record_failure(model, e)
+            raise
+    
+    async def _tracked(
+        self,
+        model: str,
+        call: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+        task_type: Optional[TaskType] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Executa a chamada registrando latência e tokens/s no health tracker
+        Exceções só liberam o modelo: _attempt registra a falha depois dos retries
+        """
+        
+        self.health.acquire(model)
+        started = time.monotonic()
+        recorded = False
+        
+        try:
+            try:
+                result = await call()
+            except Exception:
+                recorded = True
+                self.health.release(model)
+                raise
+            
+            recorded = True
+            if not result or not result.get("content"):
+                # Providers que engolem o erro e retornam None também contam como falha
+                self.health.record_failure(model, "resposta vazia")
+                return result
+            
+            # A espera na fila do rate limiter não é latência do modelo
+            latency = time.monotonic() - started - result.pop("queue_wait", 0.0)
+            completion_tokens = (result.get("tokens") or {}).get("completion_tokens", 0) or 0
+            self.health.record_success(
+                model, latency, completion_tokens,
+                task=task_type.value if task_type else None
+            )
+            return result
+        finally:
+            if not recorded:
+                # Cancelada (hedge perdedor, cliente desconectado): libera a chamada de teste do half-open
+                self.health.release(model)
+    
+    def _record_failure(self, model: str, error: BaseException):
+        """
+        Registra no health tracker a falha de uma tentativa lógica (após os retries)
+        429 é limite da chave de API, não do modelo: não conta para o circuit breaker
+        """
+        if classify_error(error) == "rate_limit":
+            self.health.release(model)
+            return
+        self.health.record_failure(model, error)
+    
+    def get_hedge_stats(self) -> Dict[str, Any]:
+        """Contadores de hedging por tarefa e limiares atuais por modelo"""
+        return {
+            "enabled": settings.llm_hedging_enabled,
+            "budget": settings.llm_hedge_budget,
+            "tasks": self.hedge_stats,
+            "thresholds": {model: round(self._hedge_delay(model), 3) for model in self.health.models}
         }
+    
+    async def _generate_openai_compatible(
+        self,
+        spec: ProviderSpec,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        temperature: float,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Gera resposta em qualquer endpoint /chat/completions compatível com OpenAI
+        timeout: total em segundos; None calcula pelo histórico do modelo
+        """
+        timeout = timeout or self.health.compute_timeout(model, None, max_tokens)
         
         payload = {
-            "model": model,
+            "model": spec.model_name(model),
             "messages": [
                 {"role": "user", "content": prompt}
             ],
@@ -166,155 +673,606 @@ class LLMClient:
             "temperature": temperature
         }
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.openrouter_base}/chat/completions",
-                headers=headers,
-                json=payload
+        client = http_pool.get(spec.name)
+        api_key = key_pools.select(spec)
+        limiter = rate_limiters.get(spec.name, api_key)
+        
+        async with limiter.slot(estimate_tokens(prompt, max_tokens)) as lease:
+            response = await asyncio.wait_for(
+                client.post(
+                    spec.chat_url,
+                    headers=spec.headers(api_key),
+                    json=payload,
+                    timeout=httpx.Timeout(timeout, connect=settings.http_connect_timeout)
+                ),
+                timeout=timeout
             )
+            limiter.observe_response(response.status_code, response.headers)
             
             if response.status_code != 200:
-                logger.error(f"OpenRouter Error: {response.status_code} - {response.text}")
-                response.raise_for_status()
+                logger.error(f"{spec.name} Error: {response.status_code} - {response.text}")
+                error = LLMProviderError(
+                    spec.name, response.status_code, response.text, model=model,
+                    retry_after=parse_retry_after(response.headers.get("retry-after"))
+                )
+                key_pools.report_error(spec, api_key, error)
+                raise error
             
             data = response.json()
-            
-            return {
-                "content": data["choices"][0]["message"]["content"],
-                "model": model,
-                "provider": "openrouter",
-                "tokens": data.get("usage", {}),
-                "cost": data.get("usage", {}).get("total_cost", 0)
-            }
+            usage = data.get("usage") or {}
+            lease.settle(usage.get("total_tokens", 0))
+        
+        return {
+            "content": data["choices"][0]["message"]["content"],
+            "model": model,
+            "provider": spec.name,
+            "key_id": limiter.key_id,
+            "tokens": usage,
+            "cost": usage.get("total_cost", 0),
+            "finish_reason": normalize_finish_reason(data["choices"][0].get("finish_reason")),
+            "queue_wait": lease.waited
+        }
+    
+    async def _generate_openrouter(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        temperature: float,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Gera resposta via OpenRouter com timeout"""
+        return await self._generate_openai_compatible(
+            provider_registry.get("openrouter"), prompt, model, max_tokens, temperature, timeout
+        )
     
     async def _generate_gemini(
         self,
         prompt: str,
         max_tokens: int,
-        temperature: float
+        temperature: float,
+        timeout: Optional[float] = None,
+        model: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
-        """Gera resposta via Gemini SDK"""
+        """
+        Gera resposta via Gemini
+        REST no cliente HTTP do pool (padrão) ou SDK em executor dedicado (GEMINI_USE_REST=false)
+        """
+        model_name = gemini_model_name(model)
+        timeout = timeout or self.health.compute_timeout(model or model_name, None, max_tokens)
+        
+        spec = provider_registry.get("google")
         
         try:
-            model = genai.GenerativeModel('gemini-1.5-pro')
-            
-            # Configurar geração
-            generation_config = {
-                "max_output_tokens": max_tokens,
-                "temperature": temperature,
-            }
-            
-            # Gerar com timeout
-            response = await asyncio.wait_for(
-                asyncio.to_thread(
-                    model.generate_content,
-                    prompt,
-                    generation_config=generation_config
-                ),
-                timeout=self.timeout
-            )
+            # O SDK usa a chave global de genai.configure: rotação só no caminho REST
+            api_key = key_pools.select(spec) if settings.gemini_use_rest else spec.api_key
+            limiter = rate_limiters.get("google", api_key)
+            async with limiter.slot(estimate_tokens(prompt, max_tokens)) as lease:
+                if settings.gemini_use_rest:
+                    client = http_pool.get("google")
+                    response = await asyncio.wait_for(
+                        client.post(
+                            f"{spec.base_url}/models/{model_name}:generateContent",
+                            headers=spec.headers(api_key),
+                            json=self._gemini_payload(prompt, max_tokens, temperature),
+                            timeout=httpx.Timeout(timeout, connect=settings.http_connect_timeout)
+                        ),
+                        timeout=timeout
+                    )
+                    limiter.observe_response(response.status_code, response.headers)
+                    
+                    if response.status_code != 200:
+                        error = LLMProviderError(
+                            "google", response.status_code, response.text, model=model or model_name,
+                            retry_after=parse_retry_after(response.headers.get("retry-after"))
+                        )
+                        key_pools.report_error(spec, api_key, error)
+                        raise error
+                    
+                    data = response.json()
+                    text, usage = self._parse_gemini_chunk(data)
+                    finish_reason = self._gemini_finish_reason(data)
+                else:
+                    response = await asyncio.wait_for(
+                        self._run_gemini_blocking(
+                            self._gemini_model(model_name).generate_content,
+                            prompt,
+                            generation_config={"max_output_tokens": max_tokens, "temperature": temperature}
+                        ),
+                        timeout=timeout
+                    )
+                    text = response.text
+                    usage = self._gemini_sdk_usage(response)
+                    finish_reason = self._gemini_sdk_finish_reason(response)
+                
+                lease.settle(usage.get("total_tokens", 0))
             
             return {
-                "content": response.text,
-                "model": "gemini-1.5-pro",
+                "content": text,
+                "model": model or model_name,  # Id pedido (model_map), usado em métricas, preços e fallback
+                "api_model": model_name,
                 "provider": "google",
-                "tokens": {
-                    "prompt_tokens": response.usage_metadata.prompt_token_count if hasattr(response, 'usage_metadata') else 0,
-                    "completion_tokens": response.usage_metadata.candidates_token_count if hasattr(response, 'usage_metadata') else 0
-                }
+                "key_id": limiter.key_id,
+                "tokens": usage,
+                "finish_reason": finish_reason,
+                "queue_wait": lease.waited
             }
             
-        except asyncio.TimeoutError:
+        except (asyncio.TimeoutError, LLMProviderError):
+            # Erros com status seguem para a política de retry
             raise
         except Exception as e:
             logger.error(f"Gemini error: {e}")
             logger.error(traceback.format_exc())
             return None
     
+    def _gemini_payload(self, prompt: str, max_tokens: int, temperature: float) -> Dict[str, Any]:
+        """Corpo de generateContent/streamGenerateContent"""
+        return {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {"maxOutputTokens": max_tokens, "temperature": temperature}
+        }
+    
+    def _parse_gemini_chunk(self, data: Dict[str, Any]) -> tuple:
+        """Extrai (texto, uso de tokens) de uma resposta REST do Gemini"""
+        
+        text = ""
+        candidates = data.get("candidates") or []
+        if candidates:
+            parts = (candidates[0].get("content") or {}).get("parts") or []
+            text = "".join(part.get("text", "") for part in parts)
+        
+        usage: Dict[str, Any] = {}
+        metadata = data.get("usageMetadata")
+        if metadata:
+            usage = {
+                "prompt_tokens": metadata.get("promptTokenCount", 0),
+                "completion_tokens": metadata.get("candidatesTokenCount", 0),
+                "total_tokens": metadata.get("totalTokenCount", 0)
+            }
+        return text, usage
+    
+    def _gemini_finish_reason(self, data: Dict[str, Any]) -> Optional[str]:
+        """Motivo de parada de uma resposta REST do Gemini (normalizado)"""
+        candidates = data.get("candidates") or []
+        return normalize_finish_reason(candidates[0].get("finishReason")) if candidates else None
+    
+    def _gemini_sdk_finish_reason(self, response: Any) -> Optional[str]:
+        candidates = getattr(response, "candidates", None) or []
+        return normalize_finish_reason(getattr(candidates[0], "finish_reason", None)) if candidates else None
+    
+    def _gemini_sdk_usage(self, response: Any) -> Dict[str, Any]:
+        metadata = getattr(response, "usage_metadata", None)
+        if not metadata:
+            return {}
+        return {
+            "prompt_tokens": metadata.prompt_token_count,
+            "completion_tokens": metadata.candidates_token_count,
+            "total_tokens": metadata.total_token_count
+        }
+    
+    def _gemini_model(self, model_name: str) -> Any:
+        """Handle do SDK reaproveitado por nome de modelo"""
+        
+        handle = self._gemini_models.get(model_name)
+        if handle is None:
+            handle = genai.GenerativeModel(model_name)
+            self._gemini_models[model_name] = handle
+        return handle
+    
+    def _gemini_pool(self) -> Executor:
+        """Executor dedicado ao SDK do Gemini, separado do executor padrão do loop"""
+        
+        if self._gemini_executor is None:
+            self._gemini_executor = ThreadPoolExecutor(
+                max_workers=settings.gemini_executor_workers,
+                thread_name_prefix="gemini"
+            )
+        return self._gemini_executor
+    
+    async def _run_gemini_blocking(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._gemini_pool(), functools.partial(func, *args, **kwargs))
+    
     async def _generate_openai(
         self,
         prompt: str,
         model: str,
         max_tokens: int,
-        temperature: float
+        temperature: float,
+        timeout: Optional[float] = None
     ) -> Dict[str, Any]:
         """Gera resposta via OpenAI com timeout"""
+        return await self._generate_openai_compatible(
+            provider_registry.get("openai"), prompt, model, max_tokens, temperature, timeout
+        )
+    
+    async def generate_stream(
+        self,
+        prompt: str,
+        task_type: TaskType = TaskType.GENERATION,
+        model: Optional[str] = None,
+        max_tokens: int = 4000,
+        temperature: float = 0.7,
+        caller: str = "unknown",
+        book_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Gera resposta em streaming, token a token
         
-        headers = {
-            "Authorization": f"Bearer {self.openai_key}",
-            "Content-Type": "application/json"
-        }
+        Emite {"delta": "<texto>"} para cada trecho recebido e, ao final,
+        {"done": True, "model", "provider", "tokens", "finish_reason"}. O fallback entre modelos
+        só acontece antes do primeiro trecho ser emitido.
         
-        data = {
-            "model": model,
+        Em vez de um timeout total, o primeiro trecho tem prazo derivado do TTFT
+        observado e os seguintes um prazo de inatividade (LLM_STREAM_IDLE_TIMEOUT):
+        geração longa que continua progredindo não é interrompida.
+        """
+        task = task_type.value
+        if model is None:
+            model = self.providers.route_for_caller(caller) or self._select_best_model(task_type)
+        
+        logger.info(f"Iniciando geração em streaming - Task: {task_type}, Model: {model}")
+        
+        attempts: List[tuple] = []
+        
+        spec = self.providers.resolve(model)
+        if spec.name != "openrouter" and spec.supports_streaming and self.health.is_available(model):
+            if spec.kind == "gemini":
+                attempts.append((model, lambda: self._stream_gemini(
+                    prompt, max_tokens, temperature, self.health.first_token_timeout(model, task), model
+                )))
+            else:
+                attempts.append((model, lambda: self._stream_openai_compatible(
+                    spec, model, prompt, max_tokens, temperature, self.health.first_token_timeout(model, task)
+                )))
+        
+        openrouter = self.providers.get("openrouter")
+        for attempt_model in self._fallback_models(model, task_type, direct=spec.name != "openrouter"):
+            attempts.append((
+                attempt_model,
+                lambda m=attempt_model: self._stream_openai_compatible(
+                    openrouter, m, prompt, max_tokens, temperature, self.health.first_token_timeout(m, task)
+                )
+            ))
+        
+        last_error = None
+        
+        for attempt_model, attempt in attempts:
+            retry_policy.start()
+            retry_number = 0
+            
+            while True:
+                started = False
+                recorded = False
+                self.health.acquire(attempt_model)
+                requested_at = started_at = time.monotonic()
+                ttft = None
+                try:
+                    async for event in attempt():
+                        if "queued" in event:
+                            # Vaga do rate limiter obtida: latência e TTFT contam a partir daqui
+                            started_at = time.monotonic()
+                            continue
+                        started = True
+                        if ttft is None and event.get("delta"):
+                            ttft = time.monotonic() - started_at
+                        if event.get("done"):
+                            completion_tokens = (event.get("tokens") or {}).get("completion_tokens", 0) or 0
+                            recorded = True
+                            self.health.record_success(
+                                attempt_model, time.monotonic() - started_at, completion_tokens,
+                                task=task, ttft=ttft
+                            )
+                            cost, cost_source = resolve_cost(event["model"], event.get("tokens") or {}, event.get("cost"))
+                            event = {**event, "cost": cost, "cost_source": cost_source, "stream": True}
+                            self._meter(event, caller, book_id, requested_at)
+                        yield event
+                    return
+                except Exception as e:
+                    recorded = True
+                    # Depois do primeiro token não há como repetir nem trocar de modelo
+                    if started:
+                        self._record_failure(attempt_model, e)
+                        raise
+                    
+                    delay = retry_policy.decide(e, retry_number)
+                    if delay is not None:
+                        # Retry no mesmo modelo não conta como falha no health tracker
+                        self.health.release(attempt_model)
+                        logger.warning(f"Streaming com {attempt_model} falhou ({e}), repetindo em {delay:.2f}s")
+                        await asyncio.sleep(delay)
+                        retry_number += 1
+                        continue
+                    
+                    self._record_failure(attempt_model, e)
+                    logger.warning(f"Streaming falhou antes do primeiro token: {e}, tentando próximo...")
+                    last_error = str(e)
+                    break
+                finally:
+                    if not recorded:
+                        # Consumidor desconectou (GeneratorExit/CancelledError): libera o half-open
+                        self.health.release(attempt_model)
+        
+        logger.error(f"Todos os modelos falharam no streaming. Último erro: {last_error}")
+        metering.record(
+            caller=caller, book_id=book_id, model=model, provider="auto",
+            status="error", error=str(last_error)[:300], stream=True
+        )
+        raise Exception(f"Todos os modelos falharam. Último erro: {last_error}")
+    
+    async def _stream_openai_compatible(
+        self,
+        spec: ProviderSpec,
+        model: str,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        first_token_timeout: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Consome o stream SSE de um endpoint /chat/completions compatível com OpenAI
+        O primeiro evento, {"queued": segundos}, marca a obtenção da vaga no rate limiter
+        """
+        
+        first_token_timeout = first_token_timeout or self.health.first_token_timeout(model)
+        idle_timeout = settings.llm_stream_idle_timeout
+        
+        provider = spec.name
+        payload = {
+            "model": spec.model_name(model),
             "messages": [{"role": "user", "content": prompt}],
             "max_tokens": max_tokens,
-            "temperature": temperature
+            "temperature": temperature,
+            "stream": True
         }
+        if spec.stream_usage:
+            payload["stream_options"] = {"include_usage": True}
         
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.openai_base}/chat/completions",
-                    headers=headers,
-                    json=data
+        usage: Dict[str, Any] = {}
+        finish_reason = None
+        client = http_pool.get(provider)
+        api_key = key_pools.select(spec)
+        limiter = rate_limiters.get(provider, api_key)
+        
+        # O timeout de leitura do httpx é só uma rede de segurança; os prazos reais
+        # (primeiro token e inatividade) são aplicados linha a linha abaixo
+        read_timeout = max(first_token_timeout, idle_timeout)
+        request_timeout = httpx.Timeout(read_timeout, connect=settings.http_connect_timeout)
+        
+        async with limiter.slot(estimate_tokens(prompt, max_tokens)) as lease:
+            yield {"queued": lease.waited}
+            async with client.stream(
+                "POST", spec.chat_url, headers=spec.headers(api_key), json=payload, timeout=request_timeout
+            ) as response:
+                limiter.observe_response(response.status_code, response.headers)
+                
+                if response.status_code != 200:
+                    body = await response.aread()
+                    logger.error(f"{provider} stream error: {response.status_code} - {body[:500]!r}")
+                    error = LLMProviderError(
+                        provider, response.status_code, body[:500].decode("utf-8", "replace"), model=model,
+                        retry_after=parse_retry_after(response.headers.get("retry-after"))
+                    )
+                    key_pools.report_error(spec, api_key, error)
+                    raise error
+                
+                received_content = False
+                deadline = time.monotonic() + first_token_timeout
+                lines = response.aiter_lines()
+                
+                while True:
+                    # Keep-alives não contam como progresso antes do primeiro token
+                    wait = idle_timeout if received_content else deadline - time.monotonic()
+                    try:
+                        line = await asyncio.wait_for(lines.__anext__(), timeout=max(wait, 0.0))
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        stage = "inatividade" if received_content else "primeiro token"
+                        raise asyncio.TimeoutError(f"{provider}/{model}: timeout de {stage} no streaming")
+                
+                    # Linhas vazias separam eventos; ":" são comentários/keep-alive
+                    if not line or line.startswith(":") or not line.startswith("data:"):
+                        continue
+                
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                
+                    chunk = json.loads(data)
+                    if chunk.get("usage"):
+                        usage = chunk["usage"]
+                
+                    choices = chunk.get("choices") or []
+                    if not choices:
+                        continue
+                
+                    finish_reason = choices[0].get("finish_reason") or finish_reason
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        received_content = True
+                        yield {"delta": delta}
+                
+                lease.settle(usage.get("total_tokens", 0))
+        
+        yield {
+            "done": True,
+            "model": model,
+            "provider": provider,
+            "key_id": limiter.key_id,
+            "tokens": usage,
+            "cost": usage.get("total_cost", 0),
+            "finish_reason": normalize_finish_reason(finish_reason)
+        }
+    
+    async def _stream_gemini(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        first_token_timeout: Optional[float] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming via Gemini (REST com SSE ou iterador do SDK consumido no executor dedicado)
+        O primeiro evento, {"queued": segundos}, marca a obtenção da vaga no rate limiter
+        """
+        
+        model_name = gemini_model_name(model)
+        first_token_timeout = first_token_timeout or self.health.first_token_timeout(model or model_name)
+        idle_timeout = settings.llm_stream_idle_timeout
+        usage: Dict[str, Any] = {}
+        finish_reason = None
+        
+        spec = provider_registry.get("google")
+        api_key = key_pools.select(spec) if settings.gemini_use_rest else spec.api_key
+        limiter = rate_limiters.get("google", api_key)
+        
+        async with limiter.slot(estimate_tokens(prompt, max_tokens)) as lease:
+            yield {"queued": lease.waited}
+            if settings.gemini_use_rest:
+                client = http_pool.get("google")
+                request_timeout = httpx.Timeout(
+                    max(first_token_timeout, idle_timeout), connect=settings.http_connect_timeout
                 )
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    return {
-                        "content": result["choices"][0]["message"]["content"],
-                        "model": model,
-                        "provider": "openai",
-                        "tokens": {
-                            "prompt_tokens": result["usage"]["prompt_tokens"],
-                            "completion_tokens": result["usage"]["completion_tokens"]
-                        }
-                    }
-                else:
-                    raise Exception(f"OpenAI API error: {response.status_code} - {response.text}")
+                async with client.stream(
+                    "POST",
+                    f"{spec.base_url}/models/{model_name}:streamGenerateContent",
+                    params={"alt": "sse"},
+                    headers=spec.headers(api_key),
+                    json=self._gemini_payload(prompt, max_tokens, temperature),
+                    timeout=request_timeout
+                ) as response:
+                    limiter.observe_response(response.status_code, response.headers)
                     
-        except asyncio.TimeoutError:
-            raise
-        except Exception as e:
-            logger.error(f"OpenAI error: {e}")
-            return None
+                    if response.status_code != 200:
+                        body = await response.aread()
+                        logger.error(f"google stream error: {response.status_code} - {body[:500]!r}")
+                        error = LLMProviderError(
+                            "google", response.status_code, body[:500].decode("utf-8", "replace"),
+                            model=model or model_name, retry_after=parse_retry_after(response.headers.get("retry-after"))
+                        )
+                        key_pools.report_error(spec, api_key, error)
+                        raise error
+                    
+                    received_content = False
+                    deadline = time.monotonic() + first_token_timeout
+                    lines = response.aiter_lines()
+                    
+                    while True:
+                        wait = idle_timeout if received_content else deadline - time.monotonic()
+                        try:
+                            line = await asyncio.wait_for(lines.__anext__(), timeout=max(wait, 0.0))
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            stage = "inatividade" if received_content else "primeiro token"
+                            raise asyncio.TimeoutError(f"google/{model_name}: timeout de {stage} no streaming")
+                        
+                        if not line.startswith("data:"):
+                            continue
+                        
+                        data = json.loads(line[len("data:"):].strip())
+                        text, chunk_usage = self._parse_gemini_chunk(data)
+                        finish_reason = self._gemini_finish_reason(data) or finish_reason
+                        if chunk_usage:
+                            usage = chunk_usage
+                        if text:
+                            received_content = True
+                            yield {"delta": text}
+            else:
+                handle = self._gemini_model(model_name)
+                generation_config = {"max_output_tokens": max_tokens, "temperature": temperature}
+                
+                def open_stream() -> Iterable[Any]:
+                    return handle.generate_content(prompt, generation_config=generation_config, stream=True)
+                
+                async for chunk in self._iterate_in_thread(
+                    open_stream, first_token_timeout, idle_timeout, executor=self._gemini_pool()
+                ):
+                    usage = self._gemini_sdk_usage(chunk) or usage
+                    finish_reason = self._gemini_sdk_finish_reason(chunk) or finish_reason
+                    text = getattr(chunk, "text", "")
+                    if text:
+                        yield {"delta": text}
+            
+            lease.settle(usage.get("total_tokens", 0))
+        
+        yield {
+            "done": True,
+            "model": model or model_name,
+            "api_model": model_name,
+            "provider": "google",
+            "key_id": limiter.key_id,
+            "tokens": usage,
+            "finish_reason": finish_reason
+        }
     
-    def _select_best_model(self, task_type: TaskType) -> str:
-        """Seleciona melhor modelo baseado em performance histórica"""
+    async def _iterate_in_thread(
+        self,
+        factory: Callable[[], Iterable[Any]],
+        first_timeout: float,
+        idle_timeout: float,
+        executor: Optional[Executor] = None
+    ) -> AsyncIterator[Any]:
+        """
+        Consome um iterador síncrono em thread, repassando itens ao event loop
+        first_timeout limita a espera pelo primeiro item; idle_timeout, entre itens
+        """
         
-        candidates = self.model_map.get(task_type, [])
-        if not candidates:
-            return "anthropic/claude-3-haiku"  # Fallback padrão
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        sentinel = object()
         
-        # Se não tem histórico, retorna primeiro da lista
-        if not self.performance_cache:
-            return candidates[0]
+        def worker():
+            try:
+                for item in factory():
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, sentinel)
         
-        # Seleciona baseado em performance
-        best_model = candidates[0]
-        best_score = self.performance_cache.get(best_model, 1.0)
+        producer = loop.run_in_executor(executor, worker)
+        timeout = first_timeout
         
-        for model in candidates[1:]:
-            score = self.performance_cache.get(model, 1.0)
-            if score > best_score:
-                best_score = score
-                best_model = model
+        while True:
+            item = await asyncio.wait_for(queue.get(), timeout=timeout)
+            timeout = idle_timeout
+            if item is sentinel:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
         
-        return best_model
+        await producer
     
-    def _update_performance_cache(self, model: str, success: bool):
-        """Atualiza cache de performance do modelo"""
+    def _select_best_model(self, task_type: TaskType) -> str:
+        """Seleciona melhor modelo baseado em latência, erros e circuit breaker"""
         
-        if model not in self.performance_cache:
-            self.performance_cache[model] = 1.0
+        candidates = self.model_map.get(task_type, [])
+        if not candidates:
+            return "anthropic/claude-3-haiku"  # Fallback padrão
         
-        # Atualizar score (média móvel simples)
-        current = self.performance_cache[model]
-        if success:
-            self.performance_cache[model] = current * 0.9 + 0.1  # Aumenta score
-        else:
-            self.performance_cache[model] = current * 0.9  # Diminui score
+        return self.health.rank(candidates)[0]
+    
+    def _fallback_models(self, model: str, task_type: TaskType, direct: bool) -> List[str]:
+        """
+        Modelos tentados via OpenRouter: o pedido primeiro (ex.: nível da cascata
+        fora do mapa da tarefa), seguido dos candidatos do model_map
+        """
+        ranked = self.health.rank(self.model_map.get(task_type, [model]))
+        if direct or not self.health.is_available(model):
+            return ranked
+        return [model] + [m for m in ranked if m != model]
+    
+    def shutdown(self):
+        """Libera o executor do SDK do Gemini (shutdown da aplicação)"""
+        if self._gemini_executor is not None:
+            self._gemini_executor.shutdown(wait=False, cancel_futures=True)
+            self._gemini_executor = None
     
     async def test_connection(self) -> Dict[str, Any]:
         """Testa conexão com todos os providers"""
@@ -327,7 +1285,7 @@ class LLMClient:
         }
         
         # Testar OpenRouter
-        if self.openrouter_key:
+        if self.providers.get("openrouter").api_key:
             try:
                 result = await self._generate_openrouter(
                     prompt="Hello",
@@ -340,7 +1298,7 @@ class LLMClient:
                 results["errors"].append(f"OpenRouter: {str(e)}")
         
         # Testar OpenAI
-        if self.openai_key:
+        if self.providers.get("openai").api_key:
             try:
                 result = await self._generate_openai(
                     prompt="Hello",
@@ -366,6 +1324,18 @@ class LLMClient:
             except Exception as e:
                 results["errors"].append(f"Gemini: {str(e)}")
         
+        # Testar servidor local (se configurado)
+        local = self.providers.get("local")
+        if local and local.enabled and settings.local_llm_model:
+            results["local"] = False
+            try:
+                result = await self._generate_openai_compatible(
+                    local, "Hello", settings.local_llm_model, 10, 0.7
+                )
+                results["local"] = bool(result)
+            except Exception as e:
+                results["errors"].append(f"Local: {str(e)}")
+        
         return results
 
 
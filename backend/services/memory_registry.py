@@ -0,0 +1,161 @@
+"""
+Registro em memória com limite LRU e TTL
+Usado pelo orquestrador para livros ativos e sistemas RAG: entradas ociosas ou além
+do limite são persistidas em disco e removidas da memória, e voltam sob demanda
+"""
+from typing import Dict, Any, Optional, Callable, Generic, TypeVar, Iterator, List, Tuple
+from collections import OrderedDict
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+
+class LRURegistry(Generic[V]):
+    """
+    Mapa book_id -> valor com despejo por LRU (max_items) e ociosidade (ttl segundos)
+
+    load: reidrata uma entrada ausente (None se não existir em disco)
+    persist: grava a entrada antes do despejo
+    evictable: entradas em uso (ex.: livro em geração) nunca são despejadas
+    sizeof: tamanho estimado em bytes, para a contabilidade de memória
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_items: int,
+        ttl: float,
+        load: Optional[Callable[[str], Optional[V]]] = None,
+        persist: Optional[Callable[[str, V], None]] = None,
+        evictable: Optional[Callable[[str, V], bool]] = None,
+        sizeof: Optional[Callable[[V], int]] = None
+    ):
+        self.name = name
+        self.max_items = max_items
+        self.ttl = ttl
+        self._load = load
+        self._persist = persist
+        self._evictable = evictable or (lambda key, value: True)
+        self._sizeof = sizeof
+        self._entries: "OrderedDict[str, V]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0}
+
+    # Interface de dicionário (somente entradas em memória)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def items(self) -> List[Tuple[str, V]]:
+        return list(self._entries.items())
+
+    def __getitem__(self, key: str) -> V:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: V):
+        self._entries[key] = value
+        self._touch(key)
+        self.sweep()
+
+    def __delitem__(self, key: str):
+        self.pop(key)
+
+    def pop(self, key: str, default: Optional[V] = None) -> Optional[V]:
+        self._last_access.pop(key, None)
+        return self._entries.pop(key, default)
+
+    def peek(self, key: str) -> Optional[V]:
+        """Entrada em memória, sem reidratar nem atualizar o LRU"""
+        return self._entries.get(key)
+
+    def get(self, key: str, default: Optional[V] = None) -> Optional[V]:
+        """Entrada em memória ou reidratada do disco"""
+        if key in self._entries:
+            self.stats["hits"] += 1
+            self._touch(key)
+            return self._entries[key]
+
+        value = self._load(key) if self._load else None
+        if value is None:
+            return default
+
+        self.stats["loads"] += 1
+        self._entries[key] = value
+        self._touch(key)
+        self.sweep()
+        return value
+
+    def _touch(self, key: str):
+        self._entries.move_to_end(key)
+        self._last_access[key] = time.monotonic()
+
+    # Despejo
+
+    def sweep(self) -> List[str]:
+        """Despeja entradas ociosas além do TTL e, se preciso, as menos usadas além do limite"""
+        now = time.monotonic()
+        evicted = []
+
+        for key in list(self._entries):
+            if now - self._last_access[key] >= self.ttl and self._evict(key):
+                evicted.append(key)
+
+        # Mais antigas primeiro (ordem do OrderedDict); entradas em uso são puladas
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_items:
+                break
+            if self._evict(key):
+                evicted.append(key)
+
+        return evicted
+
+    def _evict(self, key: str) -> bool:
+        value = self._entries[key]
+        if not self._evictable(key, value):
+            return False
+
+        if self._persist:
+            try:
+                self._persist(key, value)
+            except Exception as e:
+                # Sem persistência não há como reidratar: mantém em memória
+                logger.warning(f"Falha ao persistir {self.name}/{key}, mantido em memória: {e}")
+                return False
+
+        self.pop(key)
+        self.stats["evictions"] += 1
+        logger.info(f"{self.name}: {key} removido da memória")
+        return True
+
+    # Contabilidade
+
+    def memory_usage(self) -> Dict[str, Dict[str, Any]]:
+        """Tamanho estimado e ociosidade de cada entrada em memória"""
+        now = time.monotonic()
+        return {
+            key: {
+                "bytes": self._sizeof(value) if self._sizeof else None,
+                "idle_seconds": round(now - self._last_access[key], 1)
+            }
+            for key, value in self._entries.items()
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "in_memory": len(self._entries),
+            "max_items": self.max_items,
+            "ttl": self.ttl
+        }
@@ -0,0 +1,220 @@
+"""
+Medição de tokens e custos de todas as chamadas de LLM
+Ledger append-only em JSONL (um arquivo por dia) com consultas agregadas
+"""
+from typing import Optional, Dict, Any, List, Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+import json
+import logging
+import threading
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Tabela de preços em US$ por 1M tokens (aproximados, atualizar conforme necessário)
+MODEL_PRICING = {
+    # OpenAI
+    "gpt-4o": {"input": 2.50, "output": 10.00},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.60},
+    "gpt-4-turbo": {"input": 10.00, "output": 30.00},
+    "gpt-3.5-turbo": {"input": 0.50, "output": 1.50},
+    "dall-e-3": {"per_image": 0.04},  # 1024x1024 standard
+    "dall-e-2": {"per_image": 0.02},  # 1024x1024
+
+    # Anthropic
+    "claude-3.5-sonnet": {"input": 3.00, "output": 15.00},
+    "claude-3-haiku": {"input": 0.25, "output": 1.25},
+    "claude-3-opus": {"input": 15.00, "output": 75.00},
+
+    # Google
+    "gemini-pro-1.5": {"input": 0.00, "output": 0.00},  # Free tier
+    "gemini-flash-1.5": {"input": 0.00, "output": 0.00},  # Free tier
+    "gemini-1.5-pro": {"input": 0.00, "output": 0.00},
+    "gemini-1.5-flash": {"input": 0.00, "output": 0.00},
+
+    # Meta
+    "llama-3.1-8b-instruct": {"input": 0.05, "output": 0.08},
+    "llama-3.1-70b-instruct": {"input": 0.35, "output": 0.40},
+}
+
+# Campos somados nas agregações
+SUM_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens", "cost", "latency")
+
+
+def pricing_for(model: str) -> Optional[Dict[str, float]]:
+    """Preço do modelo, ignorando prefixo de provider ("openai/gpt-4o") e sufixo ":free" """
+    if not model:
+        return None
+    name = model.lower().replace("::free", "").replace(":free", "").strip()
+    return MODEL_PRICING.get(name) or MODEL_PRICING.get(name.split("/", 1)[-1])
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Custo em dólares pela tabela de preços (0 para modelos sem preço cadastrado)"""
+    pricing = pricing_for(model)
+    if pricing is None:
+        return 0.0
+    return (prompt_tokens / 1_000_000) * pricing.get("input", 0) + \
+        (completion_tokens / 1_000_000) * pricing.get("output", 0)
+
+
+def resolve_cost(model: str, tokens: Dict[str, Any], reported: Optional[float]) -> tuple:
+    """
+    Custo de uma chamada e sua origem
+    Usa o custo informado pelo provider (usage.total_cost do OpenRouter) quando existir
+    """
+    if reported:
+        return float(reported), "provider"
+    prompt_tokens = tokens.get("prompt_tokens", 0) or 0
+    completion_tokens = tokens.get("completion_tokens", 0) or 0
+    if pricing_for(model) is None:
+        return 0.0, "unknown"
+    return estimate_cost(model, prompt_tokens, completion_tokens), "pricing"
+
+
+class MeteringLedger:
+    """
+    Registro persistente de chamadas de LLM
+    Cada linha é um registro imutável; consultas leem e agregam os arquivos do período
+    """
+
+    def __init__(self):
+        # Diretório relativo ao backend, como os demais dados persistidos
+        self.directory = Path(__file__).resolve().parent.parent / settings.metering_dir
+        self._lock = threading.Lock()
+
+    def _path_for(self, day: str) -> Path:
+        return self.directory / f"ledger-{day}.jsonl"
+
+    def record(
+        self,
+        caller: str,
+        model: str,
+        provider: str,
+        tokens: Optional[Dict[str, Any]] = None,
+        latency: float = 0.0,
+        cost: float = 0.0,
+        book_id: Optional[str] = None,
+        key_id: Optional[str] = None,
+        status: str = "success",
+        **extra: Any
+    ) -> Dict[str, Any]:
+        """Anexa um registro ao ledger do dia"""
+
+        tokens = tokens or {}
+        prompt_tokens = tokens.get("prompt_tokens", 0) or 0
+        completion_tokens = tokens.get("completion_tokens", 0) or 0
+        now = datetime.now(timezone.utc)
+
+        entry = {
+            "ts": now.isoformat(),
+            "caller": caller,
+            "book_id": book_id,
+            "model": model,
+            "provider": provider,
+            "key_id": key_id,
+            "status": status,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": tokens.get("total_tokens") or prompt_tokens + completion_tokens,
+            "latency": round(latency, 3),
+            "cost": round(cost, 8),
+            **extra
+        }
+
+        if not settings.metering_enabled:
+            return entry
+
+        try:
+            with self._lock:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                with open(self._path_for(now.strftime("%Y-%m-%d")), "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            # Falha de medição nunca derruba a geração
+            logger.warning(f"Falha ao gravar no ledger de medição: {e}")
+
+        return entry
+
+    def records(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        **filters: Optional[str]
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Itera registros filtrando por período (datas ISO) e por igualdade de campos
+        Ex.: records(since="2025-01-01", book_id="...", caller="mermaid")
+        """
+        if not self.directory.exists():
+            return
+
+        active = {k: v for k, v in filters.items() if v is not None}
+
+        for path in sorted(self.directory.glob("ledger-*.jsonl")):
+            day = path.stem[len("ledger-"):]
+            if since and day < since[:10]:
+                continue
+            if until and day > until[:10]:
+                continue
+
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Linha parcial de uma escrita interrompida
+                    if since and entry["ts"] < since:
+                        continue
+                    if until and entry["ts"] > until:
+                        continue
+                    if all(str(entry.get(k)) == str(v) for k, v in active.items()):
+                        yield entry
+
+    def aggregate(self, group_by: str = "book_id", **filters: Optional[str]) -> Dict[str, Any]:
+        """
+        Soma tokens, custo e latência por campo (book_id, caller, model, provider, key_id)
+        Respostas do cache e chamadas coalescidas não foram cobradas: entram só em
+        "cached" e "cached_tokens", fora das somas de tokens, custo e latência
+        """
+
+        def empty() -> Dict[str, Any]:
+            return {"calls": 0, "errors": 0, "cached": 0, "cached_tokens": 0, **{f: 0 for f in SUM_FIELDS}}
+
+        groups: Dict[str, Dict[str, Any]] = {}
+        totals = empty()
+
+        for entry in self.records(**filters):
+            key = str(entry.get(group_by))
+            group = groups.setdefault(key, empty())
+            reused = entry.get("cached") or entry.get("coalesced")
+
+            for target in (group, totals):
+                target["calls"] += 1
+                if entry.get("status") != "success":
+                    target["errors"] += 1
+                if reused:
+                    target["cached"] += 1
+                    target["cached_tokens"] += entry.get("total_tokens", 0) or 0
+                    continue
+                for field_name in SUM_FIELDS:
+                    target[field_name] += entry.get(field_name, 0) or 0
+
+        for values in list(groups.values()) + [totals]:
+            billed_calls = values["calls"] - values["cached"]
+            values["cost"] = round(values["cost"], 6)
+            values["avg_latency"] = round(values["latency"] / billed_calls, 3) if billed_calls else 0
+            values["tokens_per_sec"] = round(values["completion_tokens"] / values["latency"], 1) if values["latency"] else 0
+            values["latency"] = round(values["latency"], 3)
+
+        return {"group_by": group_by, "groups": groups, "totals": totals}
+
+    def recent(self, limit: int = 100, **filters: Optional[str]) -> List[Dict[str, Any]]:
+        """Últimos registros (mais recentes primeiro)"""
+        entries = list(self.records(**filters))
+        return entries[-limit:][::-1]
+
+
+# Instância global
+metering = MeteringLedger()
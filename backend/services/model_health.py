@@ -0,0 +1,322 @@
+"""
+Rastreamento de saúde dos modelos de LLM
+Latência (EWMA e percentis), tokens/s, taxa de erro e circuit breaker por modelo
+Timeouts adaptativos por (modelo, tarefa, max_tokens)
+"""
+from typing import Optional, Dict, Any, List, Tuple
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+import logging
+import time
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    """Estados do circuit breaker"""
+    CLOSED = "closed"  # Tráfego normal
+    OPEN = "open"  # Modelo ignorado até o fim do cool-down
+    HALF_OPEN = "half_open"  # Uma chamada de teste liberada
+
+
+@dataclass
+class ModelStats:
+    """Métricas acumuladas de um modelo"""
+    model: str
+    ewma_latency: Optional[float] = None
+    ewma_tokens_per_sec: Optional[float] = None
+    latencies: deque = field(default_factory=lambda: deque(maxlen=settings.model_health_window))
+    outcomes: deque = field(default_factory=lambda: deque(maxlen=settings.model_health_window))
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    circuit: CircuitState = CircuitState.CLOSED
+    opened_at: Optional[float] = None
+    probe_in_flight: bool = False
+    last_error: Optional[str] = None
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - (sum(self.outcomes) / len(self.outcomes))
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * p))
+        return ordered[index]
+
+
+@dataclass
+class LatencyProfile:
+    """Tempo até o primeiro token e velocidade de geração de um modelo numa tarefa"""
+    ewma_ttft: Optional[float] = None
+    ewma_tokens_per_sec: Optional[float] = None
+    samples: int = 0
+
+
+# Chave do perfil agregado do modelo (todas as tarefas)
+ANY_TASK = "*"
+
+
+class ModelHealthTracker:
+    """
+    Mantém métricas por modelo e decide quais modelos podem receber tráfego
+    Usado por LLMClient para ordenar a lista de fallback
+    """
+
+    def __init__(self):
+        self.alpha = settings.model_health_ewma_alpha
+        self.models: Dict[str, ModelStats] = {}
+        self.profiles: Dict[Tuple[str, str], LatencyProfile] = {}
+
+    def _stats(self, model: str) -> ModelStats:
+        if model not in self.models:
+            self.models[model] = ModelStats(model=model)
+        return self.models[model]
+
+    def _ewma(self, current: Optional[float], value: float) -> float:
+        if current is None:
+            return value
+        return self.alpha * value + (1 - self.alpha) * current
+
+    # ---------- Registro ----------
+
+    def record_success(
+        self,
+        model: str,
+        latency: float,
+        completion_tokens: int = 0,
+        task: Optional[str] = None,
+        ttft: Optional[float] = None
+    ):
+        """
+        Registra chamada bem-sucedida e fecha o circuito
+        ttft (tempo até o primeiro token) só é conhecido em chamadas de streaming
+        """
+
+        stats = self._stats(model)
+        stats.successes += 1
+        stats.consecutive_failures = 0
+        stats.outcomes.append(1)
+        stats.latencies.append(latency)
+        stats.ewma_latency = self._ewma(stats.ewma_latency, latency)
+
+        if completion_tokens and latency > 0:
+            stats.ewma_tokens_per_sec = self._ewma(stats.ewma_tokens_per_sec, completion_tokens / latency)
+
+        for key in ((model, task), (model, ANY_TASK)) if task else ((model, ANY_TASK),):
+            self._update_profile(key, latency, completion_tokens, ttft)
+
+        if stats.circuit != CircuitState.CLOSED:
+            logger.info(f"Circuit breaker de {model} fechado após sucesso")
+        stats.circuit = CircuitState.CLOSED
+        stats.opened_at = None
+        stats.probe_in_flight = False
+
+    def _update_profile(
+        self,
+        key: Tuple[str, str],
+        latency: float,
+        completion_tokens: int,
+        ttft: Optional[float]
+    ):
+        profile = self.profiles.setdefault(key, LatencyProfile())
+        profile.samples += 1
+
+        if ttft is not None:
+            profile.ewma_ttft = self._ewma(profile.ewma_ttft, ttft)
+            generation_time = latency - ttft
+        else:
+            # Sem streaming só há a latência total: desconta o TTFT conhecido (se houver)
+            generation_time = latency - (profile.ewma_ttft or 0.0)
+
+        if completion_tokens and latency > 0:
+            generation_time = max(generation_time, 0.1 * latency)
+            profile.ewma_tokens_per_sec = self._ewma(
+                profile.ewma_tokens_per_sec, completion_tokens / generation_time
+            )
+
+    def record_failure(self, model: str, error: Any):
+        """Registra falha (timeout, HTTP ou qualquer exceção) e abre o circuito se necessário"""
+
+        stats = self._stats(model)
+        stats.failures += 1
+        stats.consecutive_failures += 1
+        stats.outcomes.append(0)
+        stats.last_error = str(error)[:300]
+
+        # Teste em half-open falhou: volta a abrir
+        if stats.circuit == CircuitState.HALF_OPEN:
+            self._open(stats)
+            return
+
+        too_many_consecutive = stats.consecutive_failures >= settings.circuit_failure_threshold
+        error_rate_exceeded = (
+            len(stats.outcomes) >= settings.circuit_min_calls
+            and stats.error_rate >= settings.circuit_error_rate_threshold
+        )
+
+        if stats.circuit == CircuitState.CLOSED and (too_many_consecutive or error_rate_exceeded):
+            self._open(stats)
+
+    def _open(self, stats: ModelStats):
+        stats.circuit = CircuitState.OPEN
+        stats.opened_at = time.monotonic()
+        stats.probe_in_flight = False
+        logger.warning(
+            f"Circuit breaker de {stats.model} aberto por {settings.circuit_cooldown}s "
+            f"(erro: {stats.last_error})"
+        )
+
+    # ---------- Decisão ----------
+
+    def is_available(self, model: str) -> bool:
+        """Modelo pode receber tráfego? (sem efeitos colaterais)"""
+
+        stats = self.models.get(model)
+        if stats is None or stats.circuit == CircuitState.CLOSED:
+            return True
+        if stats.circuit == CircuitState.OPEN:
+            return time.monotonic() - stats.opened_at >= settings.circuit_cooldown
+        return not stats.probe_in_flight
+
+    def acquire(self, model: str):
+        """Marca o início de uma chamada; após o cool-down libera uma chamada de teste"""
+
+        stats = self.models.get(model)
+        if stats is None:
+            return
+        if stats.circuit == CircuitState.OPEN and self.is_available(model):
+            stats.circuit = CircuitState.HALF_OPEN
+        if stats.circuit == CircuitState.HALF_OPEN:
+            stats.probe_in_flight = True
+
+    def release(self, model: str):
+        """Chamada abandonada sem resultado (ex.: cancelada por hedge)"""
+
+        stats = self.models.get(model)
+        if stats is not None and stats.circuit == CircuitState.HALF_OPEN:
+            stats.probe_in_flight = False
+
+    def score(self, model: str) -> float:
+        """Quanto maior, melhor: taxa de sucesso por segundo de latência esperada"""
+
+        stats = self.models.get(model)
+        if stats is None or stats.ewma_latency is None:
+            latency = settings.model_health_prior_latency
+            error_rate = stats.error_rate if stats else 0.0
+        else:
+            # p95 pesa na escolha para penalizar caudas longas
+            p95 = stats.percentile(0.95) or stats.ewma_latency
+            latency = 0.7 * stats.ewma_latency + 0.3 * p95
+            error_rate = stats.error_rate
+
+        return (1.0 - error_rate) / max(latency, 0.05)
+
+    def rank(self, models: List[str]) -> List[str]:
+        """Ordena candidatos pelo score, removendo modelos com circuito aberto"""
+
+        available = [m for m in models if self.is_available(m)]
+        if not available:
+            logger.warning(f"Todos os circuitos abertos para {models}, tentando mesmo assim")
+            return list(models)
+
+        # sorted é estável: empate mantém a ordem configurada em model_map
+        return sorted(available, key=self.score, reverse=True)
+
+    def percentile(self, model: str, p: float) -> Optional[float]:
+        stats = self.models.get(model)
+        return stats.percentile(p) if stats else None
+
+    def sample_count(self, model: str) -> int:
+        stats = self.models.get(model)
+        return len(stats.latencies) if stats else 0
+
+    # ---------- Timeouts adaptativos ----------
+
+    def _profile(self, model: str, task: Optional[str]) -> Optional[LatencyProfile]:
+        """Perfil da tarefa se houver amostras suficientes, senão o agregado do modelo"""
+
+        for key in ((model, task), (model, ANY_TASK)) if task else ((model, ANY_TASK),):
+            profile = self.profiles.get(key)
+            if profile and profile.samples >= settings.llm_timeout_min_samples:
+                return profile
+        return None
+
+    def _clamp_timeout(self, value: float) -> float:
+        return min(settings.llm_timeout_ceiling, max(settings.llm_timeout_floor, value))
+
+    def expected_ttft(self, model: str, task: Optional[str] = None) -> float:
+        profile = self._profile(model, task)
+        if profile and profile.ewma_ttft is not None:
+            return profile.ewma_ttft
+        return settings.llm_timeout_prior_ttft
+
+    def expected_tokens_per_sec(self, model: str, task: Optional[str] = None) -> float:
+        profile = self._profile(model, task)
+        if profile and profile.ewma_tokens_per_sec:
+            return profile.ewma_tokens_per_sec
+        return settings.llm_timeout_prior_tokens_per_sec
+
+    def compute_timeout(self, model: str, task: Optional[str] = None, max_tokens: int = 1000) -> float:
+        """
+        Timeout total de uma chamada sem streaming:
+        (TTFT + max_tokens / tokens_por_segundo) x margem, limitado por piso e teto
+        """
+        expected = self.expected_ttft(model, task) + max_tokens / max(self.expected_tokens_per_sec(model, task), 0.1)
+        return self._clamp_timeout(expected * settings.llm_timeout_multiplier)
+
+    def first_token_timeout(self, model: str, task: Optional[str] = None) -> float:
+        """Tempo máximo até o primeiro token em streaming"""
+        return self._clamp_timeout(self.expected_ttft(model, task) * settings.llm_timeout_multiplier)
+
+    # ---------- Exposição ----------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado de todos os modelos para o endpoint de saúde"""
+
+        result = {}
+        for model, stats in self.models.items():
+            result[model] = {
+                "circuit": stats.circuit.value,
+                "available": self.is_available(model),
+                "ewma_latency": round(stats.ewma_latency, 3) if stats.ewma_latency is not None else None,
+                "p50_latency": stats.percentile(0.5),
+                "p95_latency": stats.percentile(0.95),
+                "ewma_tokens_per_sec": round(stats.ewma_tokens_per_sec, 1) if stats.ewma_tokens_per_sec else None,
+                "error_rate": round(stats.error_rate, 3),
+                "successes": stats.successes,
+                "failures": stats.failures,
+                "consecutive_failures": stats.consecutive_failures,
+                "last_error": stats.last_error,
+                "score": round(self.score(model), 4),
+                "timeouts": {
+                    task: {
+                        "ewma_ttft": round(profile.ewma_ttft, 3) if profile.ewma_ttft is not None else None,
+                        "ewma_tokens_per_sec": round(profile.ewma_tokens_per_sec, 1) if profile.ewma_tokens_per_sec else None,
+                        "samples": profile.samples,
+                        "timeout_1k_tokens": round(self.compute_timeout(model, task, 1000), 1)
+                    }
+                    for (profile_model, task), profile in self.profiles.items()
+                    if profile_model == model
+                }
+            }
+        return result
+
+    def reset(self, model: Optional[str] = None):
+        """Esquece métricas de um modelo (ou de todos)"""
+        if model:
+            self.models.pop(model, None)
+            self.profiles = {k: v for k, v in self.profiles.items() if k[0] != model}
+        else:
+            self.models.clear()
+            self.profiles.clear()
+
+
+# Instância global
+model_health = ModelHealthTracker()
@@ -0,0 +1,196 @@
+"""
+Registro de providers de LLM
+Cada provider declara URL base, autenticação, padrões de nome de modelo, suporte a
+streaming e limites; o LLMClient roteia as chamadas consultando este registro
+"""
+from typing import Optional, Dict, Any, List
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+import logging
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProviderSpec:
+    """Descrição declarativa de um provider"""
+    name: str
+    kind: str  # "openai" (API /chat/completions compatível) ou "gemini"
+    base_url: str
+    api_keys: List[str] = field(default_factory=list)  # Pool de chaves (ver services/key_pool.py)
+    requires_key: bool = True
+    auth_header: str = "Authorization"
+    auth_scheme: str = "Bearer"
+    extra_headers: Dict[str, str] = field(default_factory=dict)
+    model_patterns: List[str] = field(default_factory=list)  # Padrões fnmatch, sem distinção de maiúsculas
+    strip_prefixes: List[str] = field(default_factory=list)  # Prefixos removidos antes de enviar o modelo
+    supports_streaming: bool = True
+    stream_usage: bool = True  # Aceita stream_options.include_usage
+    limits: Dict[str, float] = field(default_factory=dict)  # Padrões do rate limiter (rpm, tpm, max_in_flight...)
+
+    @property
+    def api_key(self) -> str:
+        """Chave principal"""
+        return self.api_keys[0] if self.api_keys else ""
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.base_url) and (bool(self.api_key) or not self.requires_key)
+
+    @property
+    def chat_url(self) -> str:
+        return f"{self.base_url.rstrip('/')}/chat/completions"
+
+    def matches(self, model: str) -> bool:
+        name = model.lower()
+        return any(fnmatch(name, pattern.lower()) for pattern in self.model_patterns)
+
+    def model_name(self, model: str) -> str:
+        """Nome do modelo como o provider espera (ex.: "openai/gpt-4o" -> "gpt-4o")"""
+        for prefix in self.strip_prefixes:
+            if model.startswith(prefix):
+                return model[len(prefix):]
+        return model
+
+    def headers(self, api_key: Optional[str] = None) -> Dict[str, str]:
+        """Cabeçalhos da requisição com a chave escolhida no pool (ou a principal)"""
+        api_key = self.api_key if api_key is None else api_key
+        headers = {"Content-Type": "application/json", **self.extra_headers}
+        if api_key:
+            headers[self.auth_header] = f"{self.auth_scheme} {api_key}" if self.auth_scheme else api_key
+        return headers
+
+    def describe(self) -> Dict[str, Any]:
+        """Resumo sem expor a chave"""
+        return {
+            "kind": self.kind,
+            "base_url": self.base_url,
+            "enabled": self.enabled,
+            "keys": len(self.api_keys),
+            "model_patterns": self.model_patterns,
+            "supports_streaming": self.supports_streaming,
+            "limits": self.limits
+        }
+
+
+class ProviderRegistry:
+    """
+    Providers em ordem de prioridade de roteamento
+    O primeiro provider habilitado cujo padrão casa com o modelo atende a chamada;
+    o OpenRouter fica por último como destino padrão de qualquer modelo
+    """
+
+    def __init__(self):
+        self._providers: Dict[str, ProviderSpec] = {}
+
+    def register(self, spec: ProviderSpec, before: Optional[str] = None):
+        """Adiciona (ou substitui) um provider, opcionalmente antes de outro na ordem"""
+
+        self._providers.pop(spec.name, None)
+        if before is None or before not in self._providers:
+            self._providers[spec.name] = spec
+            return
+
+        ordered = {}
+        for name, existing in self._providers.items():
+            if name == before:
+                ordered[spec.name] = spec
+            ordered[name] = existing
+        self._providers = ordered
+
+    def get(self, name: str) -> Optional[ProviderSpec]:
+        return self._providers.get(name)
+
+    def resolve(self, model: str) -> ProviderSpec:
+        """Provider que atende o modelo"""
+
+        for spec in self._providers.values():
+            if spec.enabled and spec.matches(model):
+                return spec
+        return self._providers["openrouter"]
+
+    def route_for_caller(self, caller: str) -> Optional[str]:
+        """
+        Modelo local para consumidores de alto volume e baixo risco (rascunhos de
+        tópicos, mermaid, estrutura JSON), ou None para seguir o roteamento normal
+        """
+        local = self._providers.get("local")
+        if not local or not local.enabled or not settings.local_llm_model:
+            return None
+        if any(caller == prefix or caller.startswith(f"{prefix}.") for prefix in settings.local_llm_callers):
+            return settings.local_llm_model
+        return None
+
+    def specs(self) -> List[ProviderSpec]:
+        return list(self._providers.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: spec.describe() for name, spec in self._providers.items()}
+
+
+def parse_keys(primary: str, extra: Optional[str] = None) -> List[str]:
+    """Chave principal + lista separada por vírgulas, sem duplicatas e na ordem declarada"""
+    keys = [primary] + [k.strip() for k in (extra or "").split(",")]
+    return list(dict.fromkeys(k for k in keys if k))
+
+
+def build_default_registry() -> ProviderRegistry:
+    """Providers configurados pelas settings"""
+
+    registry = ProviderRegistry()
+
+    registry.register(ProviderSpec(
+        name="google",
+        kind="gemini",
+        base_url=settings.gemini_base_url,
+        api_keys=parse_keys(settings.gemini_api_key, settings.gemini_api_keys),
+        auth_header="x-goog-api-key",
+        auth_scheme="",
+        model_patterns=["*gemini*"]
+    ))
+
+    registry.register(ProviderSpec(
+        name="openai",
+        kind="openai",
+        base_url=settings.openai_base_url,
+        api_keys=parse_keys(settings.openai_api_key, settings.openai_api_keys),
+        model_patterns=["*gpt*", "*openai*"],
+        strip_prefixes=["openai/"]
+    ))
+
+    # Servidor de inferência compatível com OpenAI na rede local (vLLM, llama.cpp, Ollama, LM Studio)
+    registry.register(ProviderSpec(
+        name="local",
+        kind="openai",
+        base_url=settings.local_llm_base_url,
+        api_keys=parse_keys(settings.local_llm_api_key),
+        requires_key=False,
+        model_patterns=settings.local_llm_model_patterns,
+        strip_prefixes=["local/"],
+        stream_usage=settings.local_llm_stream_usage,
+        limits={
+            "rpm": 0,
+            "tpm": 0,
+            "max_in_flight": settings.local_llm_max_in_flight,
+            "max_in_flight_per_key": settings.local_llm_max_in_flight
+        }
+    ))
+
+    registry.register(ProviderSpec(
+        name="openrouter",
+        kind="openai",
+        base_url=settings.openrouter_base_url,
+        api_keys=parse_keys(settings.openrouter_api_key, settings.openrouter_api_keys),
+        extra_headers={
+            "HTTP-Referer": "http://localhost:8000",  # Opcional
+            "X-Title": "Ebook Generator"  # Opcional
+        },
+        model_patterns=["*"]
+    ))
+
+    return registry
+
+
+# Instância global
+provider_registry = build_default_registry()
@@ -0,0 +1,289 @@
+"""
+Rate limiting e controle de concorrência para chamadas de LLM
+Token buckets (requisições/min e tokens/min) e semáforos por provider e por chave de API
+"""
+from typing import Optional, Dict, Any, Mapping, Tuple
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from config.settings import settings
+from services.providers import provider_registry
+
+logger = logging.getLogger(__name__)
+
+# Limites usados quando o provider não aparece em LLM_RATE_LIMITS
+DEFAULT_LIMITS = {"rpm": 60, "tpm": 0, "max_in_flight": 8, "max_in_flight_per_key": 4}
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Identificador estável de uma chave de API, sem expor a chave"""
+    if not api_key:
+        return "none"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Converte Retry-After (segundos ou HTTP-date) em segundos de espera"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Converte durações no formato da OpenAI ("1s", "6m0s", "250ms") em segundos"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+
+class TokenBucket:
+    """
+    Token bucket assíncrono com fila FIFO
+    rate_per_minute <= 0 desativa o limite
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate_per_minute <= 0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_minute / 60.0)
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Aguarda saldo suficiente; retorna segundos de espera"""
+
+        if self.unlimited:
+            return 0.0
+
+        amount = min(amount, self.capacity)
+        started = time.monotonic()
+
+        # O lock garante ordem de chegada entre quem espera
+        async with self._lock:
+            while True:
+                self._refill()
+                now = time.monotonic()
+
+                if self.blocked_until > now:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return time.monotonic() - started
+
+                await asyncio.sleep((amount - self.tokens) * 60.0 / self.rate_per_minute)
+
+    def refund(self, amount: float):
+        """Devolve (ou cobra, se negativo) a diferença entre estimativa e uso real"""
+        if self.unlimited:
+            return
+        self._refill()
+        self.tokens = max(-self.capacity, min(self.capacity, self.tokens + amount))
+
+    def block_for(self, seconds: float):
+        """Suspende o bucket (Retry-After ou cota esgotada)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def sync_remaining(self, remaining: float):
+        """Alinha o saldo local com o informado pelo provider"""
+        if self.unlimited:
+            return
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+
+class Lease:
+    """Reserva de uma chamada; settle() ajusta a estimativa de tokens"""
+
+    def __init__(self, limiter: "ProviderLimiter", estimated_tokens: int, waited: float = 0.0):
+        self.limiter = limiter
+        self.estimated_tokens = estimated_tokens
+        self.waited = waited  # Segundos de espera na fila antes da vaga
+
+    def settle(self, actual_tokens: int):
+        if actual_tokens:
+            self.limiter.tokens.refund(self.estimated_tokens - actual_tokens)
+            self.limiter.stats["tokens"] += actual_tokens
+
+
+class ProviderLimiter:
+    """Limites de uma chave de API de um provider"""
+
+    def __init__(self, provider: str, key_id: str, limits: Dict[str, float], provider_slots: asyncio.Semaphore):
+        self.provider = provider
+        self.key_id = key_id
+        self.limits = limits
+        self.requests = TokenBucket(limits.get("rpm", 0))
+        self.tokens = TokenBucket(limits.get("tpm", 0))
+        self.provider_slots = provider_slots
+        self.key_slots = asyncio.Semaphore(int(limits.get("max_in_flight_per_key", 4)))
+        self.in_flight = 0
+        self.waiting = 0
+        self.stats = {
+            "requests": 0,
+            "tokens": 0,
+            "throttled": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0
+        }
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int = 0):
+        """Aguarda vaga de concorrência e saldo nos buckets antes da chamada"""
+
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await self.provider_slots.acquire()
+            try:
+                await self.key_slots.acquire()
+            except BaseException:
+                self.provider_slots.release()
+                raise
+        finally:
+            self.waiting -= 1
+
+        try:
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+
+            waited = time.monotonic() - started
+            self.stats["requests"] += 1
+            self.stats["total_wait"] += waited
+            self.stats["max_wait"] = max(self.stats["max_wait"], waited)
+            if waited > 1.0:
+                logger.info(f"Rate limit {self.provider}/{self.key_id}: chamada aguardou {waited:.1f}s na fila")
+
+            self.in_flight += 1
+            try:
+                yield Lease(self, estimated_tokens, waited)
+            finally:
+                self.in_flight -= 1
+        finally:
+            self.key_slots.release()
+            self.provider_slots.release()
+
+    def observe_response(self, status_code: int, headers: Mapping[str, str]):
+        """Aprende com Retry-After e cabeçalhos de rate limit da resposta"""
+
+        if status_code == 429:
+            self.stats["throttled"] += 1
+
+        retry_after = parse_retry_after(headers.get("retry-after"))
+        if retry_after is None and status_code == 429:
+            retry_after = settings.rate_limit_default_backoff
+        if retry_after:
+            logger.warning(f"Rate limit {self.provider}/{self.key_id}: pausando {retry_after:.1f}s")
+            self.requests.block_for(retry_after)
+            self.tokens.block_for(retry_after)
+
+        # OpenAI: x-ratelimit-remaining-requests / x-ratelimit-reset-requests (duração)
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                remaining_value = float(remaining)
+            except ValueError:
+                continue
+            bucket.sync_remaining(remaining_value)
+            if remaining_value <= 0:
+                reset = parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset:
+                    bucket.block_for(reset)
+
+        # OpenRouter: x-ratelimit-remaining / x-ratelimit-reset (epoch em ms)
+        remaining = headers.get("x-ratelimit-remaining")
+        reset_at = headers.get("x-ratelimit-reset")
+        if remaining is not None:
+            try:
+                if float(remaining) <= 0 and reset_at:
+                    wait = float(reset_at) / 1000.0 - time.time()
+                    if wait > 0:
+                        self.requests.block_for(wait)
+            except ValueError:
+                pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "provider": self.provider,
+            "key_id": self.key_id,
+            "limits": self.limits,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "blocked_for": round(max(0.0, self.requests.blocked_until - now), 2),
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.stats.items()}
+        }
+
+
+class RateLimiterRegistry:
+    """Limiters por (provider, chave de API), com semáforo compartilhado por provider"""
+
+    def __init__(self):
+        self._limiters: Dict[Tuple[str, str], ProviderLimiter] = {}
+        self._provider_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _limits(self, provider: str) -> Dict[str, float]:
+        spec = provider_registry.get(provider)
+        declared = spec.limits if spec else {}
+        return {**DEFAULT_LIMITS, **declared, **settings.llm_rate_limits.get(provider, {})}
+
+    def get(self, provider: str, api_key: str = "") -> ProviderLimiter:
+        key_id = key_fingerprint(api_key)
+        limiter = self._limiters.get((provider, key_id))
+        if limiter is None:
+            limits = self._limits(provider)
+            if provider not in self._provider_slots:
+                self._provider_slots[provider] = asyncio.Semaphore(int(limits["max_in_flight"]))
+            limiter = ProviderLimiter(provider, key_id, limits, self._provider_slots[provider])
+            self._limiters[(provider, key_id)] = limiter
+        return limiter
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            f"{provider}/{key_id}": limiter.snapshot()
+            for (provider, key_id), limiter in self._limiters.items()
+        }
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Estimativa grosseira (~4 caracteres por token) para reservar a cota de TPM"""
+    return len(prompt) // 4 + max_tokens
+
+
+# Instância global
+rate_limiters = RateLimiterRegistry()
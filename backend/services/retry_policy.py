@@ -0,0 +1,214 @@
+"""
+Política de retry para chamadas de LLM
+Regras por classe de erro, backoff exponencial com jitter, Retry-After e orçamento de retries
+"""
+from typing import Optional, Dict, Any, Callable, Awaitable, TypeVar
+from dataclasses import dataclass
+import asyncio
+import logging
+import random
+import httpx
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LLMProviderError(Exception):
+    """Resposta de erro de um provider de LLM, com o necessário para decidir o retry"""
+
+    def __init__(
+        self,
+        provider: str,
+        status_code: int,
+        message: str = "",
+        model: Optional[str] = None,
+        retry_after: Optional[float] = None
+    ):
+        self.provider = provider
+        self.status_code = status_code
+        self.model = model
+        self.retry_after = retry_after
+        super().__init__(f"{provider} API error: {status_code} - {message[:300]}")
+
+
+@dataclass
+class RetryRule:
+    """Como tratar uma classe de erro no mesmo modelo"""
+    max_retries: int = 0  # Retries no mesmo modelo antes do fallback
+    base_delay: float = 0.5  # Backoff inicial em segundos
+    max_delay: float = 8.0  # Teto do backoff
+    honor_retry_after: bool = True
+
+
+# Classes sem regra (client_error, unknown) nunca são repetidas no mesmo modelo
+DEFAULT_RULES = {
+    "rate_limit": {"max_retries": 2, "base_delay": 1.0, "max_delay": 10.0},
+    "overloaded": {"max_retries": 2, "base_delay": 0.8, "max_delay": 8.0},
+    "bad_gateway": {"max_retries": 2, "base_delay": 0.5, "max_delay": 4.0},
+    "server_error": {"max_retries": 1, "base_delay": 0.5, "max_delay": 4.0},
+    "connection": {"max_retries": 2, "base_delay": 0.2, "max_delay": 2.0},
+    "timeout": {"max_retries": 0, "base_delay": 0.5, "max_delay": 2.0},
+}
+
+
+def classify_error(error: BaseException) -> str:
+    """Classe de erro usada para escolher a regra de retry"""
+
+    if isinstance(error, LLMProviderError):
+        status = error.status_code
+    elif isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+    elif isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return "timeout"
+    elif isinstance(error, httpx.TransportError):
+        return "connection"
+    else:
+        return "unknown"
+
+    if status == 429:
+        return "rate_limit"
+    if status in (503, 529):
+        return "overloaded"
+    if status in (502, 504):
+        return "bad_gateway"
+    if status >= 500:
+        return "server_error"
+    return "client_error"
+
+
+class RetryBudget:
+    """
+    Orçamento de retries compartilhado: cada chamada nova deposita uma fração de
+    retry e cada retry consome um inteiro. Em falhas generalizadas o saldo acaba e
+    o cliente para de multiplicar o tráfego sobre um provider já degradado.
+    """
+
+    def __init__(self, ratio: float, capacity: float):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.balance = capacity
+
+    def deposit(self):
+        self.balance = min(self.capacity, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.balance < 1:
+            return False
+        self.balance -= 1
+        return True
+
+
+class RetryPolicy:
+    """Decide se e quando repetir uma chamada no mesmo modelo"""
+
+    def __init__(self):
+        self.rules: Dict[str, RetryRule] = {
+            name: RetryRule(**{**DEFAULT_RULES.get(name, {}), **overrides})
+            for name, overrides in {
+                **{name: {} for name in DEFAULT_RULES},
+                **settings.llm_retry_rules
+            }.items()
+        }
+        self.budget = RetryBudget(settings.llm_retry_budget_ratio, settings.llm_retry_budget_capacity)
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self.calls = 0
+
+    def _stats(self, error_class: str) -> Dict[str, Any]:
+        return self.stats.setdefault(error_class, {
+            "errors": 0,
+            "retries": 0,
+            "recovered": 0,
+            "gave_up": 0,
+            "budget_denied": 0,
+            "total_backoff": 0.0
+        })
+
+    def backoff(self, error: BaseException, rule: RetryRule, retry_number: int) -> float:
+        """Full jitter: uniforme entre 0 e min(teto, base * 2^n); Retry-After tem precedência"""
+
+        retry_after = getattr(error, "retry_after", None)
+        if rule.honor_retry_after and retry_after is not None:
+            # Pequeno jitter evita que todos os clientes voltem no mesmo instante
+            return retry_after + random.uniform(0, min(1.0, rule.base_delay))
+
+        ceiling = min(rule.max_delay, rule.base_delay * (2 ** retry_number))
+        return random.uniform(0, ceiling)
+
+    def decide(self, error: BaseException, retry_number: int) -> Optional[float]:
+        """Segundos de espera antes de repetir no mesmo modelo, ou None para seguir ao fallback"""
+
+        error_class = classify_error(error)
+        stats = self._stats(error_class)
+        stats["errors"] += 1
+
+        rule = self.rules.get(error_class)
+        if not settings.llm_retry_enabled or rule is None or retry_number >= rule.max_retries:
+            stats["gave_up"] += 1
+            return None
+
+        delay = self.backoff(error, rule, retry_number)
+        if delay > settings.llm_retry_max_wait:
+            # Esperar mais que isso custa mais que trocar de modelo
+            stats["gave_up"] += 1
+            return None
+
+        if not self.budget.withdraw():
+            stats["budget_denied"] += 1
+            logger.warning(f"Orçamento de retries esgotado, seguindo para o fallback ({error_class})")
+            return None
+
+        stats["retries"] += 1
+        stats["total_backoff"] += delay
+        return delay
+
+    def start(self):
+        """Conta uma chamada nova e deposita sua fração no orçamento de retries"""
+        self.calls += 1
+        self.budget.deposit()
+
+    async def run(self, label: str, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Executa call() repetindo erros transitórios conforme as regras
+        Só deve envolver chamadas sem efeito parcial visível (ex.: antes do primeiro token)
+        """
+        self.start()
+        retry_number = 0
+        last_class = None
+
+        while True:
+            try:
+                result = await call()
+            except Exception as e:
+                delay = self.decide(e, retry_number)
+                if delay is None:
+                    raise
+                last_class = classify_error(e)
+                logger.warning(
+                    f"Retry {retry_number + 1} de {label} em {delay:.2f}s "
+                    f"({last_class}: {str(e)[:120]})"
+                )
+                await asyncio.sleep(delay)
+                retry_number += 1
+                continue
+
+            if last_class:
+                self._stats(last_class)["recovered"] += 1
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.llm_retry_enabled,
+            "calls": self.calls,
+            "budget_balance": round(self.budget.balance, 2),
+            "rules": {name: vars(rule) for name, rule in self.rules.items()},
+            "classes": {
+                name: {k: round(v, 3) if isinstance(v, float) else v for k, v in values.items()}
+                for name, values in self.stats.items()
+            }
+        }
+
+
+# Instância global
+retry_policy = RetryPolicy()
@@ -0,0 +1,57 @@
+"""
+Single-flight: coalescência de chamadas idênticas em andamento
+Chamadas concorrentes com a mesma chave aguardam uma única execução upstream
+"""
+from typing import Dict, Any, Callable, Awaitable
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas concorrentes pela chave da requisição
+    A execução roda numa task própria: se quem a iniciou for cancelado,
+    os demais continuam aguardando o mesmo resultado.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.stats = {"executions": 0, "coalesced": 0}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Executa factory() uma única vez por chave enquanto houver chamada em voo"""
+
+        task = self._calls.get(key)
+        shared = task is not None
+
+        if shared:
+            self.stats["coalesced"] += 1
+            logger.info(f"Single-flight: aguardando chamada idêntica em andamento ({key[:12]})")
+        else:
+            self.stats["executions"] += 1
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, k=key: self._finish(k, t))
+
+        result = await asyncio.shield(task)
+
+        # Cada chamador recebe sua própria cópia do dict de resposta
+        if shared and isinstance(result, dict):
+            return {**result, "coalesced": True}
+        return result
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Consome a exceção para não gerar aviso quando todos os chamadores foram cancelados
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "in_flight": len(self._calls)}
+
+
+# Instância global
+singleflight = SingleFlight()
@@ -9,43 +9,85 @@ interface GenerationProgressProps {
 export default function GenerationProgress({ bookId, onComplete }: GenerationProgressProps) {
     const [status, setStatus] = useState<any>(null)
     const [logs, setLogs] = useState<string[]>([])
+    const [nodes, setNodes] = useState<Record<number, string>>({})
+    const [partialText, setPartialText] = useState<Record<number, string>>({})
 
     useEffect(() => {
-        let interval: any
-
-        const checkStatus = async () => {
+        const fetchStatus = async () => {
             try {
                 const response = await fetch(`/api/book/status/${bookId}`)
                 const data = await response.json()
-
                 setStatus(data)
-
-                // Adicionar log simulado baseado no status
-                if (data.status === 'generating') {
-                    const currentCh = data.progress.current_chapter
-                    const stage = data.progress.current_stage
-                    setLogs(prev => {
-                        const lastLog = prev[prev.length - 1]
-                        const newLog = `[${new Date().toLocaleTimeString()}] Cap. ${currentCh}: ${stage}...`
-                        if (lastLog !== newLog) return [...prev, newLog]
-                        return prev
-                    })
-                }
-
-                if (data.status === 'completed') {
-                    clearInterval(interval)
-                    onComplete(data)
-                }
+                return data
             } catch (error) {
                 console.error('Error checking status:', error)
             }
         }
 
-        // Polling a cada 2 segundos
-        interval = setInterval(checkStatus, 2000)
-        checkStatus() // Check imediato
+        const addLog = (message: string) => {
+            setLogs(prev => [...prev, `[${new Date().toLocaleTimeString()}] ${message}`])
+        }
+
+        // Eventos empurrados pelo servidor (SSE); o status completo só é relido quando um capítulo muda
+        const source = new EventSource(`/api/book/${bookId}/events`)
+
+        source.addEventListener('chapter_started', (e: MessageEvent) => {
+            const data = JSON.parse(e.data)
+            addLog(`Cap. ${data.chapter}: iniciado (${data.title})`)
+            fetchStatus()
+        })
 
-        return () => clearInterval(interval)
+        source.addEventListener('node_started', (e: MessageEvent) => {
+            const data = JSON.parse(e.data)
+            setNodes(prev => ({ ...prev, [data.chapter]: data.node }))
+            if (data.node === 'generate_chapter') {
+                setPartialText(prev => ({ ...prev, [data.chapter]: '' }))
+            }
+        })
+
+        source.addEventListener('node_completed', (e: MessageEvent) => {
+            const data = JSON.parse(e.data)
+            const tokens = data.tokens?.total_tokens ? ` · ${data.tokens.total_tokens} tokens` : ''
+            addLog(`Cap. ${data.chapter}: ${data.node} em ${data.duration.toFixed(1)}s${tokens}`)
+        })
+
+        source.addEventListener('section_completed', (e: MessageEvent) => {
+            const data = JSON.parse(e.data)
+            const status = data.validation_passed ? '' : ' (reprovada)'
+            addLog(`Cap. ${data.chapter}: seção ${data.section} "${data.title}" em ${data.attempts} tentativa(s)${status}`)
+        })
+
+        source.addEventListener('chapter_partial', (e: MessageEvent) => {
+            const data = JSON.parse(e.data)
+            setPartialText(prev => ({ ...prev, [data.chapter]: (prev[data.chapter] ?? '') + data.delta }))
+        })
+
+        source.addEventListener('chapter_completed', (e: MessageEvent) => {
+            const data = JSON.parse(e.data)
+            addLog(`Cap. ${data.chapter}: concluído${data.validation_passed ? '' : ' (reprovado na validação)'}`)
+            setPartialText(prev => {
+                const { [data.chapter]: _, ...rest } = prev
+                return rest
+            })
+            fetchStatus()
+        })
+
+        source.addEventListener('book_completed', async () => {
+            source.close()
+            addLog('Livro concluído')
+            const data = await fetchStatus()
+            if (data) onComplete(data)
+        })
+
+        source.addEventListener('book_failed', (e: MessageEvent) => {
+            source.close()
+            addLog(`Falha na geração: ${JSON.parse(e.data).error}`)
+            fetchStatus()
+        })
+
+        fetchStatus() // Estado inicial (outline e capítulos já concluídos)
+
+        return () => source.close()
     }, [bookId, onComplete])
 
     if (!status) return <div className="loading-state"><Loader2 className="spinning" size={40} /></div>
@@ -83,8 +125,11 @@ export default function GenerationProgress({ bookId, onComplete }: GenerationPro
                 {(status.outline?.chapters ?? []).map((chapter: any) => {
                     const isCompleted = chaptersCompleted.includes(chapter.number)
                     const currentChapter = status.progress?.current_chapter
-                    const currentStage = status.progress?.current_stage
-                    const isCurrent = currentChapter === chapter.number
+                    const currentStage = nodes[chapter.number] ?? status.progress?.current_stage
+                    const inProgress: number[] = status.progress?.chapters_in_progress ?? []
+                    const isCurrent = inProgress.length > 0
+                        ? inProgress.includes(chapter.number)
+                        : currentChapter === chapter.number
 
                     return (
                         <div key={chapter.number} className={`chapter-status-item ${isCurrent ? 'active' : ''} ${isCompleted ? 'completed' : ''}`}>
@@ -98,6 +143,9 @@ export default function GenerationProgress({ bookId, onComplete }: GenerationPro
                                 {isCurrent && currentStage && (
                                     <span className="current-action">Processando: {currentStage}...</span>
                                 )}
+                                {isCurrent && partialText[chapter.number] && (
+                                    <span className="current-action">{partialText[chapter.number].slice(-200)}</span>
+                                )}
                             </div>
                         </div>
                     )
@@ -7,6 +7,7 @@ export const API_ENDPOINTS = {
   GENERATE_FULL: `${API_BASE_URL}/api/book/generate-full`,
   GENERATE_OUTLINE: `${API_BASE_URL}/api/book/generate-outline`,
   BOOK_STATUS: (bookId: string) => `${API_BASE_URL}/api/book/status/${bookId}`,
+  BOOK_EVENTS: (bookId: string) => `${API_BASE_URL}/api/book/${bookId}/events`,
   BOOK_DATA: (bookId: string) => `${API_BASE_URL}/api/book/${bookId}`,
   CHAPTER_RESEARCH_SOURCES: (bookId: string, chapterNumber: number) => 
     `${API_BASE_URL}/api/book/${bookId}/chapter/${chapterNumber}/research-sources`,